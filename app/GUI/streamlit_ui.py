@@ -77,10 +77,23 @@ def user_interface():
 
         with st.spinner("Running..."):
             try:
-                resp = requests.post(f"{API_BASE}/v1/agent", json={"text": query}, timeout=120)
+                # queue a background job so long runs don't hold the socket open
+                resp = requests.post(f"{API_BASE}/v1/jobs", json={"text": query}, timeout=10)
                 resp.raise_for_status()
-                body = resp.json().get("response", "")
-                st.markdown(body)  # backend returns final markdown
+                job_id = resp.json()["job_id"]
+                status_line = st.empty()
+                while True:
+                    job = requests.get(f"{API_BASE}/v1/jobs/{job_id}", timeout=10).json()
+                    if job["progress"]:
+                        status_line.info(job["progress"][-1])
+                    if job["status"] in ("succeeded", "failed"):
+                        break
+                    time.sleep(2)
+                status_line.empty()
+                if job["status"] == "failed":
+                    st.error(f"Research failed: {job['error']}")
+                else:
+                    st.markdown(job["report"])  # backend returns final markdown
             except requests.RequestException as e:
                 st.error(f"Request failed: {e}")
 
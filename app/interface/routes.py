@@ -1,17 +1,24 @@
 """module to handle endpoint routing"""
 import json
-from fastapi import HTTPException, APIRouter
-from fastapi.responses import StreamingResponse
+from fastapi import HTTPException, APIRouter, Header
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
 # third party / local imports 
-from ..system.agents.research_agents import get_question_agent, get_research_agent
-from ..system.agents.write_agents import get_report_agent
-from ..system.agents.review_agents import get_review_agent   # corrected name
-from ..system.agents.workflow import WorkflowClass
-from ..system.utils.events import ProgressEvent
-from ..system.utils.schema import UserRequest, AgentResponse
+from ..system.utils.concurrency import get_answer_limiter
+from ..system.utils.schema import (UserRequest, AgentResponse, BatchRequest, JobCreated,
+                                  JobStatus)
 from ..system.model import model_loader
+from ..system.model.warmup import get_model_warmup
+from ..system.cache.search_cache import search_cache_stats
+from ..system.search.client import search_client_metrics
+from ..system.cache.store import MISSING
+from ..system.runs import get_run_registry, start_workflow
+from ..system.jobs import get_job_manager
+from ..system.batch import get_batch_limiter, run_batch
+from ..system.utils.tracing import get_tracer
+from ..system.utils.metrics import REGISTRY
 from ..system.utils.logger import logger
+from ..system.utils.settings import env_int
 
 
 router = APIRouter()
@@ -20,34 +27,81 @@ router = APIRouter()
 @router.get("/health")
 async def health():
     """Health endpoint exposing basic readiness information."""
-    return {"status": "ok", "model_loaded": bool(model_loader.get_model())}
+    payload = {
+        "status": "ok",
+        "model_loaded": bool(model_loader.get_model()),
+        "model_warmup": get_model_warmup().stats(),
+        "search_cache": search_cache_stats(),
+        "search_client": search_client_metrics(),
+        "answer_fanout": get_answer_limiter().stats(),
+        "runs": get_run_registry().stats(),
+        "jobs": get_job_manager().stats(),
+        "batches": get_batch_limiter().stats(),
+    }
+    pool = model_loader.get_model_pool()
+    if pool is not None:
+        payload["model_pool"] = pool.stats()
+    role_stats = model_loader.role_model_stats()
+    if role_stats:
+        payload["role_models"] = role_stats
+    return payload
 
 
-async def _sse_generator(handler):
+@router.get("/metrics")
+async def metrics(format: str = "prometheus"):
+    """
+    Counters, gauges and histograms in the Prometheus text format. With
+    `?format=json`, the latency percentiles per span name instead.
+    """
+    if format == "json":
+        return {"spans": get_tracer().summary()}
+    return PlainTextResponse(REGISTRY.render(),
+                             media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/runs/{run_id}/trace")
+async def get_run_trace(run_id: str):
+    """Return the recorded spans of a research run, oldest first."""
+    spans = get_tracer().trace(run_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail="no trace recorded for this run")
+    return {"run_id": run_id, "spans": spans}
+
+
+def _sse(payload: dict) -> str:
+    """Format a payload as an SSE "data: <json>\n\n" block."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+async def _sse_generator(run):
     """
     Asynchronous Server-Sent Events generator\
-    that streams ProgressEvent messages
+    that streams ProgressEvent messages of a research run
     and finally emits the final result as a JSON event.\
-    Yields properly formatted
-    SSE "data: <json>\n\n" blocks.
+    Callers attached to the same run receive the same events.
     """
+    # workflow events need llama-index, imported once a run exists
+    from ..system.utils.events import event_payload
+
     try:
-        # stream progress events (if handler exposes an async iterator)
-        if hasattr(handler, "stream_events"):
-            async for event in handler.stream_events():
-                if isinstance(event, ProgressEvent):
-                    payload = {"type": "progress", "message": event.msg}
-                    yield f"data: {json.dumps(payload)}\n\n"
+        async for event in run.subscribe():
+            payload = event_payload(event)
+            if payload is not None:
+                yield _sse(payload)
 
         # await final result
-        final_result = await handler
-        payload = {"type": "final", "response": final_result}
-        yield f"data: {json.dumps(payload)}\n\n"
+        final_result = await run.wait()
+        yield _sse({"type": "final", "response": final_result})
 
     except Exception as exc:
         logger.exception("Error while running agent handler")
-        payload = {"type": "error", "error": str(exc)}
-        yield f"data: {json.dumps(payload)}\n\n"
+        yield _sse({"type": "error", "error": str(exc)})
+
+
+async def _cached_sse_generator(report: str):
+    """Stream a cached report as if it had just been produced."""
+    yield _sse({"type": "progress", "message": "Using cached report"})
+    yield _sse({"type": "final", "response": report})
 
 
 @router.post("/agent", response_model=AgentResponse)
@@ -59,24 +113,22 @@ async def query_agent(query: UserRequest):
     if model_loader.get_model() is None:
         raise HTTPException(status_code=503, detail="model not loaded yet")
 
-    workflow = WorkflowClass(timeout=300)
+    registry = get_run_registry()
+    if not query.bypass_cache:
+        cached = await registry.acached_report(query.text)
+        if cached is not MISSING:
+            return AgentResponse(response=cached)
+
     try:
-        handler = workflow.run(
-            research_topic=query.text,
-            question_agent=get_question_agent(),
-            answer_agent=get_research_agent(),
-            report_agent=get_report_agent(),
-            review_agent=get_review_agent(),
-        )
-
-        # handler is expected to be awaitable (await handler -> final_result)
-        final_result = await handler
+        # identical in-flight topics share a single workflow run
+        run = registry.start(query.text, lambda: start_workflow(query.text))
+        final_result = await run.wait()
         return AgentResponse(response=final_result)
 
     except Exception as exc:
         # Log full exception but return a generic 500 message to clients
         logger.exception("Agent query failed")
-        raise HTTPException(status_code=500, detail="Internal server error")
+        raise HTTPException(status_code=500, detail="Internal server error") from exc
 
 
 @router.post("/agent/stream")
@@ -89,20 +141,131 @@ async def query_agent_stream(query: UserRequest):
     if model_loader.get_model() is None:
         raise HTTPException(status_code=503, detail="model not loaded yet")
 
-    workflow = WorkflowClass(timeout=300)
+    registry = get_run_registry()
+    if not query.bypass_cache:
+        cached = await registry.acached_report(query.text)
+        if cached is not MISSING:
+            return StreamingResponse(_cached_sse_generator(cached),
+                                     media_type="text/event-stream")
+
     try:
-        handler = workflow.run(
-            research_topic=query.text,
-            question_agent=get_question_agent(),
-            answer_agent=get_research_agent(),
-            report_agent=get_report_agent(),
-            review_agent=get_review_agent(),
-        )
-
-        return StreamingResponse(_sse_generator(handler),
+        run = registry.start(query.text, lambda: start_workflow(query.text))
+        return StreamingResponse(_sse_generator(run),
                                  media_type="text/event-stream")
 
     except Exception as exc:
         # Log full exception but return a generic 500 message to clients
         logger.exception("Agent stream failed")
-        raise HTTPException(status_code=500, detail="Internal server error")
+        raise HTTPException(status_code=500, detail="Internal server error") from exc
+
+
+async def _batch_generator(batch: BatchRequest, format: str):
+    """Stream the results of a batch as NDJSON lines or SSE blocks."""
+    async for payload in run_batch(batch.requests, progress=batch.progress):
+        yield _sse(payload) if format == "sse" else json.dumps(payload) + "\n"
+
+
+@router.post("/agent/batch")
+async def query_agent_batch(batch: BatchRequest, format: str = "ndjson"):
+    """
+    Research many topics in one call. Each topic's result is streamed as
+    soon as it is ready, tagged with its `index` in the request, followed by
+    a "done" summary. `?format=sse` streams Server-Sent Events instead of
+    newline-delimited JSON.
+    """
+    if model_loader.get_model() is None:
+        raise HTTPException(status_code=503, detail="model not loaded yet")
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=422, detail="format must be ndjson or sse")
+    limit = env_int("BATCH_MAX_TOPICS", 100)
+    if not 0 < len(batch.requests) <= limit:
+        raise HTTPException(status_code=422,
+                            detail=f"a batch needs between 1 and {limit} topics")
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(_batch_generator(batch, format), media_type=media_type)
+
+
+def _get_job_or_404(job_id: str):
+    job = get_job_manager().store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
+
+
+async def _job_sse_generator(job, start: int):
+    """
+    Replay a job's events from index `start`, then follow it live until it
+    finishes. Each logged event carries an `id:` so clients can resume with
+    Last-Event-ID; token deltas are sent live only, without one.
+    """
+    store = get_job_manager().store
+    if store.is_local(job.job_id):
+        async for index, payload in job.follow(start, keep_alive=15):
+            if payload is None:
+                # comment line keeps idle connections from being dropped
+                yield ": keep-alive\n\n"
+            elif index is None:
+                yield _sse(payload)
+            else:
+                yield f"id: {index}\n" + _sse(payload)
+        return
+
+    # jobs of sibling worker processes are followed through the job store
+    index = start
+    while True:
+        while index < len(job.events):
+            yield f"id: {index}\n" + _sse(job.events[index])
+            index += 1
+        if job.finished:
+            return
+        job = await store.wait_for_change(job, timeout=15)
+        if index == len(job.events) and not job.finished:
+            yield ": keep-alive\n\n"
+
+
+@router.post("/jobs", response_model=JobCreated, status_code=202)
+async def create_job(query: UserRequest):
+    """
+    Queue a research run in the background and return its job id at once.
+    Poll `/jobs/{id}` or follow `/jobs/{id}/events` for the result.
+    """
+    if model_loader.get_model() is None:
+        raise HTTPException(status_code=503, detail="model not loaded yet")
+
+    job = get_job_manager().submit(query.text, bypass_cache=query.bypass_cache)
+    return JobCreated(job_id=job.job_id, status=job.status)
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    """Return a job's status, progress so far and, once done, its report."""
+    job = _get_job_or_404(job_id)
+    return JobStatus(
+        job_id=job.job_id,
+        topic=job.topic,
+        status=job.status,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        run_id=job.run_id,
+        progress=[e["message"] for e in job.events if e["type"] == "progress"],
+        events=len(job.events),
+        report=job.report,
+        error=job.error,
+    )
+
+
+@router.get("/jobs/{job_id}/events")
+async def get_job_events(job_id: str, after: int | None = None,
+                         last_event_id: str | None = Header(default=None)):
+    """
+    SSE stream of a job's events. Resume after a given event with the
+    `Last-Event-ID` header or the `after` query parameter.
+    """
+    job = _get_job_or_404(job_id)
+    if after is None and last_event_id is not None and last_event_id.isdigit():
+        after = int(last_event_id)
+    start = 0 if after is None else after + 1
+    return StreamingResponse(_job_sse_generator(job, start),
+                             media_type="text/event-stream")
@@ -1,26 +1,77 @@
 """main module"""
 
 import asyncio
+import os
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 import asyncio
 import uvicorn
 
 from app.system.utils.logger import register_http_logging
-from app.system.model.model_loader import load_model
+from app.system.model.model_loader import load_model, get_model_pools
+from app.system.model.warmup import get_model_warmup, start_model_warmup
+from app.system.utils.settings import env_bool, env_float, env_int, env_str
+from app.system.search.client import start_search_client, close_search_client
+from app.system.search.backends import check_search_credentials
+from app.system.jobs import start_job_manager, stop_job_manager
+from app.system.shared import start_shared_state, stop_shared_state
+from app.system.agents.registry import warm_agents
+from app.system.utils.tracing import install_llm_tracing
 from app.interface.routes import router
 from app.system.utils.logger import logger
 
 
 
+def _start_health_checks() -> list:
+    """Probe pooled model servers and eject the failing ones."""
+    pools = get_model_pools()
+    for pool in pools:
+        pool.start_health_checks(env_float("LLM_HEALTH_INTERVAL", 15))
+    return pools
+
+
+async def _reload_models(pools: list) -> None:
+    """Load the models the warm-up ranked fastest and rebuild the agents on them."""
+    await asyncio.to_thread(load_model)
+    warm_agents()
+    for pool in pools:
+        await pool.stop_health_checks()
+    pools[:] = _start_health_checks()
+    logger.info('model reloaded after warm-up')
+
+
 # helper funciton to load model on startup
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # fail fast on a missing search API key (checked here, not at import)
+    check_search_credentials()
     # model
     # Run the blocking load_model in a separate thread so the event loop is not blocked
     await asyncio.to_thread(load_model)
     logger.info('model loaded successfully')
+    # time every LLM call as a span of the run that made it
+    install_llm_tracing()
+    # build the agents once; requests reuse them
+    warm_agents()
+    # probe pooled model servers and eject the failing ones
+    pools = _start_health_checks()
+    # shared, pooled search client reused by every search_web call
+    await start_search_client()
+    # register with sibling worker processes (SHARED_STATE_DIR)
+    await start_shared_state()
+    # background workers for /v1/jobs
+    await start_job_manager()
+    # warm the models in use and measure the other candidates in the
+    # background; a faster ready candidate replaces the loaded model
+    if env_bool("LLM_WARMUP", True):
+        start_model_warmup(lambda: _reload_models(pools))
     yield
+    await stop_job_manager()
+    await stop_shared_state()
+    await get_model_warmup().stop()
+    await close_search_client()
+    for pool in pools:
+        await pool.stop_health_checks()
 
 
 # fastapi object
@@ -31,4 +82,12 @@ app.include_router(router, prefix="/v1")
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8501)
+    # API_WORKERS > 1 serves from several processes, which share caches,
+    # jobs and in-flight runs through SQLite files in SHARED_STATE_DIR
+    workers = env_int("API_WORKERS", 1)
+    if workers > 1:
+        os.environ.setdefault("SHARED_STATE_DIR", os.path.abspath(".state"))
+        uvicorn.run("app.main:app", host=env_str("API_HOST", "127.0.0.1"),
+                    port=env_int("API_PORT", 8501), workers=workers)
+    else:
+        uvicorn.run(app, host=env_str("API_HOST", "127.0.0.1"), port=env_int("API_PORT", 8501))
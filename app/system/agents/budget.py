@@ -0,0 +1,152 @@
+"""module to fit the report's questions and answers into the model's context window"""
+import asyncio
+import hashlib
+import math
+import re
+
+from ..model import model_loader
+from ..utils.logger import logger
+from ..utils.settings import env_int
+from ..utils.tracing import span
+
+
+# words and punctuation; subword tokenizers split roughly one in five words further
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_TOKENS_PER_PIECE = 1.2
+_URL = re.compile(r"https?://[^\s)\]>,\"']+")
+
+SUMMARY_PROMPT = """Condense the following research questions and answers to at
+most about {words} words. Keep every question, every concrete fact, number
+and name, and keep each citation (URLs and [n] references) next to the fact
+it supports. Return only the condensed text, without preamble.
+
+{text}"""
+
+
+def count_tokens(text: str) -> int:
+    """Estimate how many tokens `text` takes in the model's context."""
+    return math.ceil(len(_TOKEN.findall(text)) * _TOKENS_PER_PIECE)
+
+
+def truncate_tokens(text: str, tokens: int) -> str:
+    """Cut `text` to about `tokens` tokens, marking the cut."""
+    keep = int(tokens / _TOKENS_PER_PIECE)
+    for index, match in enumerate(_TOKEN.finditer(text)):
+        if index == keep:
+            return text[: match.start()].rstrip() + " ..."
+    return text
+
+
+def cited_urls(text: str) -> list[str]:
+    """Return the URLs cited in `text`, in order and without repeats."""
+    return list(dict.fromkeys(url.rstrip(".") for url in _URL.findall(text)))
+
+
+def context_window_of(llm, default: int) -> int:
+    """Return the context window an LLM reports, or `default`."""
+    try:
+        return int(llm.metadata.context_window)
+    except Exception:
+        return default
+
+
+class LLMSummarizer:
+    """Summarizes text with a plain completion call on the `summary` role model."""
+    def __init__(self, llm=None, role: str = "summary") -> None:
+        self.llm = llm
+        self.role = role
+
+    async def __call__(self, text: str, target_tokens: int) -> str:
+        llm = self.llm or model_loader.get_role_model(self.role)
+        if llm is None:
+            raise RuntimeError("Model not loaded yet")
+        words = max(20, int(target_tokens / _TOKENS_PER_PIECE))
+        response = await llm.acomplete(SUMMARY_PROMPT.format(words=words, text=text))
+        return response.text.strip()
+
+
+class ContextBudgeter:
+    """
+    Keeps the questions and answers of the report prompt within the
+    model's context window, minus `reserve` tokens for the report itself.
+    When they don't fit, consecutive sections are grouped and every group
+    is summarized in parallel (map), and the summaries are grouped and
+    summarized again until the text fits (reduce). URLs a summary dropped
+    are appended to it, so cited evidence survives. Summaries are memoized,
+    so the answers of earlier review cycles are only condensed once.
+    """
+    def __init__(self, context_window: int, reserve: int = 2048, summarize=None,
+                 group_tokens: int | None = None, max_depth: int = 3) -> None:
+        self.context_window = context_window
+        self.reserve = reserve
+        self.summarize = summarize or LLMSummarizer()
+        # one map call has to hold its group, the instructions and the summary
+        self.group_tokens = group_tokens or max(256, (context_window - reserve) // 2)
+        self.max_depth = max_depth
+        self.compressions = 0
+        self._summaries: dict[str, str] = {}
+
+    def available(self, prompt: str) -> int:
+        """Tokens left for answers once `prompt` and the reserve are placed."""
+        return max(0, self.context_window - self.reserve - count_tokens(prompt))
+
+    def groups(self, sections: list[str]) -> list[list[str]]:
+        """Pack consecutive sections into groups of at most `group_tokens`."""
+        groups, current, size = [], [], 0
+        for section in sections:
+            tokens = count_tokens(section)
+            if current and size + tokens > self.group_tokens:
+                groups.append(current)
+                current, size = [], 0
+            current.append(section)
+            size += tokens
+        if current:
+            groups.append(current)
+        return groups
+
+    async def _condense(self, group: list[str], target: int) -> str:
+        text = "".join(group)
+        key = hashlib.sha1(f"{target}|{text}".encode("utf-8")).hexdigest()
+        if key in self._summaries:
+            return self._summaries[key]
+        try:
+            summary = await self.summarize(truncate_tokens(text, self.group_tokens), target)
+        except Exception as err:
+            logger.warning(f"Summarizing answers failed, truncating instead: {err}")
+            summary = truncate_tokens(text, target)
+        missing = [url for url in cited_urls(text) if url not in summary]
+        if missing:
+            summary += "\nSources: " + ", ".join(missing)
+        summary = summary.strip() + "\n\n"
+        self._summaries[key] = summary
+        return summary
+
+    async def fit(self, sections: list[str], budget: int) -> str:
+        """Return `sections` joined, condensed first if they exceed `budget` tokens."""
+        text = "".join(sections)
+        if count_tokens(text) <= budget:
+            return text
+        self.compressions += 1
+        with span("context.compress", kind="step", sections=len(sections), budget=budget):
+            for _ in range(self.max_depth):
+                groups = self.groups(sections)
+                sizes = [count_tokens("".join(group)) for group in groups]
+                # every group gets a share of the budget in proportion to its size
+                targets = [max(32, budget * size // sum(sizes)) for size in sizes]
+                sections = await asyncio.gather(*(
+                    self._condense(group, target) for group, target in zip(groups, targets, strict=True)))
+                text = "".join(sections)
+                if count_tokens(text) <= budget:
+                    return text
+        return truncate_tokens(text, budget)
+
+
+def build_context_budgeter(report_llm=None) -> ContextBudgeter:
+    """
+    Create a budgeter for the model writing the report, reading its context
+    window (see CONTEXT_WINDOWS in model/llms.py) and reserving
+    REPORT_OUTPUT_TOKENS for the report.
+    """
+    llm = report_llm or model_loader.get_role_model("report")
+    window = context_window_of(llm, env_int("LLM_CONTEXT_WINDOW", 8192))
+    return ContextBudgeter(window, reserve=env_int("REPORT_OUTPUT_TOKENS", 2048))
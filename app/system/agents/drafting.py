@@ -0,0 +1,79 @@
+"""module to gather a cycle's answers for the report under a straggler deadline"""
+from ..utils.events import AnswerEvent
+
+
+MISSING_ANSWER = "[missing: research did not finish before the deadline]"
+
+
+def format_answer(answer: AnswerEvent) -> str:
+    """Render one question and its answer for the report prompt."""
+    return f"Question: {answer.question}\nAnswer: {answer.answer}\n\n"
+
+
+class DraftOutline:
+    """
+    Answers of one research cycle, recorded as they arrive. The report is
+    written in a single pass once every question is answered or the
+    straggler deadline passes, with the unanswered questions marked missing.
+    """
+    def __init__(self, questions: list[str], cycle: int) -> None:
+        self.questions = questions
+        self.cycle = cycle
+        self.answers: dict[int, AnswerEvent] = {}
+        self.finalized = False
+
+    @property
+    def total(self) -> int:
+        return len(self.questions)
+
+    @property
+    def answered(self) -> int:
+        return len(self.answers)
+
+    @property
+    def complete(self) -> bool:
+        return self.answered >= self.total
+
+    def add(self, answer: AnswerEvent) -> bool:
+        """Record an answer; False if it is stale or a repeat."""
+        if self.finalized or answer.cycle != self.cycle or answer.index in self.answers:
+            return False
+        self.answers[answer.index] = answer
+        return True
+
+    def missing(self) -> list[str]:
+        """Return the questions that have no answer yet."""
+        return [question for index, question in enumerate(self.questions)
+                if index not in self.answers]
+
+    def sections(self) -> list[str]:
+        """Return every section in question order, marking missing answers."""
+        return [format_answer(self.answers[index]) if index in self.answers
+                else f"Question: {question}\nAnswer: {MISSING_ANSWER}\n\n"
+                for index, question in enumerate(self.questions)]
+
+    def render(self) -> str:
+        return "".join(self.sections())
+
+
+class AnswerLedger:
+    """
+    Every answer gathered during a run, kept across review cycles so a
+    feedback cycle only has to research the questions that are new.
+    """
+    def __init__(self) -> None:
+        self.entries: list[AnswerEvent] = []
+
+    @property
+    def questions(self) -> list[str]:
+        return [entry.question for entry in self.entries]
+
+    def record(self, outline: DraftOutline) -> None:
+        """Keep the answered sections of a finalized outline."""
+        self.entries.extend(outline.answers[index] for index in sorted(outline.answers))
+
+    def sections(self) -> list[str]:
+        return [format_answer(entry) for entry in self.entries]
+
+    def render(self) -> str:
+        return "".join(self.sections())
@@ -0,0 +1,86 @@
+"""module to keep the notes, report and review the agents record during a run"""
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import sys
+import threading
+
+from ..utils.settings import env_int
+
+
+class RunNotes:
+    """
+    Bounded notes of one research run. Notes are only ever appended, each
+    under a lock, so concurrent research agents cannot overwrite each
+    other. A note longer than `max_note_chars` is truncated and once the
+    notes exceed `max_chars` in total the oldest are dropped.
+    """
+    def __init__(self, max_notes: int = 256, max_chars: int = 200_000,
+                 max_note_chars: int = 8_000) -> None:
+        self.max_notes = max_notes
+        self.max_chars = max_chars
+        self.max_note_chars = max_note_chars
+        self.notes: deque[tuple[str, str]] = deque()
+        self.report: str | None = None
+        self.review: str | None = None
+        self.chars = 0
+        self.truncated = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def append(self, title: str, text: str) -> None:
+        if len(text) > self.max_note_chars:
+            text = text[: self.max_note_chars] + " ..."
+            self.truncated += 1
+        with self._lock:
+            self.notes.append((title, text))
+            self.chars += len(title) + len(text)
+            while self.notes and (len(self.notes) > self.max_notes
+                                  or self.chars > self.max_chars):
+                old_title, old_text = self.notes.popleft()
+                self.chars -= len(old_title) + len(old_text)
+                self.dropped += 1
+
+    def render(self) -> str:
+        """Return every note under its title, oldest first."""
+        with self._lock:
+            notes = list(self.notes)
+        return "\n\n".join(f"## {title}\n{text}" for title, text in notes)
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by the stored text."""
+        with self._lock:
+            strings = [text for note in self.notes for text in note]
+        strings += [text for text in (self.report, self.review) if text]
+        return sys.getsizeof(self.notes) + sum(sys.getsizeof(text) for text in strings)
+
+    def describe(self) -> dict:
+        return {"notes": len(self.notes), "chars": self.chars,
+                "truncated": self.truncated, "dropped": self.dropped,
+                "bytes": self.memory_bytes()}
+
+
+def build_run_notes() -> RunNotes:
+    """Create a run's notes store from NOTES_MAX_COUNT, NOTES_MAX_CHARS and NOTE_MAX_CHARS."""
+    return RunNotes(max_notes=env_int("NOTES_MAX_COUNT", 256),
+                    max_chars=env_int("NOTES_MAX_CHARS", 200_000),
+                    max_note_chars=env_int("NOTE_MAX_CHARS", 8_000))
+
+
+# notes of the run the current task belongs to
+_current_notes: ContextVar[RunNotes | None] = ContextVar("run_notes", default=None)
+
+
+def current_notes() -> RunNotes | None:
+    """Return the notes of the run being executed, if any."""
+    return _current_notes.get()
+
+
+@contextmanager
+def use_notes(notes: RunNotes):
+    """Make `notes` the current run's notes; tasks created inside inherit them."""
+    token = _current_notes.set(notes)
+    try:
+        yield notes
+    finally:
+        _current_notes.reset(token)
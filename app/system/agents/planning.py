@@ -0,0 +1,191 @@
+"""module to plan which questions are worth researching"""
+import asyncio
+import re
+
+import numpy as np
+
+from ..utils.text import terms
+
+
+# words a question can open with when the model leaves off the question mark
+QUESTION_WORDS = frozenset("""
+what how why who whom whose when where which is are was were do does did can
+could should would will has have had
+""".split())
+
+# list markers and emphasis models put in front of questions
+_MARKER = re.compile(r"^\s*(?:[-*•>]+|\(?\d+[.):]|\(?[a-z][.)]|q\d*[.:)]|question\s*\d*[.:)])?\s*",
+                     re.IGNORECASE)
+
+
+class QuestionPlan:
+    """
+    Outcome of planning one batch of generated questions: the questions
+    to research, the near-duplicates merged into each of them and
+    everything that was left out, by reason.
+    """
+    def __init__(self) -> None:
+        self.questions: list[str] = []
+        self.merged: dict[str, list[str]] = {}
+        self.rejected: list[str] = []
+        self.repeated: list[str] = []
+        self.over_budget: list[str] = []
+
+    @property
+    def skipped(self) -> int:
+        return (len(self.rejected) + len(self.repeated) + len(self.over_budget)
+                + sum(len(members) for members in self.merged.values()))
+
+
+def clean_question(line: str) -> str | None:
+    """
+    Strip list markers and emphasis from a generated line and return it if
+    it reads as a question (a question mark, or an opening question word),
+    else None. Preamble such as "Here are some questions:" is rejected.
+    """
+    text = _MARKER.sub("", line.replace("**", "").replace("__", "")).strip().strip('"')
+    if not text or text.endswith(":"):
+        return None
+    if text.endswith("?"):
+        return text
+    words = text.split()
+    if len(words) >= 3 and words[0].lower() in QUESTION_WORDS:
+        return text
+    return None
+
+
+def tfidf_vectors(texts: list[str]):
+    """
+    L2-normalized TF-IDF rows for `texts` over their content words, with
+    smoothed idf so words shared by every text (the topic) weigh little.
+    """
+    tokenized = [terms(text) for text in texts]
+    vocabulary = {term: column for column, term in
+                  enumerate(sorted({term for words in tokenized for term in words}))}
+    counts = np.zeros((len(texts), len(vocabulary)), dtype=np.float32)
+    for row, words in enumerate(tokenized):
+        for term in words:
+            counts[row, vocabulary[term]] += 1.0
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1.0
+    vectors = np.log1p(counts) * idf
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def _clusters(similarity, threshold: float) -> list[list[int]]:
+    """Group rows linked by similarity >= threshold (single linkage), in row order."""
+    parent = list(range(len(similarity)))
+
+    def root(node: int) -> int:
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for a, b in zip(*np.nonzero(np.triu(similarity >= threshold, k=1)), strict=True):
+        parent[max(root(a), root(b))] = min(root(a), root(b))
+    groups: dict[int, list[int]] = {}
+    for node in range(len(parent)):
+        groups.setdefault(root(node), []).append(node)
+    return list(groups.values())
+
+
+def _candidates(lines: list[str], plan: QuestionPlan) -> list[str]:
+    """Return the cleaned questions among `lines`, recording the rest as rejected."""
+    candidates = []
+    for line in lines:
+        question = clean_question(line)
+        if question is None:
+            if line.strip():
+                plan.rejected.append(line.strip())
+        else:
+            candidates.append(question)
+    if not candidates:
+        # the model ignored the format entirely; better its lines than nothing
+        candidates = [line for line in plan.rejected if not line.endswith(":")]
+        plan.rejected = [line for line in plan.rejected if line.endswith(":")]
+    return candidates
+
+
+def plan_questions(lines: list[str], answered: list[str], threshold: float = 0.7,
+                   budget: int = 0) -> QuestionPlan:
+    """
+    Turn raw model output lines into the questions worth researching:
+    non-questions are dropped (unless no line reads as a question),
+    questions close to an answered one are skipped, near-duplicates are
+    clustered by TF-IDF cosine similarity and merged into their most
+    central member, and at most `budget` clusters (0 for no limit) are
+    kept, preferring bigger clusters, then earlier ones.
+    """
+    plan = QuestionPlan()
+    candidates = _candidates(lines, plan)
+    if not candidates:
+        return plan
+
+    vectors = tfidf_vectors([*candidates, *answered])
+    similarity = vectors[: len(candidates)] @ vectors.T
+    if answered:
+        repeats = similarity[:, len(candidates):].max(axis=1) >= threshold
+        plan.repeated = [question for question, repeat in zip(candidates, repeats, strict=True) if repeat]
+        fresh = [index for index, repeat in enumerate(repeats) if not repeat]
+    else:
+        fresh = list(range(len(candidates)))
+    within = similarity[np.ix_(fresh, fresh)]
+
+    clusters = []
+    for members in _clusters(within, threshold):
+        # the member closest to the rest of its cluster stands for it
+        centrality = within[np.ix_(members, members)].sum(axis=1)
+        clusters.append((members, members[int(np.argmax(centrality))]))
+    ranked = sorted(clusters, key=lambda cluster: (-len(cluster[0]), cluster[0][0]))
+    kept = ranked[:budget] if budget > 0 else ranked
+    for members, _ in ranked[len(kept):]:
+        plan.over_budget += [candidates[fresh[index]] for index in members]
+    # research in the order the model asked
+    for members, representative in sorted(kept, key=lambda cluster: cluster[0][0]):
+        question = candidates[fresh[representative]]
+        plan.questions.append(question)
+        others = [candidates[fresh[index]] for index in members if index != representative]
+        if others:
+            plan.merged[question] = others
+    return plan
+
+
+class AnswerMemo:
+    """
+    Answers shared by the runs of one batch. A question that repeats one
+    another run has answered, or is researching right now, gets that
+    answer instead of being researched again.
+    """
+    def __init__(self, threshold: float = 0.85) -> None:
+        self.threshold = threshold
+        self.questions: list[str] = []
+        self.answers: list[asyncio.Future] = []
+        self.reused = 0
+
+    def claim(self, question: str) -> tuple[asyncio.Future, bool]:
+        """
+        Return the future answer of `question` and whether the caller owns
+        it. The owner researches the question and must `resolve` it.
+        """
+        if self.questions:
+            vectors = tfidf_vectors([question, *self.questions])
+            similarity = vectors[1:] @ vectors[0]
+            best = int(np.argmax(similarity))
+            if similarity[best] >= self.threshold:
+                self.reused += 1
+                return self.answers[best], False
+        future = asyncio.get_running_loop().create_future()
+        self.questions.append(question)
+        self.answers.append(future)
+        return future, True
+
+    def resolve(self, question: str, answer: str | None) -> None:
+        """Publish the owner's answer; None (research failed) frees the question."""
+        index = self.questions.index(question)
+        future = self.answers[index]
+        if answer is None:
+            del self.questions[index], self.answers[index]
+        if not future.done():
+            future.set_result(answer)
@@ -0,0 +1,74 @@
+"""module to keep warm agent instances instead of rebuilding them per request
+
+Agents keep no per-run state of their own: every `agent.run()` creates a
+fresh Context holding its memory and tool state. A single instance per role
+can therefore be shared by concurrent workflow runs, and is only rebuilt
+when the model behind the role changes. The agent modules (and llama-index
+with them) are imported when the first agent is built.
+"""
+import importlib
+
+from ..model import model_loader
+from ..utils.logger import logger
+
+
+# agent factory (module, function) per role, resolved at build time so they can be swapped
+AGENT_FACTORIES = {
+    "question": ("research_agents", "get_question_agent"),
+    "research": ("research_agents", "get_research_agent"),
+    "report": ("write_agents", "get_report_agent"),
+    "review": ("review_agents", "get_review_agent"),
+}
+
+
+class AgentRegistry:
+    """Builds each role's agent once and hands the same instance out."""
+    def __init__(self) -> None:
+        self._agents: dict[str, object] = {}
+        self._models: dict[str, object] = {}
+        self.builds = 0
+
+    def _build(self, role: str):
+        module, name = AGENT_FACTORIES[role]
+        agent = getattr(importlib.import_module(f".{module}", __package__), name)()
+        self._agents[role] = agent
+        self._models[role] = model_loader.get_role_model(role)
+        self.builds += 1
+        return agent
+
+    def warm(self) -> None:
+        """Build every role's agent up front (called once the model is loaded)."""
+        for role in AGENT_FACTORIES:
+            self._build(role)
+        logger.info(f"Warmed {len(AGENT_FACTORIES)} agents")
+
+    def get(self, role: str):
+        """Return the warm agent for `role`, rebuilding it if its model changed."""
+        agent = self._agents.get(role)
+        if agent is None or self._models.get(role) is not model_loader.get_role_model(role):
+            agent = self._build(role)
+        return agent
+
+    def clear(self) -> None:
+        self._agents.clear()
+        self._models.clear()
+
+
+# until first use, the registry does not exist
+_registry: AgentRegistry | None = None
+
+
+def get_agent_registry() -> AgentRegistry:
+    """Return the process-wide agent registry."""
+    global _registry
+    if _registry is None:
+        _registry = AgentRegistry()
+    return _registry
+
+
+def warm_agents() -> AgentRegistry:
+    """Build every agent for the freshly loaded model; called from the lifespan."""
+    registry = get_agent_registry()
+    registry.clear()
+    registry.warm()
+    return registry
@@ -6,8 +6,8 @@ stale `None` model at import time and avoids blocking imports.
 """
 
 from llama_index.core.agent.workflow import FunctionAgent
-from ..tools import search_web, record_notes
-from ..model.model_loader import get_model
+from ..tools import search_local, search_web, record_notes
+from ..model import model_loader
 
 
 def get_question_agent():
@@ -15,7 +15,7 @@ def get_question_agent():
 
     Raises RuntimeError if the model is not yet loaded.
     """
-    llm = get_model()
+    llm = model_loader.get_role_model("question")
     if llm is None:
         raise RuntimeError("Model not loaded yet")
 
@@ -34,19 +34,20 @@ def get_question_agent():
 
 def get_research_agent():
     """Return the research agent which can search the web and record notes."""
-    llm = get_model()
+    llm = model_loader.get_role_model("research")
     if llm is None:
         raise RuntimeError("Model not loaded yet")
 
     return FunctionAgent(
         system_prompt=(
-            "You are the ResearchAgent that can search the web for\
-            information on a given topic and record notes on the topic. "
+            "You are the ResearchAgent that can search local evidence\
+            from earlier research and the web for information on a given\
+            topic and record notes on the topic. "
             "Once notes are recorded, you should hand off \
             control to a seperate Agent to write a report on the topic."
             "if search results turn up empty, signify without fail."
         ),
         llm=llm,
-        tools=[search_web, record_notes],
+        tools=[search_local, search_web, record_notes],
         verbose=False,
     )
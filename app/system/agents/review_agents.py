@@ -1,11 +1,11 @@
 from llama_index.core.agent.workflow import FunctionAgent
 from ..tools import review_report
-from ..model.model_loader import get_model
+from ..model import model_loader
 
 
 def get_review_agent():
     """Create and return the review agent using the current model."""
-    llm = get_model()
+    llm = model_loader.get_role_model("review")
     if llm is None:
         raise RuntimeError("Model not loaded yet")
 
@@ -0,0 +1,122 @@
+"""module to judge whether a report needs another research cycle"""
+import json
+import re
+
+from .planning import clean_question
+from ..utils.text import terms
+
+
+REVIEW_PROMPT = """You are part of a deep research system. Review this report
+about the topic {topic} and decide whether it is sufficiently comprehensive.
+<report>{report}</report>
+Reply with JSON only, in this form:
+{{"verdict": "ACCEPTABLE" or "NEEDS_MORE_RESEARCH",
+  "missing_questions": ["a question the report should also answer", ...]}}
+Leave missing_questions empty when the report is acceptable."""
+
+_ACCEPT = {"acceptable", "accept", "accepted", "yes", "true", "pass", "ok", "approved"}
+# whole phrases only, so "ACCEPTABLE. No further questions." still accepts
+_REJECTION = re.compile(r"\b(?:(?:not|t|never|hardly)\s+(?:\w+\s+)?acceptable|unacceptable"
+                        r"|insufficient|incomplete|lacks|needs more)\b")
+_THINK = re.compile(r"<think>.*?</think>", re.DOTALL | re.IGNORECASE)
+
+
+class Verdict:
+    """Outcome of a review and who decided it (precheck, llm or agent)."""
+    def __init__(self, acceptable: bool, missing: list[str] | None = None,
+                 feedback: str = "", source: str = "llm") -> None:
+        self.acceptable = acceptable
+        self.missing = missing or []
+        self.feedback = feedback
+        self.source = source
+
+    @property
+    def follow_up(self) -> str:
+        """Feedback for the next question round: the missing questions if known."""
+        return "\n".join(self.missing) if self.missing else self.feedback
+
+    def __repr__(self) -> str:
+        return f"Verdict(acceptable={self.acceptable}, missing={self.missing}, source={self.source!r})"
+
+
+def _json_object(text: str) -> dict | None:
+    """Return the outermost JSON object in `text`, if there is one."""
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end <= start:
+        return None
+    try:
+        value = json.loads(text[start: end + 1])
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def _is_accept(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().strip(".!").lower().replace(" ", "_") in _ACCEPT
+
+
+def parse_verdict(text: str, source: str = "llm") -> Verdict:
+    """
+    Read a review reply leniently: a JSON verdict (inside code fences or
+    prose too), or a plain reply that says ACCEPTABLE in any case and with
+    any punctuation. Anything else asks for more research, with the
+    questions found in the reply as follow-ups.
+    """
+    text = _THINK.sub("", text).strip()
+    data = _json_object(text)
+    if data is not None:
+        verdict = next((data[key] for key in ("verdict", "acceptable", "status", "decision")
+                        if key in data), None)
+        missing = next((data[key] for key in ("missing_questions", "questions", "missing")
+                        if key in data), [])
+        if isinstance(missing, str):
+            missing = [missing]
+        missing = [str(question).strip() for question in missing if str(question).strip()]
+        if verdict is not None:
+            return Verdict(_is_accept(verdict) and not missing, missing, text, source)
+
+    missing = [question for line in text.splitlines()
+               if (question := clean_question(line)) is not None]
+    plain = " ".join(re.sub(r"[^a-z ]", " ", text.lower()).split())
+    if "acceptable" in plain.split() and not missing and not _REJECTION.search(plain):
+        return Verdict(True, source=source)
+    return Verdict(False, missing, text, source)
+
+
+def uncovered(report: str, questions: list[str], term_share: float = 0.6) -> list[str]:
+    """The `questions` whose content words mostly do not appear in `report`."""
+    report_terms = set(terms(report))
+    missed = []
+    for question in questions:
+        question_terms = set(terms(question))
+        if not question_terms or len(question_terms & report_terms) < term_share * len(question_terms):
+            missed.append(question)
+    return missed
+
+
+def coverage(report: str, questions: list[str], term_share: float = 0.6) -> float:
+    """Share of `questions` whose content words mostly appear in `report`."""
+    if not questions:
+        return 0.0
+    return 1 - len(uncovered(report, questions, term_share)) / len(questions)
+
+
+def precheck(report: str, questions: list[str], min_coverage: float = 0.9,
+             min_words: int = 150) -> Verdict | None:
+    """
+    Reject a report without an LLM call when it is too short or leaves out
+    researched questions. A report passing both is not accepted here: only
+    the review model can tell which questions were never asked, so None
+    leaves the decision to it.
+    """
+    words = len(report.split())
+    if words < min_words:
+        return Verdict(False, feedback=f"The report is only {words} words long; "
+                                       "cover every answer in more depth.", source="precheck")
+    if questions and coverage(report, questions) < min_coverage:
+        missed = "\n".join(uncovered(report, questions))
+        return Verdict(False, feedback="The report leaves out the answers to these "
+                                       f"questions:\n{missed}", source="precheck")
+    return None
@@ -1,4 +1,6 @@
 """module to hgandle workflow orchestration"""
+import asyncio
+
 from llama_index.core.workflow import (
     StartEvent,
     StopEvent,
@@ -6,6 +8,7 @@ from llama_index.core.workflow import (
     Workflow,
     step
 )
+from llama_index.core.agent.workflow import AgentStream
 
 # third pary modules
 from ..utils.events import (
@@ -15,7 +18,23 @@ from ..utils.events import (
     ProgressEvent,
     FeedbackEvent,
     ReviewEvent,
+    QueuedEvent,
+    ReportDeltaEvent,
+    ReviewDeltaEvent,
+    StragglerTimerEvent,
+    StragglerDeadlineEvent,
+    OutlineReadyEvent,
 )
+from ..utils.concurrency import PriorityLimiter, get_answer_limiter
+from ..utils.settings import env_bool, env_int, env_float, env_str
+from ..utils.tracing import span, traced
+from ..utils.metrics import (
+    QUESTIONS_PER_RUN, QUESTIONS_SKIPPED, REVIEW_CYCLES_PER_RUN, REVIEW_DECISIONS)
+from .budget import ContextBudgeter, build_context_budgeter, count_tokens, truncate_tokens
+from .drafting import DraftOutline, AnswerLedger
+from .notes import current_notes
+from .planning import plan_questions
+from .reviewing import REVIEW_PROMPT, Verdict, parse_verdict, precheck
 
 
 # planner agent
@@ -24,20 +43,60 @@ class WorkflowClass(Workflow):
     This is central hub that controls how the agents interacts
     to answer questions
     """
+    def __init__(self, *args, answer_concurrency: int | None = None,
+                 straggler_deadline: float | None = None,
+                 budgeter: ContextBudgeter | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # keeps the report prompt inside the report model's context window
+        self.budgeter = budgeter
+        # how many questions of this run may be researched at the same time
+        self.answer_concurrency = answer_concurrency or env_int(
+            "ANSWER_RUN_CONCURRENCY", 4)
+        # seconds to wait for slow answers before writing without them (0 = wait)
+        self.straggler_deadline = (
+            straggler_deadline if straggler_deadline is not None
+            else env_float("REPORT_STRAGGLER_DEADLINE", 120))
+
+    async def _run_streaming(self, ctx: Context, role: str, agent, user_msg: str,
+                             delta_event, cycle: int):
+        """
+        Run `agent`, forwarding each streamed token chunk to the client as
+        `delta_event(delta=..., cycle=...)` before returning the final result.
+        """
+        with span(f"agent.{role}", kind="agent", cycle=cycle):
+            handler = agent.run(user_msg=user_msg)
+            if hasattr(handler, "stream_events"):
+                async for event in handler.stream_events():
+                    if isinstance(event, AgentStream) and event.delta:
+                        ctx.write_event_to_stream(delta_event(delta=event.delta, cycle=cycle))
+            return await handler
+
     @step
+    @traced("step.setup", kind="step")
     async def setup(self, ctx: Context, ev: StartEvent) -> GenerateEvent:
         self.question_agent = ev.question_agent
         self.answer_agent = ev.answer_agent
         self.report_agent = ev.report_agent
         self.review_agent = ev.review_agent
         self.review_cycles = 0
+        self.answer_limiter = PriorityLimiter(self.answer_concurrency)
+        # answers from every cycle, so feedback cycles only research the delta
+        self.ledger = AnswerLedger()
+        self.questions_asked = 0
+        # answers shared with the other runs of a batch, if this run is in one
+        self.answer_memo = ev.get("answer_memo")
+        if self.budgeter is None:
+            self.budgeter = build_context_budgeter(getattr(self.report_agent, "llm", None))
 
         ctx.write_event_to_stream(ProgressEvent(msg="Starting research"))
 
         return GenerateEvent(research_topic=ev.research_topic)
 
     @step
-    async def generate_questions(self, ctx: Context, ev: GenerateEvent | FeedbackEvent) -> QuestionEvent:
+    @traced("step.generate_questions", kind="step")
+    async def generate_questions(self, ctx: Context,
+                                 ev: GenerateEvent | FeedbackEvent,
+                                 ) -> QuestionEvent | StragglerTimerEvent | OutlineReadyEvent:
 
         await ctx.store.set("research_topic", ev.research_topic)
         ctx.write_event_to_stream(ProgressEvent(msg=f"Research topic is {ev.research_topic}"))
@@ -50,84 +109,222 @@ class WorkflowClass(Workflow):
                 got the following feedback, consisting of additional questions
                 you might want to ask: <feedback>{ev.feedback}</feedback>.
                 Keep this in mind when formulating your questions."""
+            answered = "\n".join(self.ledger.questions)
+            prompt += f"""These questions have already been answered, so only
+                list new questions that are not covered by them:
+                <answered>{answered}</answered>"""
 
-        result = await self.question_agent.run(user_msg=prompt)
+        with span("agent.question", kind="agent"):
+            result = await self.question_agent.run(user_msg=prompt)
 
-        # Some basic string manipulation to get separate questions
-        lines = str(result).split("\n")
-        questions = [line.strip() for line in lines if line.strip() != ""]
+        # keep distinct questions only, within the per-cycle budget
+        plan = plan_questions(
+            str(result).split("\n"), self.ledger.questions,
+            threshold=env_float("QUESTION_DEDUP_THRESHOLD", 0.7),
+            budget=env_int("QUESTION_BUDGET", 8))
+        questions = plan.questions
+        skipped = {"merged": sum(len(members) for members in plan.merged.values()),
+                   "repeated": len(plan.repeated), "rejected": len(plan.rejected),
+                   "over_budget": len(plan.over_budget)}
+        for reason, count in skipped.items():
+            QUESTIONS_SKIPPED.labels(reason).inc(count)
+        if plan.skipped:
+            ctx.write_event_to_stream(ProgressEvent(
+                msg=f"Planned {len(questions)} question(s), skipped "
+                    + ", ".join(f"{count} {reason.replace('_', ' ')}"
+                                for reason, count in skipped.items() if count)))
 
         # Record how many answers we're going to need to wait for
         await ctx.store.set("total_questions", len(questions))
+        self.questions_asked += len(questions)
+        cycle = self.review_cycles + 1
+        self.outline = DraftOutline(questions, cycle)
 
         # Fire off multiple Answer Agents
-        for question in questions:
-            ctx.send_event(QuestionEvent(question=question))
+        for index, question in enumerate(questions):
+            ctx.send_event(QuestionEvent(question=question, index=index, cycle=cycle))
+        if not questions:
+            # nothing new to research: rewrite the report from the ledger
+            ctx.send_event(OutlineReadyEvent(cycle=cycle))
+        elif self.straggler_deadline > 0:
+            ctx.send_event(StragglerTimerEvent(cycle=cycle, seconds=self.straggler_deadline))
 
-    @step
+    # concurrency is bounded by the run and global limiters, not by workers
+    @step(num_workers=env_int("ANSWER_MAX_WORKERS", 64))
+    @traced("step.answer_question", kind="step")
     async def answer_question(self, ctx: Context, ev: QuestionEvent) -> AnswerEvent:
 
-        result = await self.answer_agent.run(user_msg=f"""Research the answer to this
-          question: <question>{ev.question}</question>. You can use web
-          search to help you find information on the topic, as many times
-          as you need. Return just the answer without preamble or markdown.""")
+        memo = self.answer_memo
+        while memo is not None:
+            answer, owner = memo.claim(ev.question)
+            if owner:
+                break
+            # another run of the batch asked this already
+            reused = await asyncio.shield(answer)
+            if reused is not None:
+                ctx.write_event_to_stream(ProgressEvent(
+                    msg=f"Reused the batch's answer to {ev.question}"))
+                return AnswerEvent(question=ev.question, answer=reused,
+                                   index=ev.index, cycle=ev.cycle)
+            # its research failed: claim the question again
+
+        try:
+            result = await self._research(ctx, ev)
+        except BaseException:
+            if memo is not None:
+                memo.resolve(ev.question, None)
+            raise
+        if memo is not None:
+            memo.resolve(ev.question, result)
+        return AnswerEvent(question=ev.question, answer=result,
+                           index=ev.index, cycle=ev.cycle)
+
+    async def _research(self, ctx: Context, ev: QuestionEvent) -> str:
+        """Research one question with the answer agent, within the fan-out limits."""
+        global_limiter = get_answer_limiter()
+        if self.answer_limiter.would_block() or global_limiter.would_block():
+            ctx.write_event_to_stream(QueuedEvent(
+                question=ev.question,
+                position=self.answer_limiter.waiting + global_limiter.waiting + 1))
+
+        # lower question index is served first in both queues
+        async with self.answer_limiter.slot(ev.index), global_limiter.slot(ev.index):
+            with span("agent.research", kind="agent", index=ev.index):
+                result = await self.answer_agent.run(user_msg=f"""Research the answer to this
+                  question: <question>{ev.question}</question>. Check local evidence
+                  from earlier research first, and use web search when it has no
+                  confident answer, as many times as you need. Return just the
+                  answer without preamble or markdown.""")
 
         ctx.write_event_to_stream(ProgressEvent(msg=f"""Received question {ev.question}
             Came up with answer: {str(result)}"""))
-
-        return AnswerEvent(question=ev.question,answer=str(result))
+        return str(result)
 
     @step
-    async def write_report(self, ctx: Context, ev: AnswerEvent) -> ReviewEvent:
+    @traced("step.straggler_timer", kind="step")
+    async def straggler_timer(self, ctx: Context, ev: StragglerTimerEvent) -> StragglerDeadlineEvent:
+        await asyncio.sleep(ev.seconds)
+        return StragglerDeadlineEvent(cycle=ev.cycle)
+
+    # a single worker so answers are recorded one at a time
+    @step(num_workers=1)
+    @traced("step.write_report", kind="step")
+    async def write_report(self, ctx: Context,
+                           ev: AnswerEvent | StragglerDeadlineEvent | OutlineReadyEvent,
+                           ) -> ReviewEvent:
 
-        # CODE: store the answers in a variable
-        research = ctx.collect_events(ev, [AnswerEvent] * await ctx.get("total_questions"))
-        # If we haven't received all the answers yet, this will be None
-        if research is None:
-            ctx.write_event_to_stream(ProgressEvent(msg="Collecting answers..."))
+        outline = self.outline
+        # answers or deadlines from an earlier cycle, or after the final pass
+        if outline.finalized or ev.cycle != outline.cycle:
             return None
 
+        if isinstance(ev, AnswerEvent):
+            # record each answer; the report waits for the rest or the deadline
+            outline.add(ev)
+            ctx.write_event_to_stream(ProgressEvent(
+                msg=f"Collecting answers... ({outline.answered}/{outline.total})"))
+            if not outline.complete:
+                return None
+        elif isinstance(ev, StragglerDeadlineEvent):
+            missing = outline.missing()
+            ctx.write_event_to_stream(ProgressEvent(
+                msg=f"Straggler deadline passed with {len(missing)} answer(s) missing; "
+                    f"writing the report with {outline.answered}/{outline.total}"))
+
+        outline.finalized = True
         ctx.write_event_to_stream(ProgressEvent(msg="Generating report..."))
 
-        # Aggregate the questions and answers
-        all_answers = ""
-        for q_and_a in research:
-            all_answers += f"Question: {q_and_a.question}\nAnswer: {q_and_a.answer}\n\n"
+        # Aggregate the questions and answers of earlier cycles and this one
+        sections = self.ledger.sections() + outline.sections()
+        self.ledger.record(outline)
+
+        # notes the research agents recorded along the way, if any
+        notes = current_notes()
+        recorded = notes.render() if notes is not None else ""
+        if recorded:
+            recorded = f"""
+          Here are the notes recorded during research:
+          <research_notes>{recorded}</research_notes>"""
 
-        # Prompt the report
-        result = await self.report_agent.run(user_msg=f"""You are part of a deep research system.
+        prompt = f"""You are part of a deep research system.
           You have been given a complex topic on which to write a report:
-          <topic>{await ctx.get("research_topic")}.
+          <topic>{await ctx.store.get("research_topic")}.
 
           Other agents have already come up with a list of questions about the
           topic and answers to those questions. Your job is to write a clear,
           thorough report that combines all the information from those answers.
 
           Here are the questions and answers:
-          <questions_and_answers>{all_answers}</questions_and_answers>""")
+          <questions_and_answers>{{answers}}</questions_and_answers>"""
+
+        # condense the answers first if they would overflow the context window
+        budget = self.budgeter.available(prompt)
+        # notes may take at most a quarter of the room left for answers
+        recorded = truncate_tokens(recorded, budget // 4)
+        budget -= count_tokens(recorded)
+        compressions = self.budgeter.compressions
+        all_answers = await self.budgeter.fit(sections, budget)
+        if self.budgeter.compressions > compressions:
+            ctx.write_event_to_stream(ProgressEvent(
+                msg=f"Condensed {len(sections)} answers to fit the model's context window"))
+        prompt = prompt.replace("{answers}", all_answers) + recorded
+
+        # Prompt the report, streaming the draft as it is generated
+        cycle = self.review_cycles + 1
+        result = await self._run_streaming(ctx, "report", self.report_agent, prompt,
+                                           ReportDeltaEvent, cycle)
 
         return ReviewEvent(report=str(result))
 
+    async def _review_fast(self, ctx: Context, report: str, cycle: int) -> Verdict:
+        """Judge the report with one plain, streamed completion asking for JSON."""
+        llm = self.review_agent.llm
+        prompt = REVIEW_PROMPT.format(topic=await ctx.store.get("research_topic"),
+                                      report=report)
+        with span("agent.review", kind="agent", cycle=cycle, mode="fast"):
+            deltas = []
+            async for chunk in await llm.astream_complete(prompt):
+                if chunk.delta:
+                    deltas.append(chunk.delta)
+                    ctx.write_event_to_stream(ReviewDeltaEvent(delta=chunk.delta, cycle=cycle))
+        return parse_verdict("".join(deltas), source="llm")
+
     @step
+    @traced("step.review", kind="step")
     async def review(self, ctx: Context, ev: ReviewEvent) -> StopEvent | FeedbackEvent:
 
-        # CODE: call the review agent at this step
-        result = await self.review_agent.run(user_msg=f"""You are part of a deep research system.
-          You have just written a report about the topic {await ctx.get("research_topic")}.
-          Here is the report: <report>{ev.report}</report>
-          Decide whether this report is sufficiently comprehensive.
-          If it is, respond with just the string "ACCEPTABLE" and nothing else.
-          If it needs more research, suggest some additional questions that could
-          have been asked.""")
+        cycle = self.review_cycles + 1
+        verdict = None
+        # a report that leaves out researched answers is sent back without a model call
+        if env_bool("REVIEW_PRECHECK", False) and not self.outline.missing():
+            verdict = precheck(ev.report, self.ledger.questions,
+                               min_coverage=env_float("REVIEW_MIN_COVERAGE", 0.9),
+                               min_words=env_int("REVIEW_MIN_WORDS", 150))
+        if verdict is None and env_str("REVIEW_MODE", "fast") == "fast" \
+                and hasattr(self.review_agent, "llm"):
+            verdict = await self._review_fast(ctx, ev.report, cycle)
+        if verdict is None:
+            result = await self._run_streaming(ctx, "review", self.review_agent, f"""You are part of a deep research system.
+              You have just written a report about the topic {await ctx.store.get("research_topic")}.
+              Here is the report: <report>{ev.report}</report>
+              Decide whether this report is sufficiently comprehensive.
+              If it is, respond with just the string "ACCEPTABLE" and nothing else.
+              If it needs more research, suggest some additional questions that could
+              have been asked.""",
+                ReviewDeltaEvent, cycle)
+            verdict = parse_verdict(str(result), source="agent")
+        REVIEW_DECISIONS.labels(verdict.source, "accept" if verdict.acceptable else "revise").inc()
 
         self.review_cycles += 1
 
         # Either it's okay or we've already gone through 3 cycles
-        if str(result) == "ACCEPTABLE" or self.review_cycles >= 3:
+        if verdict.acceptable or self.review_cycles >= 3:
+            QUESTIONS_PER_RUN.observe(self.questions_asked)
+            REVIEW_CYCLES_PER_RUN.observe(self.review_cycles)
             return StopEvent(result=ev.report)
         else:
             ctx.write_event_to_stream(ProgressEvent(msg="Sending feedback"))
             return FeedbackEvent(
-                research_topic=await ctx.get("research_topic"),
-                feedback=str(result)
+                research_topic=await ctx.store.get("research_topic"),
+                feedback=verdict.follow_up
             )
\ No newline at end of file
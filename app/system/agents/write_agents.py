@@ -1,11 +1,11 @@
 from llama_index.core.agent.workflow import FunctionAgent
-from ..model.model_loader import get_model
+from ..model import model_loader
 from ..tools import write_report
 
 
 def get_report_agent():
     """Create a report-writing agent using the current model."""
-    llm = get_model()
+    llm = model_loader.get_role_model("report")
     if llm is None:
         raise RuntimeError("Model not loaded yet")
 
@@ -0,0 +1,118 @@
+"""module to research many topics in one call
+
+A batch runs its topics through the run registry like single requests do
+(cached reports are returned at once and identical in-flight topics share
+one run), within BATCH_CONCURRENCY runs at a time for the whole process.
+The runs of a batch share an `AnswerMemo`, so a question two topics both
+raise is researched once; the search and LLM caches are process-wide
+already. Results are yielded as each topic finishes, tagged with its index.
+"""
+import asyncio
+import time
+
+from .cache.store import MISSING
+from .runs import get_run_registry, start_workflow
+from .utils.concurrency import PriorityLimiter
+from .utils.logger import logger
+from .utils.schema import UserRequest
+from .utils.settings import env_int
+
+
+# process-wide cap on the research runs of every batch
+_batch_limiter: PriorityLimiter | None = None
+
+
+def get_batch_limiter() -> PriorityLimiter:
+    """Return the limiter shared by all batches (BATCH_CONCURRENCY)."""
+    global _batch_limiter
+    if _batch_limiter is None:
+        _batch_limiter = PriorityLimiter(env_int("BATCH_CONCURRENCY", 4))
+    return _batch_limiter
+
+
+def set_batch_limiter(limiter: PriorityLimiter | None) -> None:
+    """Replace the batch limiter (None rebuilds it from settings)."""
+    global _batch_limiter
+    _batch_limiter = limiter
+
+
+async def _research(query: UserRequest, index: int, memo, forward=None):
+    """
+    Return the report for one topic of a batch, and whether it was cached.
+    `forward` receives the run's progress events.
+    """
+    registry = get_run_registry()
+    if not query.bypass_cache:
+        report = await registry.acached_report(query.text)
+        if report is not MISSING:
+            return report, True
+    limiter = get_batch_limiter()
+    # earlier items get a slot first, in this batch and across batches
+    await limiter.acquire(index)
+    try:
+        run = registry.start(query.text, lambda: start_workflow(query.text, answer_memo=memo))
+    except BaseException:
+        limiter.release()
+        raise
+    # the slot goes with the run, which outlives this task if the batch is dropped
+    run.add_done_callback(limiter.release)
+    if forward is not None:
+        async for event in run.subscribe():
+            forward(event)
+    return await run.wait(), False
+
+
+async def run_batch(requests: list[UserRequest], progress: bool = False):
+    """
+    Research every request and yield one payload per topic as it finishes
+    ("final" or "error", with its `index`), then a "done" summary. With
+    `progress`, the runs' progress events are forwarded too. If the caller
+    stops listening, started runs keep going (and fill the report cache),
+    holding their slots until they end; topics still queued are dropped.
+    """
+    # the memo (numpy) and workflow events (llama-index) load with the first batch
+    from .agents.planning import AnswerMemo
+    from .utils.events import event_payload
+
+    memo = AnswerMemo()
+    queue: asyncio.Queue = asyncio.Queue()
+    started = time.perf_counter()
+
+    async def research(index: int, query: UserRequest) -> None:
+        item_started = time.perf_counter()
+        payload = {"index": index, "topic": query.text}
+
+        def forward(event) -> None:
+            event = event_payload(event)
+            if event is not None:
+                queue.put_nowait({**payload, **event})
+
+        try:
+            report, cached = await _research(query, index, memo, forward if progress else None)
+            queue.put_nowait({**payload, "type": "final", "response": str(report),
+                              "cached": cached,
+                              "seconds": round(time.perf_counter() - item_started, 3)})
+        except Exception as exc:
+            logger.exception(f"Batch topic {index} failed")
+            queue.put_nowait({**payload, "type": "error", "error": str(exc)})
+
+    tasks = [asyncio.create_task(research(index, query))
+             for index, query in enumerate(requests)]
+    succeeded = failed = 0
+    try:
+        for _ in range(len(tasks)):
+            while (payload := await queue.get())["type"] not in ("final", "error"):
+                yield payload
+            if payload["type"] == "final":
+                succeeded += 1
+            else:
+                failed += 1
+            yield payload
+    finally:
+        # topics still waiting for a slot are dropped; started runs are
+        # shielded and finish in the background, each holding its slot
+        for task in tasks:
+            task.cancel()
+    yield {"type": "done", "topics": len(tasks), "succeeded": succeeded, "failed": failed,
+           "reused_answers": memo.reused,
+           "seconds": round(time.perf_counter() - started, 3)}
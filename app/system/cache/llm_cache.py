@@ -0,0 +1,62 @@
+"""module to cache LLM completions by prompt, model and sampling parameters"""
+import hashlib
+import json
+
+from .store import LRUCache, SQLiteCache, TieredCache, CacheBackend
+from ..utils.settings import env_int, env_float, env_str, env_path
+from ..utils.logger import logger
+from ..utils.metrics import register_cache
+
+
+# off: never cache; auto: only temperature 0 calls; on/record: every call;
+# replay: serve every call from the cache and fail on a miss
+LLM_CACHE_MODES = ("off", "auto", "on", "record", "replay")
+
+# until first use, the cache does not exist
+_llm_cache: CacheBackend | None = None
+
+
+def llm_cache_mode() -> str:
+    """Return the configured LLM_CACHE mode (default off)."""
+    mode = env_str("LLM_CACHE", "off").strip().lower()
+    if mode not in LLM_CACHE_MODES:
+        logger.error(f"Unknown LLM_CACHE mode {mode!r}; caching disabled")
+        return "off"
+    return mode
+
+
+def llm_cache_key(**parts) -> str:
+    """Return a stable key for a call: model, messages, tools and parameters."""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def build_llm_cache() -> TieredCache:
+    """Create the LLM cache from the LLM_CACHE_* environment variables."""
+    # completions of a fixed prompt don't go stale, so no expiry by default
+    ttl = env_float("LLM_CACHE_TTL", 0) or None
+    memory = LRUCache(maxsize=env_int("LLM_CACHE_SIZE", 512), ttl=ttl)
+    disk = None
+    path = env_path("LLM_CACHE_PATH", "llm_cache.db")
+    if path:
+        disk = SQLiteCache(path, maxsize=env_int("LLM_CACHE_DISK_SIZE", 20_000),
+                           ttl=ttl, table="llm_cache")
+        logger.info(f"LLM cache persisted to {path}")
+    return TieredCache(memory, disk)
+
+
+def get_llm_cache() -> CacheBackend:
+    """Return the process-wide LLM cache, creating it on first use."""
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = build_llm_cache()
+    return _llm_cache
+
+
+def set_llm_cache(cache: CacheBackend | None) -> None:
+    """Plug in a different cache backend (None rebuilds from settings)."""
+    global _llm_cache
+    _llm_cache = cache
+
+
+register_cache("llm", get_llm_cache)
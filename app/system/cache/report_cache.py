@@ -0,0 +1,25 @@
+"""module to cache finished research reports by topic"""
+import hashlib
+
+from .search_cache import normalize_query
+from .store import LRUCache, SQLiteCache, TieredCache
+from ..utils.settings import env_int, env_float, env_path
+from ..utils.logger import logger
+
+
+def topic_key(topic: str) -> str:
+    """Return the key shared by every request for the same normalized topic."""
+    return hashlib.sha256(normalize_query(topic).encode("utf-8")).hexdigest()
+
+
+def build_report_cache() -> TieredCache:
+    """Create the report cache from the REPORT_CACHE_* environment variables."""
+    ttl = env_float("REPORT_CACHE_TTL", 1800)
+    memory = LRUCache(maxsize=env_int("REPORT_CACHE_SIZE", 128), ttl=ttl)
+    disk = None
+    path = env_path("REPORT_CACHE_PATH", "report_cache.db")
+    if path:
+        disk = SQLiteCache(path, maxsize=env_int("REPORT_CACHE_DISK_SIZE", 1000),
+                           ttl=ttl, table="report_cache")
+        logger.info(f"Report cache persisted to {path}")
+    return TieredCache(memory, disk)
@@ -0,0 +1,68 @@
+"""module to cache web search results in front of the search tool"""
+import hashlib
+import re
+import unicodedata
+
+from .store import LRUCache, SQLiteCache, TieredCache, CacheBackend
+from ..utils.settings import env_int, env_float, env_path
+from ..utils.logger import logger
+from ..utils.metrics import register_cache
+
+
+# until first use, the cache does not exist
+_search_cache: CacheBackend | None = None
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a search query so near-identical queries share a key:
+    unicode folding, lower case, punctuation stripped, whitespace collapsed.
+    """
+    text = unicodedata.normalize("NFKC", query).casefold()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def search_cache_key(query: str, **params) -> str:
+    """Return a stable cache key for a query and its search parameters."""
+    parts = [normalize_query(query)]
+    parts += [f"{name}={params[name]}" for name in sorted(params)]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def build_search_cache() -> TieredCache:
+    """Create the search cache from the SEARCH_CACHE_* environment variables."""
+    ttl = env_float("SEARCH_CACHE_TTL", 3600)
+    memory = LRUCache(maxsize=env_int("SEARCH_CACHE_SIZE", 1024), ttl=ttl)
+    disk = None
+    path = env_path("SEARCH_CACHE_PATH", "search_cache.db")
+    if path:
+        disk = SQLiteCache(path, maxsize=env_int("SEARCH_CACHE_DISK_SIZE", 10_000),
+                           ttl=ttl, table="search_cache")
+        logger.info(f"Search cache persisted to {path}")
+    return TieredCache(memory, disk)
+
+
+def get_search_cache() -> CacheBackend:
+    """Return the process-wide search cache, creating it on first use."""
+    global _search_cache
+    if _search_cache is None:
+        _search_cache = build_search_cache()
+    return _search_cache
+
+
+def set_search_cache(cache: CacheBackend | None) -> None:
+    """Plug in a different cache backend (None rebuilds from settings)."""
+    global _search_cache
+    _search_cache = cache
+
+
+register_cache("search", get_search_cache)
+
+
+def search_cache_stats() -> dict:
+    """Return hit/miss counters for the search cache."""
+    cache = get_search_cache()
+    if hasattr(cache, "describe"):
+        return cache.describe()
+    return {**cache.stats.as_dict(), "size": len(cache)}
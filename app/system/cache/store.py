@@ -0,0 +1,314 @@
+"""module to implement the cache backends shared by the system"""
+from abc import ABC, abstractmethod
+import asyncio
+from collections import OrderedDict
+import json
+import sqlite3
+import threading
+import time
+
+
+# sentinel returned on a cache miss so falsy values can still be cached
+MISSING = object()
+
+
+class CacheStats:
+    """Hit/miss/eviction counters for a cache."""
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def as_dict(self) -> dict:
+        """Return the counters along with the derived hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# enforcing every cache backend to be defined the same way
+class CacheBackend(ABC):
+    """interface guiding cache backend creation"""
+    def __init__(self) -> None:
+        self.stats = CacheStats()
+
+    @abstractmethod
+    def get(self, key: str):
+        """Return the cached value for `key` or MISSING."""
+
+    @abstractmethod
+    def set(self, key: str, value, ttl: float | None = None) -> None:
+        """Store `value` under `key` for `ttl` seconds."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove `key` from the cache if present."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Return the number of stored entries."""
+
+    # backends doing I/O override these to keep it off the event loop
+    async def aget(self, key: str):
+        """`get` for coroutines."""
+        return self.get(key)
+
+    async def aset(self, key: str, value, ttl: float | None = None) -> None:
+        """`set` for coroutines."""
+        self.set(key, value, ttl)
+
+
+class LRUCache(CacheBackend):
+    """
+    In-memory LRU cache with a per-entry TTL and a maximum size.
+    Entries are evicted least recently used first once `maxsize` is reached.
+    """
+    def __init__(self, maxsize: int = 1024, ttl: float | None = 3600,
+                 clock=time.time) -> None:
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[str, tuple[float | None, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return MISSING
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._data[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = self._clock() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            self.stats.sets += 1
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache(CacheBackend):
+    """
+    On-disk cache stored in a SQLite table so entries survive restarts.
+    Values must be JSON serializable.
+
+    Worker processes may share the file, so reads stay reads: an entry's
+    access time is refreshed at most every `touch_interval` seconds. The
+    size is tracked as a running count and recounted (with expired rows
+    purged) every `recount_every` sets, or before evicting, so rows other
+    workers added are accounted for.
+    """
+    def __init__(self, path: str, maxsize: int = 10_000,
+                 ttl: float | None = 86_400, table: str = "cache",
+                 clock=time.time, touch_interval: float = 60.0,
+                 recount_every: int = 100) -> None:
+        super().__init__()
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.table = table
+        self.touch_interval = touch_interval
+        self.recount_every = recount_every
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL, accessed_at REAL NOT NULL)"
+        )
+        self._size = len(self)
+        self._sets_since_count = 0
+
+    def get(self, key: str):
+        now = self._clock()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at, accessed_at FROM {self.table} WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return MISSING
+            value, expires_at, accessed_at = row
+            if expires_at is not None and expires_at <= now:
+                self._size -= self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key = ?", (key,)).rowcount
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return MISSING
+            if now - accessed_at >= self.touch_interval:
+                self._conn.execute(
+                    f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+            self.stats.hits += 1
+            return json.loads(value)
+
+    def set(self, key: str, value, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        now = self._clock()
+        expires_at = now + ttl if ttl else None
+        with self._lock:
+            exists = self._conn.execute(
+                f"SELECT 1 FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} "
+                "(key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            self.stats.sets += 1
+            if exists is None:
+                self._size += 1
+            self._sets_since_count += 1
+            if self._size > self.maxsize or self._sets_since_count >= self.recount_every:
+                self._evict(now)
+
+    async def aget(self, key: str):
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value, ttl: float | None = None) -> None:
+        await asyncio.to_thread(self.set, key, value, ttl)
+
+    def _evict(self, now: float) -> None:
+        """Drop expired rows, then the least recently used rows over maxsize."""
+        expired = self._conn.execute(
+            f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (now,),
+        ).rowcount
+        self.stats.expirations += max(expired, 0)
+        self._size = len(self)
+        self._sets_since_count = 0
+        overflow = self._size - self.maxsize
+        if overflow > 0:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.stats.evictions += overflow
+            self._size -= overflow
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._size -= self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key = ?", (key,)).rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._size = 0
+
+    def close(self) -> None:
+        """Close the underlying connection."""
+        self._conn.close()
+
+    def __len__(self) -> int:
+        return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class TieredCache(CacheBackend):
+    """
+    Two level cache: a fast in-memory layer in front of an optional
+    persistent layer. Disk hits are promoted into memory.
+    """
+    def __init__(self, memory: CacheBackend,
+                 disk: CacheBackend | None = None) -> None:
+        super().__init__()
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str):
+        value = self.memory.get(key)
+        if value is MISSING and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not MISSING:
+                self.memory.set(key, value)
+        if value is MISSING:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    def set(self, key: str, value, ttl: float | None = None) -> None:
+        self.stats.sets += 1
+        self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl)
+
+    async def aget(self, key: str):
+        """`get` for coroutines: the disk layer is only read, in a thread, on a memory miss."""
+        value = self.memory.get(key)
+        if value is MISSING and self.disk is not None:
+            value = await self.disk.aget(key)
+            if value is not MISSING:
+                self.memory.set(key, value)
+        if value is MISSING:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    async def aset(self, key: str, value, ttl: float | None = None) -> None:
+        self.stats.sets += 1
+        self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            await self.disk.aset(key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def __len__(self) -> int:
+        return len(self.memory)
+
+    def describe(self) -> dict:
+        """Return overall and per-layer statistics."""
+        info = {**self.stats.as_dict(), "memory": {
+            **self.memory.stats.as_dict(), "size": len(self.memory)}}
+        if self.disk is not None:
+            info["disk"] = {**self.disk.stats.as_dict(), "size": len(self.disk)}
+        return info
@@ -0,0 +1,389 @@
+"""module to run research requests as background jobs"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from .cache.store import MISSING
+from .runs import get_run_registry, start_workflow
+from .shared import SharedState, get_shared_state
+from .utils.logger import logger
+from .utils.settings import env_float, env_int, env_path
+
+
+# job lifecycle states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = {SUCCEEDED, FAILED}
+# token deltas go to live listeners only: the final event carries the full text
+LIVE_ONLY = {"report_delta", "review_delta"}
+
+
+class Job:
+    """A queued research request and everything it has produced so far."""
+    def __init__(self, topic: str, bypass_cache: bool = False,
+                 job_id: str | None = None) -> None:
+        self.job_id = job_id or uuid.uuid4().hex
+        self.topic = topic
+        self.bypass_cache = bypass_cache
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.run_id: str | None = None
+        # worker process running the job, when workers share the job store
+        self.owner: str | None = None
+        self.events: list[dict] = []
+        self.report: str | None = None
+        self.error: str | None = None
+        self._changed = asyncio.Event()
+        self._listeners: set[asyncio.Queue] = set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def add_event(self, payload: dict) -> bool:
+        """
+        Append a payload to the job's event log and wake any listeners.
+        Token deltas are only passed to live listeners; returns whether the
+        payload was logged.
+        """
+        if payload["type"] in LIVE_ONLY:
+            for queue in self._listeners:
+                queue.put_nowait((None, payload))
+            return False
+        self.events.append(payload)
+        for queue in self._listeners:
+            queue.put_nowait((len(self.events) - 1, payload))
+        self._notify()
+        return True
+
+    async def follow(self, start: int = 0, keep_alive: float | None = None):
+        """
+        Yield (index, payload) for the logged events from `start`, then live
+        ones until the job finishes. Token deltas come with index None, and
+        (None, None) after `keep_alive` idle seconds.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._listeners.add(queue)
+        try:
+            index = start
+            while index < len(self.events):
+                yield index, self.events[index]
+                index += 1
+            while not (self.finished and queue.empty()):
+                try:
+                    item_index, payload = await asyncio.wait_for(queue.get(), keep_alive)
+                except asyncio.TimeoutError:
+                    yield None, None
+                    continue
+                if item_index is None:
+                    yield None, payload
+                elif item_index >= index:
+                    yield item_index, payload
+                    index = item_index + 1
+            # the final event may be logged right after the status changes
+            while index < len(self.events):
+                yield index, self.events[index]
+                index += 1
+        finally:
+            self._listeners.discard(queue)
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait_for_change(self, timeout: float | None = None) -> None:
+        """Wait until the job emits an event or finishes."""
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "topic": self.topic,
+            "bypass_cache": self.bypass_cache,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "run_id": self.run_id,
+            "owner": self.owner,
+            "events": self.events,
+            "report": self.report,
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Job":
+        job = cls(data["topic"], data.get("bypass_cache", False), data["job_id"])
+        for name in ("status", "created_at", "started_at", "finished_at",
+                     "run_id", "owner", "events", "report", "error"):
+            setattr(job, name, data.get(name, getattr(job, name)))
+        return job
+
+
+class JobStore:
+    """
+    In-process job table with optional SQLite persistence, so finished
+    jobs can still be fetched and unfinished ones resumed after a restart.
+    When worker processes share the file, each keeps only the jobs it runs
+    (`owner` is its worker id) and reads the others' from SQLite, where
+    their progress is saved at most every `save_interval` seconds.
+    """
+    def __init__(self, path: str | None = None, owner: str | None = None,
+                 save_interval: float = 0.5, poll: float = 1.0) -> None:
+        self.jobs: dict[str, Job] = {}
+        self.owner = owner
+        self.save_interval = save_interval
+        self.poll = poll
+        self._saved_at: dict[str, float] = {}
+        self._conn = None
+        self._lock = threading.Lock()
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False,
+                                         isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL)"
+            )
+            if owner is None:
+                self._load()
+
+    def _load(self) -> None:
+        for (data,) in self._conn.execute("SELECT data FROM jobs"):
+            job = Job.from_dict(json.loads(data))
+            self.jobs[job.job_id] = job
+
+    def add(self, job: Job) -> None:
+        job.owner = self.owner
+        self.jobs[job.job_id] = job
+        self.save(job)
+
+    def is_local(self, job_id: str) -> bool:
+        return job_id in self.jobs
+
+    def get(self, job_id: str) -> Job | None:
+        """Return a job of this process, or a snapshot of a sibling's job."""
+        job = self.jobs.get(job_id)
+        if job is None and self._conn is not None:
+            with self._lock:
+                row = self._conn.execute("SELECT data FROM jobs WHERE job_id = ?",
+                                         (job_id,)).fetchone()
+            if row is not None:
+                job = Job.from_dict(json.loads(row[0]))
+        return job
+
+    def _write(self, job_id: str, data: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, data, updated_at) "
+                "VALUES (?, ?, ?)",
+                (job_id, json.dumps(data), time.time()),
+            )
+
+    def save(self, job: Job) -> None:
+        """Persist the job's current state (no-op without a SQLite path)."""
+        if self._conn is None:
+            return
+        self._write(job.job_id, job.to_dict())
+        self._saved_at[job.job_id] = time.monotonic()
+
+    async def asave(self, job: Job) -> None:
+        """`save` for coroutines: the job is serialized and written in a thread."""
+        if self._conn is None:
+            return
+        # snapshot the event list, which keeps growing while the thread dumps it
+        data = {**job.to_dict(), "events": list(job.events)}
+        self._saved_at[job.job_id] = time.monotonic()
+        await asyncio.to_thread(self._write, job.job_id, data)
+
+    async def save_progress(self, job: Job) -> None:
+        """Save a running job's events for sibling workers, at most every `save_interval`."""
+        if self.owner is None or self._conn is None:
+            return
+        if time.monotonic() - self._saved_at.get(job.job_id, 0.0) >= self.save_interval:
+            await self.asave(job)
+
+    async def wait_for_change(self, job: Job, timeout: float | None = None) -> Job:
+        """Wait until the job emits an event or finishes; return its latest state."""
+        if self.is_local(job.job_id) or self._conn is None:
+            await job.wait_for_change(timeout)
+            return job
+        # a sibling worker's job: poll what it saves
+        deadline = time.monotonic() + (timeout if timeout is not None else float("inf"))
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll)
+            latest = self.get(job.job_id)
+            if latest is not None and (latest.status != job.status
+                                       or len(latest.events) != len(job.events)):
+                return latest
+        return job
+
+    def unfinished(self, live_owners: list[str] | None = None) -> list[Job]:
+        """
+        Return the unfinished jobs to (re)run here. With shared workers, those
+        whose owner is gone are claimed, one worker each.
+        """
+        if self.owner is None or self._conn is None:
+            return [job for job in self.jobs.values() if not job.finished]
+        live = set(live_owners or ()) | {self.owner}
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM jobs WHERE json_extract(data, '$.status') "
+                                      "IN (?, ?)", (QUEUED, RUNNING)).fetchall()
+        claimed = []
+        for (data,) in rows:
+            job = Job.from_dict(json.loads(data))
+            if job.owner in live:
+                continue
+            previous, job.owner = job.owner, self.owner
+            with self._lock:
+                # compare-and-swap on the owner, so only one worker takes the job
+                updated = self._conn.execute(
+                    "UPDATE jobs SET data = ?, updated_at = ? WHERE job_id = ? "
+                    "AND json_extract(data, '$.owner') IS ?",
+                    (json.dumps(job.to_dict()), time.time(), job.job_id, previous)).rowcount
+            if updated:
+                self.jobs[job.job_id] = job
+                claimed.append(job)
+        return claimed
+
+    def counts(self) -> dict:
+        counts = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+        if self.owner is not None and self._conn is not None:
+            # every worker's jobs
+            with self._lock:
+                rows = self._conn.execute("SELECT json_extract(data, '$.status'), COUNT(*) "
+                                          "FROM jobs GROUP BY 1").fetchall()
+            counts.update({status: count for status, count in rows if status in counts})
+            return counts
+        for job in self.jobs.values():
+            counts[job.status] += 1
+        return counts
+
+
+class JobManager:
+    """Fixed-size pool of workers pulling research jobs from a queue."""
+    def __init__(self, store: JobStore, workers: int = 2,
+                 shared: SharedState | None = None) -> None:
+        self.store = store
+        self.workers = max(1, workers)
+        self.shared = shared
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        if self.started:
+            return
+        # anything left unfinished by a previous (or dead sibling) process is picked up again
+        live = self.shared.live_workers() if self.shared is not None else None
+        for job in self.store.unfinished(live):
+            job.status = QUEUED
+            job.events = []
+            self._queue.put_nowait(job.job_id)
+        self._tasks = [asyncio.create_task(self._worker(index))
+                       for index in range(self.workers)]
+        logger.info(f"Job manager started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, topic: str, bypass_cache: bool = False) -> Job:
+        """Queue a research run and return its job immediately."""
+        job = Job(topic, bypass_cache)
+        self.store.add(job)
+        self._queue.put_nowait(job.job_id)
+        return job
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            job = self.store.get(job_id)
+            try:
+                if job is not None and not job.finished:
+                    await self._execute(job)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job: Job) -> None:
+        # workflow events need llama-index, imported once a job runs
+        from .utils.events import event_payload
+
+        job.status = RUNNING
+        job.started_at = time.time()
+        await self.store.asave(job)
+        registry = get_run_registry()
+        try:
+            report = MISSING
+            if not job.bypass_cache:
+                report = await registry.acached_report(job.topic)
+            if report is MISSING:
+                run = registry.start(job.topic, lambda: start_workflow(job.topic))
+                job.run_id = run.run_id
+                async for event in run.subscribe():
+                    payload = event_payload(event)
+                    if payload is not None and job.add_event(payload):
+                        await self.store.save_progress(job)
+                report = await run.wait()
+            job.report = str(report)
+            job.status = SUCCEEDED
+            job.add_event({"type": "final", "response": job.report})
+        except Exception as exc:
+            logger.exception(f"Job {job.job_id} failed")
+            job.error = str(exc)
+            job.status = FAILED
+            job.add_event({"type": "error", "error": job.error})
+        finally:
+            job.finished_at = time.time()
+            await self.store.asave(job)
+            job._notify()
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "queued": self._queue.qsize(),
+                "jobs": self.store.counts()}
+
+
+# until started, the job manager does not exist
+_manager: JobManager | None = None
+
+
+def get_job_manager() -> JobManager:
+    """Return the process-wide job manager (JOB_WORKERS, JOB_STORE_PATH)."""
+    global _manager
+    if _manager is None:
+        shared = get_shared_state()
+        store = JobStore(env_path("JOB_STORE_PATH", "jobs.db") or None,
+                         owner=shared.worker_id if shared is not None else None,
+                         poll=env_float("SHARED_POLL_INTERVAL", 1.0))
+        _manager = JobManager(store, workers=env_int("JOB_WORKERS", 2), shared=shared)
+    return _manager
+
+
+async def start_job_manager() -> JobManager:
+    """Start the job workers; called from the app lifespan."""
+    manager = get_job_manager()
+    await manager.start()
+    return manager
+
+
+async def stop_job_manager() -> None:
+    """Stop the job workers; called on app shutdown."""
+    global _manager
+    if _manager is not None:
+        await _manager.stop()
+        _manager = None
@@ -0,0 +1,280 @@
+"""module to serve repeated LLM calls from the completion cache"""
+import json
+from typing import Any, Sequence
+
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    LLMMetadata,
+)
+from llama_index.core.llms.function_calling import FunctionCallingLLM
+from pydantic import PrivateAttr
+
+from ..cache.llm_cache import get_llm_cache, llm_cache_key, llm_cache_mode
+from ..cache.store import MISSING
+from ..utils.custom_exceptions import LLMCacheMiss
+from ..utils.logger import logger
+
+
+# model settings that change what a call returns
+SAMPLING_FIELDS = ("temperature", "top_p", "top_k", "seed", "max_tokens",
+                   "context_window", "json_mode", "thinking", "additional_kwargs")
+
+
+def _base_llm(llm):
+    """Return the LLM that actually samples (the first backend of a pool)."""
+    pool = getattr(llm, "pool", None)
+    return pool.backends[0].llm if pool is not None else llm
+
+
+def _dump_messages(messages) -> list[dict]:
+    return [message.model_dump(mode="json") for message in messages or []]
+
+
+def _dump_tools(tools) -> list[dict]:
+    return [{"name": tool.metadata.name, "description": tool.metadata.description,
+             "parameters": tool.metadata.get_parameters_dict()} for tool in tools]
+
+
+def _dump_response(response) -> dict | None:
+    """Serialize a response for the cache; None if it can't be stored as JSON."""
+    extra = {key: value for key, value in response.additional_kwargs.items()
+             if key != "thinking_delta"}
+    if isinstance(response, ChatResponse):
+        data = {"message": response.message.model_dump(mode="json"), "extra": extra}
+    else:
+        data = {"text": response.text, "extra": extra}
+    try:
+        json.dumps(data)
+    except (TypeError, ValueError):
+        return None
+    return data
+
+
+def _load_response(data: dict):
+    extra = {**data["extra"], "llm_cache": "hit"}
+    if "message" in data:
+        message = ChatMessage.model_validate(data["message"])
+        return ChatResponse(message=message, delta=message.content or "",
+                            additional_kwargs=extra)
+    return CompletionResponse(text=data["text"], delta=data["text"], additional_kwargs=extra)
+
+
+class CachedLLM(FunctionCallingLLM):
+    """
+    LLM facade that answers a call from the LLM cache when the same model
+    has already seen the same messages, tools and sampling parameters.
+    Depending on LLM_CACHE only deterministic (temperature 0) calls are
+    cached, every call is, or every call must come from the cache (replay).
+    A streamed miss is recorded once the stream is exhausted; a hit is
+    replayed as a single chunk.
+    """
+    _llm: Any = PrivateAttr()
+    _mode: str = PrivateAttr()
+
+    def __init__(self, llm, mode: str = "on", **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._llm = llm
+        self._mode = mode
+
+    @property
+    def llm(self):
+        return self._llm
+
+    @property
+    def pool(self):
+        return getattr(self._llm, "pool", None)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return self._llm.metadata
+
+    def _key(self, kind: str, kwargs: dict, **parts) -> str | None:
+        """Return the cache key of a call, or None if it must not be cached."""
+        base = _base_llm(self._llm)
+        sampling = {field: getattr(base, field) for field in SAMPLING_FIELDS
+                    if hasattr(base, field)}
+        if self._mode == "auto" and kwargs.get("temperature",
+                                                sampling.get("temperature")) != 0:
+            return None
+        return llm_cache_key(kind=kind, model=self._llm.metadata.model_name,
+                             sampling=sampling, kwargs=kwargs, **parts)
+
+    def _hit(self, key: str, data):
+        if data is not MISSING:
+            return _load_response(data)
+        if self._mode == "replay":
+            raise LLMCacheMiss(f"No recorded LLM response for call {key[:12]}")
+        return MISSING
+
+    def _lookup(self, key: str | None):
+        if key is None:
+            return MISSING
+        return self._hit(key, get_llm_cache().get(key))
+
+    async def _alookup(self, key: str | None):
+        """`_lookup` for async calls: a shared cache file is read off the event loop."""
+        if key is None:
+            return MISSING
+        return self._hit(key, await get_llm_cache().aget(key))
+
+    def _cacheable(self, key: str | None, response):
+        if key is None or response is None:
+            return None
+        data = _dump_response(response)
+        if data is None:
+            logger.debug("LLM response not cacheable as JSON; skipped")
+        return data
+
+    def _store(self, key: str | None, response) -> None:
+        data = self._cacheable(key, response)
+        if data is not None:
+            get_llm_cache().set(key, data)
+
+    async def _astore(self, key: str | None, response) -> None:
+        data = self._cacheable(key, response)
+        if data is not None:
+            await get_llm_cache().aset(key, data)
+
+    def _call(self, key, method: str, *args, **kwargs):
+        hit = self._lookup(key)
+        if hit is not MISSING:
+            return hit
+        response = getattr(self._llm, method)(*args, **kwargs)
+        self._store(key, response)
+        return response
+
+    async def _acall(self, key, method: str, *args, **kwargs):
+        hit = await self._alookup(key)
+        if hit is not MISSING:
+            return hit
+        response = await getattr(self._llm, method)(*args, **kwargs)
+        await self._astore(key, response)
+        return response
+
+    def _stream(self, key, method: str, *args, **kwargs):
+        hit = self._lookup(key)
+        if hit is not MISSING:
+            return iter([hit])
+        stream = getattr(self._llm, method)(*args, **kwargs)
+
+        def gen():
+            last = None
+            for last in stream:
+                yield last
+            self._store(key, last)
+        return gen()
+
+    async def _astream(self, key, method: str, *args, **kwargs):
+        hit = await self._alookup(key)
+
+        async def replay():
+            yield hit
+
+        if hit is not MISSING:
+            return replay()
+        stream = await getattr(self._llm, method)(*args, **kwargs)
+
+        async def gen():
+            last = None
+            async for last in stream:
+                yield last
+            await self._astore(key, last)
+        return gen()
+
+    def _chat_key(self, kind: str, messages, kwargs: dict) -> str | None:
+        return self._key(kind, kwargs, messages=_dump_messages(messages))
+
+    def _complete_key(self, kind: str, prompt: str, formatted: bool,
+                      kwargs: dict) -> str | None:
+        return self._key(kind, kwargs, prompt=prompt, formatted=formatted)
+
+    def _tools_key(self, kind: str, tools, user_msg, chat_history, kwargs: dict) -> str | None:
+        if isinstance(user_msg, str):
+            user_msg = ChatMessage(role="user", content=user_msg)
+        return self._key(kind, kwargs, tools=_dump_tools(tools),
+                         messages=_dump_messages([*(chat_history or []),
+                                                  *([user_msg] if user_msg else [])]))
+
+    # plain chat / completion
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return self._call(self._chat_key("chat", messages, kwargs), "chat",
+                          messages, **kwargs)
+
+    def complete(self, prompt: str, formatted: bool = False,
+                 **kwargs: Any) -> CompletionResponse:
+        return self._call(self._complete_key("complete", prompt, formatted, kwargs),
+                          "complete", prompt, formatted=formatted, **kwargs)
+
+    def stream_chat(self, messages: Sequence[ChatMessage],
+                    **kwargs: Any) -> ChatResponseGen:
+        return self._stream(self._chat_key("chat", messages, kwargs), "stream_chat",
+                            messages, **kwargs)
+
+    def stream_complete(self, prompt: str, formatted: bool = False,
+                        **kwargs: Any) -> CompletionResponseGen:
+        return self._stream(self._complete_key("complete", prompt, formatted, kwargs),
+                            "stream_complete", prompt, formatted=formatted, **kwargs)
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return await self._acall(self._chat_key("chat", messages, kwargs), "achat",
+                                 messages, **kwargs)
+
+    async def acomplete(self, prompt: str, formatted: bool = False,
+                        **kwargs: Any) -> CompletionResponse:
+        return await self._acall(self._complete_key("complete", prompt, formatted, kwargs),
+                                 "acomplete", prompt, formatted=formatted, **kwargs)
+
+    async def astream_chat(self, messages: Sequence[ChatMessage],
+                           **kwargs: Any) -> ChatResponseAsyncGen:
+        return await self._astream(self._chat_key("chat", messages, kwargs), "astream_chat",
+                                   messages, **kwargs)
+
+    async def astream_complete(self, prompt: str, formatted: bool = False,
+                               **kwargs: Any) -> CompletionResponseAsyncGen:
+        return await self._astream(self._complete_key("complete", prompt, formatted, kwargs),
+                                   "astream_complete", prompt, formatted=formatted, **kwargs)
+
+    # tool calling, keyed on the tool schemas as well as the conversation
+    def chat_with_tools(self, tools, user_msg=None, chat_history=None, **kwargs):
+        key = self._tools_key("tools", tools, user_msg, chat_history, kwargs)
+        return self._call(key, "chat_with_tools", tools, user_msg=user_msg,
+                          chat_history=chat_history, **kwargs)
+
+    async def achat_with_tools(self, tools, user_msg=None, chat_history=None, **kwargs):
+        key = self._tools_key("tools", tools, user_msg, chat_history, kwargs)
+        return await self._acall(key, "achat_with_tools", tools, user_msg=user_msg,
+                                 chat_history=chat_history, **kwargs)
+
+    async def astream_chat_with_tools(self, tools, user_msg=None, chat_history=None,
+                                      **kwargs):
+        key = self._tools_key("tools", tools, user_msg, chat_history, kwargs)
+        return await self._astream(key, "astream_chat_with_tools", tools, user_msg=user_msg,
+                                   chat_history=chat_history, **kwargs)
+
+    def _prepare_chat_with_tools(self, tools, user_msg=None, chat_history=None,
+                                 **kwargs) -> dict:
+        return self._llm._prepare_chat_with_tools(
+            tools, user_msg=user_msg, chat_history=chat_history, **kwargs)
+
+    def get_tool_calls_from_response(self, response, error_on_no_tool_call=True,
+                                     **kwargs):
+        return self._llm.get_tool_calls_from_response(
+            response, error_on_no_tool_call=error_on_no_tool_call, **kwargs)
+
+
+def with_llm_cache(llm):
+    """Wrap `llm` in the completion cache unless LLM_CACHE is off (or llm is None)."""
+    mode = llm_cache_mode()
+    if llm is None or mode == "off":
+        return llm
+    return CachedLLM(llm, mode=mode)
@@ -2,11 +2,32 @@
 from abc import ABC, abstractmethod
 import time
 
-# model providers to iterate through
-from llama_index.llms.ollama import Ollama
-
 # modules
 from ..utils.logger import logger
+from ..utils.settings import env_int, env_mapping, env_str
+
+
+# candidate Ollama models, tried in order (fastest warmed-up first, see warmup.py)
+DEFAULT_MODELS = ("qwen3:4b", "gemma3:4b")
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+
+
+# context window (num_ctx) requested per Ollama model, in tokens. Sized so
+# the report prompt fits without the KV cache of the full native window;
+# override with LLM_CONTEXT_WINDOWS (e.g. `qwen3:4b=16384`)
+CONTEXT_WINDOWS = {
+    "qwen3:4b": 8192,
+    "gemma3:4b": 8192,
+    "gemma3:1b": 8192,
+}
+
+
+def context_window_for(model_name: str) -> int:
+    """Return the context window to use for `model_name`."""
+    overrides = env_mapping("LLM_CONTEXT_WINDOWS")
+    if model_name in overrides:
+        return int(overrides[model_name])
+    return CONTEXT_WINDOWS.get(model_name, env_int("LLM_CONTEXT_WINDOW", 8192))
 
 
 # enforcing every model provider class to be defined the same way
@@ -24,27 +45,72 @@ class OllamaClass(LLM):
     """
     Docstring for OllamaClass which uses ollama to load models
     """
-    def __init__(self) -> None:
+    def __init__(self, base_url: str = DEFAULT_OLLAMA_URL,
+                 model_list: list[str] | None = None) -> None:
         """
         Docstring for __init__
         :param self: Description
-        :param model_list: Description
+        :param base_url: address of the Ollama server to use
+        :type base_url: str
+        :param model_list: candidate models, tried in order
         :type model_list: list[str]
         """
         self.model_name  = None
-        self.model_list: list[str] = ['qwen3:4b', 'gemma3:4b']
+        # token budget of the selected model, see CONTEXT_WINDOWS
+        self.context_window: int | None = None
+        self.base_url = base_url.rstrip("/")
+        self.model_list: list[str] = model_list or list(DEFAULT_MODELS)
         self.model  = self._load_model()
 
+    @property
+    def health_url(self) -> str:
+        """endpoint answering 200 while the server is up"""
+        return f"{self.base_url}/api/tags"
+
     def _load_model(self):
         """
         Generator that loads models from self.model_list one by one.
         """
+        from llama_index.llms.ollama import Ollama
+
         for model_name in self.model_list:
             try:
-                model = Ollama(model=model_name)
+                context_window = context_window_for(model_name)
+                # LLM_TEMPERATURE=0 makes calls deterministic (and cacheable)
+                temperature = env_str("LLM_TEMPERATURE")
+                model = Ollama(model=model_name, base_url=self.base_url,
+                               context_window=context_window,
+                               temperature=float(temperature) if temperature else None)
                 self.model_name = model_name
-                logger.info(f"Selected model: {model_name}")
+                self.context_window = context_window
+                logger.info(f"Selected model: {model_name} ({context_window} token context)")
                 return model
             except Exception as err:
                 logger.error(f"Failed to init {model_name}: {err}")
-        raise RuntimeError("No Ollama models could be initialized")
\ No newline at end of file
+        raise RuntimeError("No Ollama models could be initialized")
+
+
+# OpenAI-compatible local servers (llama.cpp, vLLM, LM Studio, ...)
+class OpenAILikeClass(LLM):
+    """
+    Loads a model served behind an OpenAI-compatible chat completions API
+    """
+    def __init__(self, base_url: str, model_name: str,
+                 api_key: str = "not-needed") -> None:
+        self.base_url = base_url.rstrip("/")
+        self.model_name = model_name
+        self.api_key = api_key
+        self.model = self._load_model()
+
+    @property
+    def health_url(self) -> str:
+        """endpoint answering 200 while the server is up"""
+        return f"{self.base_url}/models"
+
+    def _load_model(self):
+        from llama_index.llms.openai_like import OpenAILike
+
+        logger.info(f"Selected model: {self.model_name} at {self.base_url}")
+        return OpenAILike(model=self.model_name, api_base=self.base_url,
+                          api_key=self.api_key, is_chat_model=True,
+                          is_function_calling_model=True)
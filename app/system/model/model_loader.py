@@ -5,12 +5,13 @@ from tenacity import (
     stop_after_attempt
 )
 from ..utils.logger import logger
-from .llm_switcher import LLMSwitcher
 from ..utils.custom_exceptions import ModelLoadError
 
 
 # until loaded, the model does not exist
 model = None
+# models dedicated to a single agent role (question, research, report, review)
+role_models: dict = {}
 
 
 # helper function to load the model
@@ -23,14 +24,64 @@ def load_model():
     :params model_name: name of the model to be loaded
     :returns: None
     """
-    global model
-    model = LLMSwitcher().load_model()
+    global model, role_models
+    # deferred: these pull in llama-index and the provider integrations
+    from .cached import with_llm_cache
+    from .llm_switcher import LLMSwitcher
+
+    switcher = LLMSwitcher()
+    model = switcher.load_model()
     if model is None:
         logger.error('could not load the model: ')
         raise ModelLoadError('could not load model')
+    # repeated calls are answered from the completion cache when LLM_CACHE allows
+    model = with_llm_cache(model)
+    role_models = {role: with_llm_cache(llm)
+                   for role, llm in switcher.load_role_models().items()}
     return model
 
 
 def get_model():
     """Return the currently loaded model (or None)."""
     return model
+
+
+def get_role_model(role: str):
+    """Return the model assigned to an agent role, falling back to the default."""
+    return role_models.get(role) or get_model()
+
+
+def get_model_pool():
+    """Return the backend pool when several model servers are configured."""
+    return getattr(model, "pool", None)
+
+
+def get_model_pools() -> list:
+    """Return every distinct pool in use (default model and role models)."""
+    pools = [getattr(llm, "pool", None) for llm in [model, *role_models.values()]]
+    return list({id(pool): pool for pool in pools if pool is not None}.values())
+
+
+def loaded_ollama_models() -> set[tuple[str, str]]:
+    """Return the (model, url) pairs of the Ollama models in use."""
+    llms = []
+    for llm in [model, *role_models.values()]:
+        # cached models wrap the model (or pool) they call
+        llm = getattr(llm, "llm", llm)
+        pool = getattr(llm, "pool", None)
+        llms.extend([backend.llm for backend in pool.backends] if pool is not None else [llm])
+    return {(llm.model, llm.base_url.rstrip("/")) for llm in llms
+            if isinstance(getattr(llm, "model", None), str)
+            and isinstance(getattr(llm, "base_url", None), str)}
+
+
+def role_model_stats() -> dict:
+    """Return the model, concurrency limit and load of each role model."""
+    stats = {}
+    for role, llm in role_models.items():
+        limiter = llm.pool.limiter
+        stats[role] = {
+            "backends": [backend.name for backend in llm.pool.backends],
+            **(limiter.stats() if limiter else {}),
+        }
+    return stats
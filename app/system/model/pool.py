@@ -0,0 +1,317 @@
+"""module to spread LLM calls across several model servers"""
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+import time
+from typing import Any, Sequence
+
+import httpx
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    LLMMetadata,
+)
+from llama_index.core.llms.function_calling import FunctionCallingLLM
+from pydantic import PrivateAttr
+
+from ..utils.logger import logger
+from ..utils.custom_exceptions import ModelLoadError
+from ..utils.concurrency import PriorityLimiter
+
+
+class Backend:
+    """One model server in the pool and its routing statistics."""
+    def __init__(self, name: str, llm, health_url: str | None = None) -> None:
+        self.name = name
+        self.llm = llm
+        self.health_url = health_url
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.total_latency = 0.0
+        self.ewma_latency = 0.0
+        self.last_latency = 0.0
+
+    def available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+    def record_success(self, latency: float) -> None:
+        self.requests += 1
+        self.consecutive_failures = 0
+        self.total_latency += latency
+        self.last_latency = latency
+        # smoothed latency used to break ties between equally busy backends
+        self.ewma_latency = latency if self.requests == 1 else (
+            0.8 * self.ewma_latency + 0.2 * latency)
+
+    def record_failure(self) -> None:
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+
+    def stats(self, now: float) -> dict:
+        successes = self.requests - self.failures
+        return {
+            "name": self.name,
+            "healthy": self.available(now),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "avg_latency_s": round(self.total_latency / successes, 4) if successes else 0.0,
+            "ewma_latency_s": round(self.ewma_latency, 4),
+            "last_latency_s": round(self.last_latency, 4),
+        }
+
+
+class ModelPool:
+    """
+    Least-outstanding-requests router over several backends. A backend that
+    fails `eject_after` times in a row, or fails its health check, is taken
+    out of rotation for `eject_seconds`. `max_concurrency` optionally caps
+    how many async calls the whole pool serves at once.
+    """
+    def __init__(self, backends: list[Backend], eject_after: int = 3,
+                 eject_seconds: float = 30.0, max_concurrency: int | None = None,
+                 clock=time.monotonic) -> None:
+        if not backends:
+            raise ModelLoadError("model pool needs at least one backend")
+        self.backends = backends
+        self.limiter = PriorityLimiter(max_concurrency) if max_concurrency else None
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self._clock = clock
+        self._health_task: asyncio.Task | None = None
+
+    def pick(self, exclude: set[str] | None = None) -> Backend:
+        """Return the healthy backend with the fewest requests in flight."""
+        now = self._clock()
+        candidates = [b for b in self.backends
+                      if b.available(now) and b.name not in (exclude or set())]
+        if not candidates:
+            # everything is ejected: try whichever comes back first
+            candidates = sorted((b for b in self.backends
+                                 if b.name not in (exclude or set())),
+                                key=lambda b: b.ejected_until)[:1]
+        if not candidates:
+            raise ModelLoadError("no model backend available")
+        return min(candidates, key=lambda b: (b.outstanding, b.ewma_latency))
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the pool's concurrency slots (no-op when unlimited)."""
+        if self.limiter is None:
+            yield
+        else:
+            async with self.limiter.slot():
+                yield
+
+    @contextmanager
+    def track(self, backend: Backend):
+        """Count a request against `backend` and record its outcome."""
+        backend.outstanding += 1
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            backend.record_failure()
+            if backend.consecutive_failures >= self.eject_after:
+                self.eject(backend)
+            raise
+        else:
+            backend.record_success(time.perf_counter() - start)
+        finally:
+            backend.outstanding -= 1
+
+    def eject(self, backend: Backend) -> None:
+        backend.ejected_until = self._clock() + self.eject_seconds
+        logger.warning(f"Model backend {backend.name} ejected for {self.eject_seconds}s")
+
+    async def check_health(self, timeout: float = 5.0) -> dict[str, bool]:
+        """Probe every backend's health endpoint, ejecting the ones that fail."""
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            async def probe(backend: Backend) -> bool:
+                if backend.health_url is None:
+                    return True
+                try:
+                    response = await client.get(backend.health_url)
+                    return response.status_code < 500
+                except httpx.HTTPError:
+                    return False
+
+            results = await asyncio.gather(*(probe(b) for b in self.backends))
+
+        now = self._clock()
+        for backend, healthy in zip(self.backends, results, strict=True):
+            if not healthy:
+                self.eject(backend)
+            elif backend.ejected_until > now:
+                logger.info(f"Model backend {backend.name} is healthy again")
+                backend.ejected_until = 0.0
+                backend.consecutive_failures = 0
+        return {b.name: ok for b, ok in zip(self.backends, results, strict=True)}
+
+    async def _health_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.check_health()
+            except Exception:
+                logger.exception("Model pool health check failed")
+
+    def start_health_checks(self, interval: float) -> None:
+        """Probe backends every `interval` seconds in the background."""
+        if self._health_task is None and interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop(interval))
+
+    async def stop_health_checks(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+
+    def stats(self) -> list[dict]:
+        now = self._clock()
+        return [backend.stats(now) for backend in self.backends]
+
+
+class PooledLLM(FunctionCallingLLM):
+    """
+    LLM facade handed to the agents. Every call is routed to the least busy
+    backend of the pool; non-streaming calls fail over to another backend.
+    """
+    _pool: ModelPool = PrivateAttr()
+
+    def __init__(self, pool: ModelPool, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._pool = pool
+
+    @property
+    def pool(self) -> ModelPool:
+        return self._pool
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "PooledLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return self._pool.backends[0].llm.metadata
+
+    def _backend_for(self, response) -> Backend:
+        """Return the backend that produced `response` (for parsing tool calls)."""
+        name = getattr(response, "additional_kwargs", {}).get("pool_backend")
+        for backend in self._pool.backends:
+            if backend.name == name:
+                return backend
+        return self._pool.backends[0]
+
+    @staticmethod
+    def _tag(response, backend: Backend):
+        response.additional_kwargs["pool_backend"] = backend.name
+        return response
+
+    async def _acall(self, method: str, *args, **kwargs):
+        async with self._pool.slot():
+            return await self._acall_backend(method, *args, **kwargs)
+
+    async def _acall_backend(self, method: str, *args, **kwargs):
+        """Call `method` on a backend, retrying once on another on failure."""
+        backend = self._pool.pick()
+        try:
+            with self._pool.track(backend):
+                response = await getattr(backend.llm, method)(*args, **kwargs)
+        except Exception:
+            if len(self._pool.backends) < 2:
+                raise
+            logger.warning(f"{method} failed on {backend.name}, failing over")
+            backend = self._pool.pick(exclude={backend.name})
+            with self._pool.track(backend):
+                response = await getattr(backend.llm, method)(*args, **kwargs)
+        return self._tag(response, backend)
+
+    def _call(self, method: str, *args, **kwargs):
+        backend = self._pool.pick()
+        with self._pool.track(backend):
+            return self._tag(getattr(backend.llm, method)(*args, **kwargs), backend)
+
+    async def _astream(self, method: str, *args, **kwargs):
+        async def gen():
+            # the slot is held until the whole stream has been consumed
+            async with self._pool.slot():
+                backend = self._pool.pick()
+                with self._pool.track(backend):
+                    stream = await getattr(backend.llm, method)(*args, **kwargs)
+                    async for chunk in stream:
+                        yield self._tag(chunk, backend)
+        return gen()
+
+    def _stream(self, method: str, *args, **kwargs):
+        backend = self._pool.pick()
+
+        def gen():
+            with self._pool.track(backend):
+                for chunk in getattr(backend.llm, method)(*args, **kwargs):
+                    yield self._tag(chunk, backend)
+        return gen()
+
+    # plain chat / completion
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return self._call("chat", messages, **kwargs)
+
+    def complete(self, prompt: str, formatted: bool = False,
+                 **kwargs: Any) -> CompletionResponse:
+        return self._call("complete", prompt, formatted=formatted, **kwargs)
+
+    def stream_chat(self, messages: Sequence[ChatMessage],
+                    **kwargs: Any) -> ChatResponseGen:
+        return self._stream("stream_chat", messages, **kwargs)
+
+    def stream_complete(self, prompt: str, formatted: bool = False,
+                        **kwargs: Any) -> CompletionResponseGen:
+        return self._stream("stream_complete", prompt, formatted=formatted, **kwargs)
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return await self._acall("achat", messages, **kwargs)
+
+    async def acomplete(self, prompt: str, formatted: bool = False,
+                        **kwargs: Any) -> CompletionResponse:
+        return await self._acall("acomplete", prompt, formatted=formatted, **kwargs)
+
+    async def astream_chat(self, messages: Sequence[ChatMessage],
+                           **kwargs: Any) -> ChatResponseAsyncGen:
+        return await self._astream("astream_chat", messages, **kwargs)
+
+    async def astream_complete(self, prompt: str, formatted: bool = False,
+                               **kwargs: Any) -> CompletionResponseAsyncGen:
+        return await self._astream("astream_complete", prompt,
+                                   formatted=formatted, **kwargs)
+
+    # tool calling is delegated whole so each backend formats its own tools
+    def chat_with_tools(self, tools, user_msg=None, chat_history=None, **kwargs):
+        return self._call("chat_with_tools", tools, user_msg=user_msg,
+                          chat_history=chat_history, **kwargs)
+
+    async def achat_with_tools(self, tools, user_msg=None, chat_history=None, **kwargs):
+        return await self._acall("achat_with_tools", tools, user_msg=user_msg,
+                                 chat_history=chat_history, **kwargs)
+
+    async def astream_chat_with_tools(self, tools, user_msg=None, chat_history=None,
+                                      **kwargs):
+        return await self._astream("astream_chat_with_tools", tools, user_msg=user_msg,
+                                   chat_history=chat_history, **kwargs)
+
+    def _prepare_chat_with_tools(self, tools, user_msg=None, chat_history=None,
+                                 **kwargs) -> dict:
+        return self._pool.backends[0].llm._prepare_chat_with_tools(
+            tools, user_msg=user_msg, chat_history=chat_history, **kwargs)
+
+    def get_tool_calls_from_response(self, response, error_on_no_tool_call=True,
+                                     **kwargs):
+        return self._backend_for(response).llm.get_tool_calls_from_response(
+            response, error_on_no_tool_call=error_on_no_tool_call, **kwargs)
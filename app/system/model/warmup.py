@@ -0,0 +1,300 @@
+"""module to probe and warm up the candidate models once the API has started"""
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+import httpx
+
+from .llm_switcher import parse_backend_specs
+from .llms import DEFAULT_MODELS, DEFAULT_OLLAMA_URL, context_window_for
+from ..utils.logger import logger
+from ..utils.metrics import CallbackMetric
+from ..utils.settings import env_float, env_int, env_mapping, env_str
+
+
+WARMUP_PROMPT = "Reply with one short sentence."
+
+
+class ModelReadiness:
+    """Warm-up state of one model on one Ollama server."""
+    def __init__(self, model_name: str, base_url: str) -> None:
+        self.model_name = model_name
+        self.base_url = base_url.rstrip("/")
+        # pending -> warming -> ready | missing | failed
+        self.state = "pending"
+        self.pulled: bool | None = None
+        self.load_seconds: float | None = None
+        self.warmup_seconds: float | None = None
+        self.tokens_per_second: float | None = None
+        self.error: str | None = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.model_name}@{self.base_url}"
+
+    def describe(self) -> dict:
+        return {"model": self.model_name, "url": self.base_url, "state": self.state,
+                "pulled": self.pulled, "load_seconds": self.load_seconds,
+                "warmup_seconds": self.warmup_seconds,
+                "tokens_per_second": self.tokens_per_second, "error": self.error}
+
+
+def _pulled(tags: dict, model_name: str) -> bool:
+    """Whether /api/tags lists `model_name` (an untagged name means `:latest`)."""
+    names = {model.get("name") for model in tags.get("models", [])}
+    names |= {model.get("model") for model in tags.get("models", [])}
+    return model_name in names or f"{model_name}:latest" in names
+
+
+def warmup_targets() -> list[tuple[str, str]]:
+    """
+    Return the (model, Ollama url) pairs to warm: every candidate of the
+    default model on each Ollama backend, plus the role models.
+    OpenAI-compatible backends load their model themselves and are skipped.
+    """
+    specs = env_str("LLM_BACKENDS")
+    if specs:
+        servers = [(url, model_name) for provider, url, model_name
+                   in parse_backend_specs(specs) if provider == "ollama"]
+    else:
+        servers = [(DEFAULT_OLLAMA_URL, None)]
+    role_models = list(dict.fromkeys(env_mapping("LLM_ROLE_MODELS").values()))
+    targets = []
+    for url, model_name in servers:
+        for name in [*([model_name] if model_name else DEFAULT_MODELS), *role_models]:
+            targets.append((name, url))
+    return list(dict.fromkeys(targets))
+
+
+class ModelWarmup:
+    """
+    Probes every candidate model: checks the model is pulled, then runs a
+    short generation with the same context window (num_ctx) later calls
+    use, so Ollama does not reload it. Models of one server are probed one
+    after another, so they don't compete and each eval rate gives that
+    model's own tokens/sec; servers are probed in parallel, the models in
+    use (`first`) before the others. `ranked` orders candidates fastest
+    ready first for the loader, and `unload` frees the ones not chosen.
+    """
+    def __init__(self, num_predict: int = 16, keep_alive: str = "30m",
+                 timeout: float = 300.0, transport: httpx.AsyncBaseTransport | None = None,
+                 clock=time.perf_counter) -> None:
+        self.num_predict = num_predict
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.models: dict[str, ModelReadiness] = {}
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self._transport = transport
+        self._clock = clock
+        self._tasks: set[asyncio.Task] = set()
+
+    async def _probe(self, client: httpx.AsyncClient, readiness: ModelReadiness) -> None:
+        readiness.state = "warming"
+        started = self._clock()
+        try:
+            tags = await client.get(f"{readiness.base_url}/api/tags")
+            tags.raise_for_status()
+            readiness.pulled = _pulled(tags.json(), readiness.model_name)
+            if not readiness.pulled:
+                readiness.state = "missing"
+                readiness.error = f"run `ollama pull {readiness.model_name}`"
+                return
+            response = await client.post(f"{readiness.base_url}/api/generate", json={
+                "model": readiness.model_name, "prompt": WARMUP_PROMPT, "stream": False,
+                "keep_alive": self.keep_alive,
+                "options": {"num_predict": self.num_predict,
+                            "num_ctx": context_window_for(readiness.model_name)},
+            })
+            response.raise_for_status()
+            data = response.json()
+        except (httpx.HTTPError, ValueError) as err:
+            readiness.state = "failed"
+            readiness.error = str(err) or type(err).__name__
+            return
+        finally:
+            readiness.warmup_seconds = round(self._clock() - started, 3)
+        # durations are reported in nanoseconds
+        if data.get("load_duration") is not None:
+            readiness.load_seconds = round(data["load_duration"] / 1e9, 3)
+        tokens = data.get("eval_count") or 0
+        seconds = (data.get("eval_duration") or 0) / 1e9 or readiness.warmup_seconds
+        readiness.tokens_per_second = round(tokens / seconds, 2) if tokens and seconds else None
+        readiness.state = "ready"
+
+    def _track(self, task: asyncio.Task) -> asyncio.Task:
+        """Keep a background task until it finishes, so `stop` can cancel it."""
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def start(self, targets: list[tuple[str, str]],
+              first: set[tuple[str, str]] = frozenset()) -> asyncio.Task:
+        """Probe `targets` in the background, the (model, url) pairs in `first` first."""
+        self.started_at = self._clock()
+        self.finished_at = None
+        first = {(name, url.rstrip("/")) for name, url in first}
+        servers: dict[str, list[ModelReadiness]] = {}
+        for name, url in targets:
+            readiness = self.models.setdefault(f"{name}@{url.rstrip('/')}",
+                                               ModelReadiness(name, url))
+            servers.setdefault(readiness.base_url, []).append(readiness)
+        client = httpx.AsyncClient(timeout=self.timeout, transport=self._transport)
+
+        async def probe_server(pending: list[ModelReadiness]):
+            # models in use first, so they are warm before anything else
+            pending.sort(key=lambda readiness: (readiness.model_name, readiness.base_url)
+                         not in first)
+            for readiness in pending:
+                await self._probe(client, readiness)
+                logger.info(f"Model {readiness.key} warm-up: {readiness.state}"
+                            f" in {readiness.warmup_seconds}s,"
+                            f" {readiness.tokens_per_second} tokens/s")
+
+        async def probe_all():
+            try:
+                await asyncio.gather(*(probe_server(pending) for pending in servers.values()))
+            finally:
+                await client.aclose()
+                self.finished_at = self._clock()
+
+        return self._track(asyncio.create_task(probe_all()))
+
+    async def run(self, targets: list[tuple[str, str]], wait: float | None = None,
+                  first: set[tuple[str, str]] = frozenset()) -> dict:
+        """Probe `targets`; return once done or after `wait` seconds."""
+        task = self.start(targets, first)
+        try:
+            await asyncio.wait_for(asyncio.shield(task), wait)
+        except asyncio.TimeoutError:
+            pass
+        return self.stats()
+
+    async def unload(self, targets: list[tuple[str, str]]) -> None:
+        """Ask Ollama to unload the (model, url) pairs in `targets` now."""
+        async with httpx.AsyncClient(timeout=self.timeout, transport=self._transport) as client:
+            for name, url in targets:
+                try:
+                    response = await client.post(f"{url.rstrip('/')}/api/generate",
+                                                 json={"model": name, "keep_alive": 0})
+                    response.raise_for_status()
+                except httpx.HTTPError as err:
+                    logger.warning(f"Could not unload model {name}@{url}: {err}")
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def ranked(self, base_url: str, candidates: list[str]) -> list[str]:
+        """
+        Order `candidates` for loading on `base_url`: ready models fastest
+        first, then models not probed (yet), then missing or failed ones.
+        """
+        def rank(item):
+            index, name = item
+            readiness = self.models.get(f"{name}@{base_url.rstrip('/')}")
+            if readiness is None or readiness.state in ("pending", "warming"):
+                return (1, 0.0, index)
+            if readiness.state == "ready":
+                return (0, -(readiness.tokens_per_second or 0.0), index)
+            return (2, 0.0, index)
+        return [name for _, name in sorted(enumerate(candidates), key=rank)]
+
+    def stats(self) -> dict:
+        states = [readiness.state for readiness in self.models.values()]
+        if not states:
+            status = "skipped"
+        elif any(state in ("pending", "warming") for state in states):
+            status = "warming"
+        else:
+            status = "ready" if any(state == "ready" for state in states) else "failed"
+        finished = self.finished_at if self.finished_at is not None else self._clock()
+        return {"status": status,
+                "seconds": round(finished - self.started_at, 3) if self.started_at else None,
+                "models": [readiness.describe() for readiness in self.models.values()]}
+
+
+def build_model_warmup() -> ModelWarmup:
+    """Create the warm-up from LLM_WARMUP_TOKENS, LLM_KEEP_ALIVE and LLM_WARMUP_PROBE_TIMEOUT."""
+    return ModelWarmup(num_predict=env_int("LLM_WARMUP_TOKENS", 16),
+                       keep_alive=env_str("LLM_KEEP_ALIVE", "30m"),
+                       timeout=env_float("LLM_WARMUP_PROBE_TIMEOUT", 300))
+
+
+# until first use, the warm-up does not exist
+_model_warmup: ModelWarmup | None = None
+
+
+def get_model_warmup() -> ModelWarmup:
+    """Return the process-wide model warm-up, creating it on first use."""
+    global _model_warmup
+    if _model_warmup is None:
+        _model_warmup = build_model_warmup()
+    return _model_warmup
+
+
+def set_model_warmup(warmup: ModelWarmup | None) -> None:
+    """Plug in a different warm-up (None rebuilds from settings)."""
+    global _model_warmup
+    _model_warmup = warmup
+
+
+def preferred_models() -> set[tuple[str, str]]:
+    """
+    Return the (model, Ollama url) pairs the loader would pick now: on each
+    server the fastest ready default candidate (unless the backend names its
+    model), plus the role models.
+    """
+    warmup = get_model_warmup()
+    specs = env_str("LLM_BACKENDS")
+    if specs:
+        servers = [(url, model_name) for provider, url, model_name
+                   in parse_backend_specs(specs) if provider == "ollama"]
+    else:
+        servers = [(DEFAULT_OLLAMA_URL, None)]
+    role_models = set(env_mapping("LLM_ROLE_MODELS").values())
+    preferred = set()
+    for url, model_name in servers:
+        url = url.rstrip("/")
+        chosen = model_name or warmup.ranked(url, list(DEFAULT_MODELS))[0]
+        preferred |= {(name, url) for name in {chosen, *role_models}}
+    return preferred
+
+
+async def select_warm_models(reload: Callable[[], Awaitable[None]]) -> None:
+    """
+    Probe every candidate, the models in use first, then `reload` the
+    models if the fastest ready ones are not those in use, and unload the
+    candidates left unused.
+    """
+    from .model_loader import loaded_ollama_models
+
+    warmup = get_model_warmup()
+    targets = [(name, url.rstrip("/")) for name, url in warmup_targets()]
+    await warmup.run(targets, first=loaded_ollama_models())
+    if not preferred_models() <= loaded_ollama_models():
+        logger.info("Warm-up found faster models than those loaded; reloading")
+        await reload()
+    # only models the probes loaded need unloading
+    in_use = loaded_ollama_models()
+    await warmup.unload([(name, url) for name, url in targets if (name, url) not in in_use
+                         and warmup.models[f"{name}@{url}"].state == "ready"])
+
+
+def start_model_warmup(reload: Callable[[], Awaitable[None]]) -> asyncio.Task:
+    """Run `select_warm_models` in the background; called once the app has started."""
+    return get_model_warmup()._track(asyncio.create_task(select_warm_models(reload)))
+
+
+def _warmup_rates() -> dict:
+    warmup = _model_warmup
+    if warmup is None:
+        return {}
+    return {(readiness.model_name, readiness.base_url): readiness.tokens_per_second
+            for readiness in warmup.models.values() if readiness.tokens_per_second}
+
+
+CallbackMetric("llm_warmup_tokens_per_second",
+               "Generation rate of each model measured at warm-up.",
+               _warmup_rates, "gauge", labelnames=("model", "url"))
@@ -0,0 +1,268 @@
+"""module to share research runs between callers asking about the same topic"""
+import asyncio
+import sys
+from typing import Awaitable, Callable
+import uuid
+
+from .agents.notes import build_run_notes, use_notes
+from .agents.registry import get_agent_registry
+from .cache.report_cache import build_report_cache, topic_key
+from .cache.store import MISSING, CacheBackend
+from .shared import SharedState, get_shared_state
+from .utils.logger import logger
+from .utils.metrics import RUNS, RUN_MEMORY, WORKFLOWS_IN_FLIGHT, register_cache
+from .utils.settings import env_float
+from .utils.tracing import Span, get_tracer, trace_run
+
+
+# marks the end of a run's event stream
+_DONE = object()
+
+
+class ResearchRun:
+    """
+    A single workflow execution. Every event the workflow streams is kept
+    so callers that attach late still see the full progress history.
+    """
+    def __init__(self, key: str, topic: str) -> None:
+        self.run_id = uuid.uuid4().hex
+        self.key = key
+        self.topic = topic
+        self.events: list = []
+        self.subscribers = 0
+        self.done = False
+        self.result = None
+        self.error: BaseException | None = None
+        self._queues: set[asyncio.Queue] = set()
+        self._task: asyncio.Task | None = None
+        # notes, report and review recorded by the agents' tools
+        self.notes = build_run_notes()
+        # root span every step, agent, tool and LLM span of the run hangs off
+        self.root = Span("run", "run", self.run_id, None, {"topic": topic})
+
+    def start(self, handler, on_finish: Callable[["ResearchRun"], Awaitable[None]]) -> None:
+        """Drive `handler` in the background, publishing its events."""
+        WORKFLOWS_IN_FLIGHT.inc()
+        self._task = asyncio.create_task(self._drive(handler, on_finish))
+
+    async def _drive(self, handler, on_finish) -> None:
+        try:
+            if hasattr(handler, "stream_events"):
+                async for event in handler.stream_events():
+                    self._publish(event)
+            self.result = await handler
+        except Exception as exc:
+            logger.exception(f"Research run {self.run_id} failed")
+            self.error = exc
+        finally:
+            self.root.end(self.error)
+            get_tracer().export(self.root)
+            WORKFLOWS_IN_FLIGHT.dec()
+            RUNS.labels("failed" if self.error is not None else "succeeded").inc()
+            self.done = True
+            for queue in self._queues:
+                queue.put_nowait(_DONE)
+            await on_finish(self)
+            for part, size in self.memory().items():
+                RUN_MEMORY.labels(part).observe(size)
+
+    def _publish(self, event) -> None:
+        self.events.append(event)
+        for queue in self._queues:
+            queue.put_nowait(event)
+
+    def memory(self) -> dict[str, int]:
+        """Approximate bytes held by the run's notes and its event history."""
+        events = sys.getsizeof(self.events) + sum(
+            sys.getsizeof(event) + sum(
+                sys.getsizeof(value) for value in getattr(event, "__dict__", {}).values())
+            for event in self.events)
+        return {"notes": self.notes.memory_bytes(), "events": events}
+
+    async def subscribe(self):
+        """Yield every event of the run, replaying those already emitted."""
+        self.subscribers += 1
+        queue: asyncio.Queue = asyncio.Queue()
+        history = list(self.events)
+        if self.done:
+            queue.put_nowait(_DONE)
+        else:
+            self._queues.add(queue)
+        try:
+            for event in history:
+                yield event
+            while (event := await queue.get()) is not _DONE:
+                yield event
+        finally:
+            self._queues.discard(queue)
+
+    def add_done_callback(self, callback: Callable[[], None]) -> None:
+        """Call `callback` once the run has ended, however its callers fare."""
+        self._task.add_done_callback(lambda _: callback())
+
+    async def wait(self):
+        """Return the final result; shielded so one caller can't cancel the run."""
+        await asyncio.shield(self._task)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SharedRunHandler:
+    """
+    Stands in for a workflow handler when workers share state: claims the
+    topic for this worker first. While another worker researches it, waits
+    for that run's report to reach the shared report cache; if that worker
+    stops without one, the topic is claimed again and, failing another
+    claimant, researched here. The SQLite calls run in a thread, so a busy
+    database never blocks the event loop.
+    """
+    def __init__(self, registry: "RunRegistry", run: ResearchRun,
+                 start_handler: Callable[[], object], poll: float = 1.0) -> None:
+        self.registry = registry
+        self.run = run
+        self.start_handler = start_handler
+        self.poll = poll
+        self.result = None
+
+    async def stream_events(self):
+        from .utils.events import ProgressEvent
+
+        shared = self.registry.shared
+        followed = False
+        while (remote := await asyncio.to_thread(
+                shared.claim_run, self.run.run_id, self.run.key, self.run.topic)) is not None:
+            if not followed:
+                followed = True
+                self.registry.followed += 1
+                logger.info(f"Following research run {remote['run_id']} of worker {remote['worker']}")
+            yield ProgressEvent(msg=f"Waiting for worker {remote['worker']}, "
+                                    "already researching this topic")
+            while await asyncio.to_thread(shared.is_running, remote["run_id"]):
+                await asyncio.sleep(self.poll)
+            # the report is cached before the run is released
+            report = await self.registry.report_cache.aget(self.run.key)
+            if report is not MISSING:
+                self.result = report
+                return
+
+        handler = self.start_handler()
+        if hasattr(handler, "stream_events"):
+            async for event in handler.stream_events():
+                yield event
+        self.result = await handler
+
+    def __await__(self):
+        return self._result().__await__()
+
+    async def _result(self):
+        return self.result
+
+
+class RunRegistry:
+    """
+    Single-flight registry: identical in-flight topics share one run, and
+    finished reports are cached by normalized topic. With `shared` state,
+    a topic in flight in another worker process is followed, not re-run.
+    """
+    def __init__(self, report_cache: CacheBackend,
+                 shared: SharedState | None = None, poll: float = 1.0) -> None:
+        self.report_cache = report_cache
+        self.shared = shared
+        self.poll = poll
+        self.in_flight: dict[str, ResearchRun] = {}
+        self.deduplicated = 0
+        self.followed = 0
+
+    def cached_report(self, topic: str):
+        """Return the cached report for `topic` or MISSING."""
+        return self.report_cache.get(topic_key(topic))
+
+    async def acached_report(self, topic: str):
+        """`cached_report` for coroutines, reading a shared cache file off the event loop."""
+        return await self.report_cache.aget(topic_key(topic))
+
+    def start(self, topic: str, start_handler: Callable[[], object]) -> ResearchRun:
+        """
+        Attach to the in-flight run for `topic`, or start a new one by calling
+        `start_handler` (which must return a workflow handler).
+        """
+        key = topic_key(topic)
+        run = self.in_flight.get(key)
+        if run is not None:
+            self.deduplicated += 1
+            logger.info(f"Attaching to in-flight research run {run.run_id}")
+            return run
+
+        run = ResearchRun(key, topic)
+        # workflow tasks inherit the trace context and notes they are created in
+        with trace_run(run.run_id, run.root.span_id), use_notes(run.notes):
+            if self.shared is not None:
+                run.start(SharedRunHandler(self, run, start_handler, self.poll), self._finish)
+            else:
+                run.start(start_handler(), self._finish)
+        self.in_flight[key] = run
+        return run
+
+    async def _finish(self, run: ResearchRun) -> None:
+        if self.in_flight.get(run.key) is run:
+            del self.in_flight[run.key]
+        if run.error is None and run.result is not None:
+            await self.report_cache.aset(run.key, str(run.result))
+        if self.shared is not None:
+            await asyncio.to_thread(self.shared.run_finished, run.run_id)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self.in_flight),
+            "memory": {run.run_id: {**run.memory(), "notes_count": len(run.notes.notes)}
+                       for run in self.in_flight.values()},
+            "deduplicated": self.deduplicated,
+            "followed": self.followed,
+            **({"shared": self.shared.describe()} if self.shared is not None else {}),
+            "report_cache": self.report_cache.describe()
+            if hasattr(self.report_cache, "describe")
+            else self.report_cache.stats.as_dict(),
+        }
+
+
+def start_workflow(topic: str, answer_memo=None):
+    """
+    Build a fresh workflow for `topic` around the warm agents and start it.
+    Runs of one batch pass the same `answer_memo` to share their answers.
+    """
+    # the workflow (and llama-index) is imported on the first run, not at startup
+    from .agents.workflow import WorkflowClass
+
+    agents = get_agent_registry()
+    workflow = WorkflowClass(timeout=300)
+    return workflow.run(
+        research_topic=topic,
+        question_agent=agents.get("question"),
+        answer_agent=agents.get("research"),
+        report_agent=agents.get("report"),
+        review_agent=agents.get("review"),
+        answer_memo=answer_memo,
+    )
+
+
+# until first use, the registry does not exist
+_registry: RunRegistry | None = None
+
+
+def get_run_registry() -> RunRegistry:
+    """Return the process-wide run registry."""
+    global _registry
+    if _registry is None:
+        _registry = RunRegistry(build_report_cache(), get_shared_state(),
+                                poll=env_float("SHARED_POLL_INTERVAL", 1.0))
+    return _registry
+
+
+register_cache("report", lambda: get_run_registry().report_cache)
+
+
+def set_run_registry(registry: RunRegistry | None) -> None:
+    """Replace the run registry (None rebuilds it from settings)."""
+    global _registry
+    _registry = registry
@@ -0,0 +1,79 @@
+"""module to define the search backends queried side by side by search_web"""
+from abc import ABC, abstractmethod
+
+from .client import get_search_client
+from ..utils.settings import env_list, env_str
+
+
+class SearchHit:
+    """One document returned by a search backend."""
+    __slots__ = ("url", "title", "content", "score", "sources")
+
+    def __init__(self, url: str, title: str = "", content: str = "",
+                 score: float | None = None, source: str = "") -> None:
+        self.url = url
+        self.title = title
+        self.content = content
+        self.score = score
+        # every backend that returned this document (filled in by fusion)
+        self.sources = [source] if source else []
+
+    def __repr__(self) -> str:
+        return f"SearchHit({self.url!r}, sources={self.sources})"
+
+
+class SearchResult:
+    """Ranked hits from one backend, plus its direct answer if it gives one."""
+    def __init__(self, hits: list[SearchHit], answer: str | None = None) -> None:
+        self.hits = hits
+        self.answer = answer
+
+
+# enforcing every search backend to be defined the same way
+class SearchBackend(ABC):
+    """
+    interface guiding search backend creation. `timeout` bounds one
+    query; if no result arrived after `hedge_after` seconds a second,
+    identical request is raced against the first (None disables hedging).
+    """
+    name = "backend"
+    # environment variables the backend cannot work without
+    required_env: tuple[str, ...] = ()
+
+    def __init__(self, timeout: float = 10.0, hedge_after: float | None = None) -> None:
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+
+    @abstractmethod
+    async def search(self, query: str, max_results: int) -> SearchResult:
+        """Return up to `max_results` hits for `query`, best first."""
+
+
+class TavilyBackend(SearchBackend):
+    """Web search through the shared, pooled Tavily client."""
+    name = "tavily"
+    required_env = ("TAVILY_API_KEY",)
+
+    async def search(self, query: str, max_results: int) -> SearchResult:
+        data = await get_search_client().search(
+            query, max_results=max_results, include_answer=True)
+        hits = [SearchHit(item.get("url", ""), item.get("title", ""),
+                          item.get("content", ""), item.get("score"), self.name)
+                for item in data.get("results", [])]
+        return SearchResult(hits, data.get("answer") or None)
+
+
+# backend classes selectable through SEARCH_BACKENDS
+BACKEND_TYPES: dict[str, type[SearchBackend]] = {
+    "tavily": TavilyBackend,
+}
+
+
+def check_search_credentials() -> None:
+    """Raise at startup if a backend in SEARCH_BACKENDS is missing its API key."""
+    for name in env_list("SEARCH_BACKENDS", "tavily"):
+        backend = BACKEND_TYPES.get(name)
+        for variable in getattr(backend, "required_env", ()):
+            if not env_str(variable):
+                raise RuntimeError(f"Missing required environment variable '{variable}' "
+                                   f"for the {name} search backend.")
@@ -0,0 +1,187 @@
+"""module to manage the process-wide, pooled web search client"""
+import asyncio
+import time
+
+import httpx
+
+from ..utils.logger import logger
+from ..utils.settings import env_int, env_float, env_str
+from ..utils.custom_exceptions import SearchError
+from ..utils.tracing import traced
+from ..utils.metrics import SEARCH_LATENCY, SEARCH_REQUESTS
+
+
+# counters bound once so the request path does no label lookups
+_SEARCH_OK = SEARCH_REQUESTS.labels("ok")
+_SEARCH_ERROR = SEARCH_REQUESTS.labels("error")
+
+
+class SearchClientManager:
+    """
+    Owns a single keep-alive HTTP connection pool to the Tavily search API
+    and caps the number of searches in flight at once, so repeated tool
+    calls reuse warm connections instead of paying a new TLS handshake.
+    """
+    def __init__(self, api_key: str | None = None,
+                 base_url: str = "https://api.tavily.com",
+                 max_connections: int = 20,
+                 max_keepalive_connections: int = 10,
+                 keepalive_expiry: float = 30.0,
+                 max_in_flight: int = 8,
+                 timeout: float = 60.0,
+                 transport: httpx.AsyncBaseTransport | None = None) -> None:
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_in_flight = max_in_flight
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = timeout
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+
+        # utilization counters
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.total_latency = 0.0
+
+    @property
+    def started(self) -> bool:
+        return self._client is not None and not self._client.is_closed
+
+    async def start(self) -> None:
+        """Open the shared connection pool."""
+        if self.started:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            limits=self.limits,
+            timeout=self.timeout,
+            transport=self._transport,
+        )
+        logger.info(f"Search client started (max_in_flight={self.max_in_flight})")
+
+    async def close(self) -> None:
+        """Close the connection pool, waiting for open connections to drain."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("Search client closed")
+
+    @traced("search.request", kind="search")
+    async def search(self, query: str, **params) -> dict:
+        """Run a Tavily search through the shared pool."""
+        if not self.started:
+            await self.start()
+
+        self.waiting += 1
+        async with self._semaphore:
+            self.waiting -= 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            start = time.perf_counter()
+            try:
+                response = await self._client.post(
+                    "/search", json={"query": query, **params})
+                response.raise_for_status()
+                _SEARCH_OK.inc()
+                return response.json()
+            except httpx.HTTPError as err:
+                self.errors += 1
+                _SEARCH_ERROR.inc()
+                raise SearchError(f"Search request failed: {err}") from err
+            finally:
+                elapsed = time.perf_counter() - start
+                self.in_flight -= 1
+                self.requests += 1
+                self.total_latency += elapsed
+                SEARCH_LATENCY.observe(elapsed)
+
+    def _pool_connections(self) -> list:
+        """Return the live connections of the underlying pool, if visible."""
+        transport = getattr(self._client, "_transport", None)
+        pool = getattr(transport, "_pool", None)
+        return list(getattr(pool, "connections", []))
+
+    def metrics(self) -> dict:
+        """Return pool utilization and request counters."""
+        connections = self._pool_connections() if self.started else []
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {
+            "started": self.started,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "peak_in_flight": self.peak_in_flight,
+            "max_in_flight": self.max_in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "avg_latency_s": round(self.total_latency / self.requests, 4)
+            if self.requests else 0.0,
+            "pool": {
+                "connections": len(connections),
+                "idle": idle,
+                "active": len(connections) - idle,
+                "max_connections": self.limits.max_connections,
+                "max_keepalive": self.limits.max_keepalive_connections,
+            },
+        }
+
+
+# until started, the shared client does not exist
+_manager: SearchClientManager | None = None
+
+
+def build_search_client() -> SearchClientManager:
+    """Create a search client manager from the SEARCH_* environment variables."""
+    return SearchClientManager(
+        api_key=env_str("TAVILY_API_KEY"),
+        base_url=env_str("TAVILY_BASE_URL", "https://api.tavily.com"),
+        max_connections=env_int("SEARCH_MAX_CONNECTIONS", 20),
+        max_keepalive_connections=env_int("SEARCH_MAX_KEEPALIVE", 10),
+        keepalive_expiry=env_float("SEARCH_KEEPALIVE_EXPIRY", 30.0),
+        max_in_flight=env_int("SEARCH_MAX_IN_FLIGHT", 8),
+        timeout=env_float("SEARCH_TIMEOUT", 60.0),
+    )
+
+
+def get_search_client() -> SearchClientManager:
+    """Return the shared search client, creating it lazily outside the lifespan."""
+    global _manager
+    if _manager is None:
+        _manager = build_search_client()
+    return _manager
+
+
+def set_search_client(manager: SearchClientManager | None) -> None:
+    """Replace the shared search client (None resets it)."""
+    global _manager
+    _manager = manager
+
+
+async def start_search_client() -> SearchClientManager:
+    """Open the shared search client; called from the app lifespan."""
+    manager = get_search_client()
+    await manager.start()
+    return manager
+
+
+async def close_search_client() -> None:
+    """Close the shared search client; called on app shutdown."""
+    global _manager
+    if _manager is not None:
+        await _manager.close()
+        _manager = None
+
+
+def search_client_metrics() -> dict:
+    """Return metrics for the shared client without creating one."""
+    if _manager is None:
+        return {"started": False}
+    return _manager.metrics()
@@ -0,0 +1,85 @@
+"""module to merge ranked search results from several backends"""
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .backends import SearchHit
+from ..cache.search_cache import normalize_query
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL for duplicate detection: lower-case host
+    without `www.`, no fragment, no tracking parameters, no trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    query = urlencode(sorted((key, value) for key, value in parse_qsl(parts.query)
+                             if not key.lower().startswith("utm_")))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("", host, path, query, ""))
+
+
+def content_fingerprint(text: str, chars: int = 300) -> str:
+    """Hash of the normalized start of a document, to spot mirrored pages."""
+    return hashlib.sha1(normalize_query(text)[:chars].encode("utf-8")).hexdigest()
+
+
+def _identities(hit: SearchHit) -> list[str]:
+    """Keys a hit can be recognized by: its URL and its content."""
+    keys = [f"url:{normalize_url(hit.url)}"] if hit.url else []
+    if hit.content:
+        keys.append(f"content:{content_fingerprint(hit.content)}")
+    return keys
+
+
+def _merge_hit(existing: SearchHit, hit: SearchHit) -> None:
+    """Fold a duplicate hit into the one already kept."""
+    for source in hit.sources:
+        if source not in existing.sources:
+            existing.sources.append(source)
+    if len(hit.content) > len(existing.content):
+        existing.content = hit.content
+    existing.title = existing.title or hit.title
+
+
+def reciprocal_rank_fusion(rankings: list[list[SearchHit]], k: int = 60) -> list[SearchHit]:
+    """
+    Fuse ranked lists by reciprocal rank (sum of 1 / (k + rank)), merging
+    hits that share a URL or their content into one, best first.
+    """
+    scores: dict[str, float] = {}
+    merged: dict[str, SearchHit] = {}
+    aliases: dict[str, str] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            keys = _identities(hit)
+            if not keys:
+                continue
+            # the first key seen for any of this hit's identities wins
+            key = next((aliases[key] for key in keys if key in aliases), keys[0])
+            for alias in keys:
+                aliases.setdefault(alias, key)
+
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            if key in merged:
+                _merge_hit(merged[key], hit)
+            else:
+                merged[key] = hit
+
+    for key, hit in merged.items():
+        hit.score = round(scores[key], 6)
+    return sorted(merged.values(), key=lambda hit: hit.score, reverse=True)
+
+
+def render_evidence(answers: dict[str, str], hits: list[SearchHit],
+                    snippet_chars: int = 400) -> str:
+    """Render direct answers and fused hits as a compact, numbered bundle."""
+    lines = [f"Answer ({source}): {answer}" for source, answer in answers.items()]
+    for index, hit in enumerate(hits, start=1):
+        snippet = " ".join(hit.content.split())
+        if len(snippet) > snippet_chars:
+            snippet = snippet[:snippet_chars].rsplit(" ", 1)[0] + " ..."
+        lines.append(f"[{index}] {hit.title or hit.url} ({hit.url})")
+        if snippet:
+            lines.append(f"    {snippet}")
+    return "\n".join(lines)
@@ -0,0 +1,377 @@
+"""module to keep a local retrieval index of evidence gathered in past runs"""
+import asyncio
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from .backends import BACKEND_TYPES, SearchBackend, SearchHit, SearchResult
+from .fusion import content_fingerprint, normalize_url, reciprocal_rank_fusion
+from ..utils.logger import logger
+from ..utils.metrics import CallbackMetric
+from ..utils.settings import env_bool, env_float, env_int, env_str
+from ..utils.text import terms
+
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS documents ("
+    "id INTEGER PRIMARY KEY, url_key TEXT UNIQUE NOT NULL, url TEXT NOT NULL, "
+    "fingerprint TEXT UNIQUE, "
+    "title TEXT, content TEXT NOT NULL, source TEXT, length INTEGER NOT NULL, "
+    "vector_row INTEGER, added_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS postings ("
+    "term TEXT NOT NULL, doc_id INTEGER NOT NULL, tf INTEGER NOT NULL, "
+    "PRIMARY KEY (term, doc_id)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL NOT NULL)",
+    # vector rows of evicted documents, reused by the next documents added
+    "CREATE TABLE IF NOT EXISTS free_vector_rows (row INTEGER PRIMARY KEY)",
+)
+
+
+class HashingEmbedder:
+    """
+    Dependency-free embedding: content words hashed into `dim` signed
+    buckets and L2 normalized. Any callable mapping a list of texts to an
+    (n, dim) float32 array can be used instead.
+    """
+    def __init__(self, dim: int = 256) -> None:
+        self.dim = dim
+
+    def __call__(self, texts: list[str]):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term in terms(text):
+                digest = int.from_bytes(hashlib.blake2b(term.encode(), digest_size=8).digest(), "big")
+                vectors[row, digest % self.dim] += 1.0 if digest >> 63 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class DenseIndex:
+    """
+    Embeddings appended to a flat float32 file and searched through a
+    read-only memory map, so the vectors are paged in by the OS instead of
+    being loaded into the process. Without a path they live in memory.
+    """
+    def __init__(self, embed, dim: int, path: str | None = None) -> None:
+        self.embed = embed
+        self.dim = dim
+        self.path = path
+        self._rows = 0
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        if path and os.path.exists(path):
+            self._rows = os.path.getsize(path) // (4 * dim)
+            self._remap()
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def _remap(self) -> None:
+        if self._rows:
+            self._matrix = np.memmap(self.path, dtype=np.float32, mode="r",
+                                     shape=(self._rows, self.dim))
+
+    def write(self, rows: list[int], texts: list[str] | None = None) -> None:
+        """Embed `texts` into `rows`, growing the file as needed; no texts zero the rows."""
+        if not rows:
+            return
+        if texts is None:
+            vectors = np.zeros((len(rows), self.dim), dtype=np.float32)
+        else:
+            vectors = np.asarray(self.embed(texts), dtype=np.float32).reshape(-1, self.dim)
+        size = max(self._rows, max(rows) + 1)
+        if self.path:
+            with open(self.path, "r+b" if os.path.exists(self.path) else "w+b") as vector_file:
+                for row, vector in zip(rows, vectors, strict=True):
+                    vector_file.seek(row * 4 * self.dim)
+                    vector.tofile(vector_file)
+            self._rows = max(size, os.path.getsize(self.path) // (4 * self.dim))
+            self._remap()
+        else:
+            if size > len(self._matrix):
+                grown = np.zeros((size, self.dim), dtype=np.float32)
+                grown[:len(self._matrix)] = self._matrix
+                self._matrix = grown
+            self._matrix[rows] = vectors
+            self._rows = size
+
+    def search(self, query: str, limit: int) -> list[tuple[int, float]]:
+        """Return (row, cosine similarity) of the closest rows, best first."""
+        if not self._rows:
+            return []
+        query_vector = np.asarray(self.embed([query]), dtype=np.float32).reshape(self.dim)
+        scores = self._matrix @ query_vector
+        limit = min(limit, self._rows)
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top if scores[row] > 0]
+
+
+class LocalIndex:
+    """
+    Searchable store of documents gathered by earlier searches and notes.
+    Keyword relevance comes from a BM25 inverted index kept in SQLite; an
+    optional dense index adds vector similarity, fused with BM25 by
+    reciprocal rank. Each search also reports a confidence: the share of
+    the query's idf weight that the best document covers, which stays low
+    when the query mentions something the corpus has never seen.
+    """
+    def __init__(self, path: str = ":memory:", dense: DenseIndex | None = None,
+                 max_documents: int = 10_000, k1: float = 1.2, b: float = 0.75) -> None:
+        self.path = path
+        self.dense = dense
+        self.max_documents = max_documents
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        if dense is not None and len(dense) > self._meta("vector_rows"):
+            # vector files written before rows were allocated in the database
+            self._add_meta("vector_rows", len(dense) - self._meta("vector_rows"))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._meta("documents")
+
+    def _meta(self, key: str) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return int(row[0]) if row else 0
+
+    def _add_meta(self, key: str, delta: int) -> None:
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+            (key, delta))
+
+    def _bump(self, documents: int, length: int) -> None:
+        self._add_meta("documents", documents)
+        self._add_meta("length", length)
+
+    def _allocate_rows(self, count: int) -> list[int]:
+        """Take `count` vector rows: freed ones first, then new ones at the end."""
+        rows = [row for (row,) in self._conn.execute(
+            "SELECT row FROM free_vector_rows ORDER BY row LIMIT ?", (count,))]
+        self._conn.executemany("DELETE FROM free_vector_rows WHERE row = ?",
+                               [(row,) for row in rows])
+        first = self._meta("vector_rows")
+        new = count - len(rows)
+        self._add_meta("vector_rows", new)
+        return rows + list(range(first, first + new))
+
+    def add(self, hits: list[SearchHit]) -> int:
+        """Index documents not seen before (by URL or content); return how many."""
+        fresh = []
+        freed: list[int] = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for hit in hits:
+                    words = terms(f"{hit.title} {hit.content}")
+                    if not words:
+                        continue
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO documents (url_key, url, fingerprint, title, "
+                        "content, source, length, added_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (normalize_url(hit.url), hit.url,
+                         content_fingerprint(hit.content) if hit.content else None, hit.title,
+                         hit.content, ",".join(hit.sources), len(words), time.time()))
+                    if not cursor.rowcount:
+                        continue
+                    doc_id = cursor.lastrowid
+                    counts: dict[str, int] = {}
+                    for word in words:
+                        counts[word] = counts.get(word, 0) + 1
+                    self._conn.executemany(
+                        "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                        [(term, doc_id, tf) for term, tf in counts.items()])
+                    self._bump(1, len(words))
+                    fresh.append((doc_id, f"{hit.title}\n{hit.content}"))
+                rows = []
+                if self.dense is not None and fresh:
+                    rows = self._allocate_rows(len(fresh))
+                    self._conn.executemany(
+                        "UPDATE documents SET vector_row = ? WHERE id = ?",
+                        [(row, doc_id) for row, (doc_id, _) in zip(rows, fresh, strict=True)])
+                freed = self._evict()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            # vectors are written once the rows are committed, so a rollback
+            # never leaves the vector file ahead of the database
+            if self.dense is not None:
+                try:
+                    self.dense.write(rows, [text for _, text in fresh])
+                    self.dense.write([row for row in freed if row not in rows])
+                except Exception:
+                    # keyword search still finds the documents; their rows are freed
+                    self._conn.executemany("UPDATE documents SET vector_row = NULL WHERE id = ?",
+                                           [(doc_id,) for doc_id, _ in fresh])
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO free_vector_rows (row) VALUES (?)",
+                        [(row,) for row in rows])
+                    raise
+        return len(fresh)
+
+    def _evict(self) -> list[int]:
+        """Drop the oldest documents over `max_documents`; return their freed vector rows."""
+        excess = self._meta("documents") - self.max_documents
+        if excess <= 0:
+            return []
+        old = self._conn.execute(
+            "SELECT id, length, vector_row FROM documents ORDER BY id LIMIT ?",
+            (excess,)).fetchall()
+        ids = [(doc_id,) for doc_id, _, _ in old]
+        freed = [row for _, _, row in old if row is not None]
+        self._conn.executemany("DELETE FROM postings WHERE doc_id = ?", ids)
+        self._conn.executemany("DELETE FROM documents WHERE id = ?", ids)
+        self._conn.executemany("INSERT OR IGNORE INTO free_vector_rows (row) VALUES (?)",
+                               [(row,) for row in freed])
+        self._bump(-len(old), -sum(length for _, length, _ in old))
+        return freed
+
+    def _bm25(self, query_terms: list[str]) -> tuple[dict[int, float], dict[int, float], float]:
+        """Return BM25 scores, idf weight covered per document and total query idf."""
+        total_docs = self._meta("documents")
+        if not total_docs:
+            return {}, {}, 0.0
+        average_length = self._meta("length") / total_docs
+        scores: dict[int, float] = {}
+        covered: dict[int, float] = {}
+        total_idf = 0.0
+        lengths: dict[int, int] = {}
+        for term in set(query_terms):
+            postings = self._conn.execute(
+                "SELECT p.doc_id, p.tf, d.length FROM postings p "
+                "JOIN documents d ON d.id = p.doc_id WHERE p.term = ?", (term,)).fetchall()
+            idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            total_idf += idf
+            for doc_id, tf, length in postings:
+                lengths[doc_id] = length
+                norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+                covered[doc_id] = covered.get(doc_id, 0.0) + idf
+        return scores, covered, total_idf
+
+    def _hits(self, doc_ids: list[int], scores: dict[int, float]) -> list[SearchHit]:
+        if not doc_ids:
+            return []
+        marks = ",".join("?" * len(doc_ids))
+        rows = self._conn.execute(
+            f"SELECT id, url, title, content FROM documents WHERE id IN ({marks})",
+            doc_ids).fetchall()
+        by_id = {row[0]: row for row in rows}
+        return [SearchHit(by_id[doc_id][1], by_id[doc_id][2], by_id[doc_id][3],
+                          round(scores[doc_id], 6), "local")
+                for doc_id in doc_ids if doc_id in by_id]
+
+    def search(self, query: str, limit: int = 5) -> tuple[list[SearchHit], float]:
+        """Return the best `limit` documents for `query` and a 0 to 1 confidence."""
+        query_terms = terms(query)
+        if not query_terms:
+            return [], 0.0
+        with self._lock:
+            scores, covered, total_idf = self._bm25(query_terms)
+            keyword = sorted(scores, key=scores.get, reverse=True)[:limit]
+            confidence = covered[keyword[0]] / total_idf if keyword and total_idf else 0.0
+            rankings = [self._hits(keyword, scores)]
+            if self.dense is not None:
+                nearest = self.dense.search(query, limit * 2)
+                similarity = dict(nearest)
+                marks = ",".join("?" * len(similarity))
+                rows = self._conn.execute(
+                    f"SELECT id, vector_row FROM documents WHERE vector_row IN ({marks})",
+                    list(similarity)).fetchall() if similarity else []
+                vector_scores = {doc_id: similarity[row] for doc_id, row in rows}
+                semantic = sorted(vector_scores, key=vector_scores.get, reverse=True)[:limit]
+                rankings.append(self._hits(semantic, vector_scores))
+        if len(rankings) == 1:
+            return rankings[0], round(confidence, 4)
+        return reciprocal_rank_fusion(rankings)[:limit], round(confidence, 4)
+
+    def describe(self) -> dict:
+        with self._lock:
+            return {"documents": self._meta("documents"), "path": self.path,
+                    "dense": len(self.dense) if self.dense is not None else None}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class LocalIndexBackend(SearchBackend):
+    """The local index as a search backend, fused with the web backends."""
+    name = "local"
+
+    async def search(self, query: str, max_results: int) -> SearchResult:
+        index = get_local_index()
+        hits, confidence = await asyncio.to_thread(index.search, query, max_results)
+        # below the threshold the local hits are noise next to web results
+        if confidence < env_float("LOCAL_INDEX_MIN_CONFIDENCE", 0.5):
+            return SearchResult([])
+        return SearchResult(hits)
+
+
+BACKEND_TYPES["local"] = LocalIndexBackend
+
+
+async def index_evidence(hits: list[SearchHit]) -> None:
+    """Add `hits` to the local index off the event loop; failures are only logged."""
+    if not hits or not env_bool("LOCAL_INDEX_AUTOFILL", True):
+        return
+    try:
+        await asyncio.to_thread(get_local_index().add, hits)
+    except Exception as err:
+        logger.warning(f"Could not add evidence to the local index: {err}")
+
+
+def build_local_index() -> LocalIndex:
+    """
+    Create the local index from LOCAL_INDEX_PATH (a directory; unset keeps
+    it in memory), LOCAL_INDEX_MAX_DOCS and LOCAL_INDEX_DENSE /
+    LOCAL_INDEX_EMBED_DIM for the optional vector index.
+    """
+    directory = env_str("LOCAL_INDEX_PATH")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    dense = None
+    if env_bool("LOCAL_INDEX_DENSE"):
+        dim = env_int("LOCAL_INDEX_EMBED_DIM", 256)
+        dense = DenseIndex(HashingEmbedder(dim), dim,
+                           os.path.join(directory, f"vectors-{dim}.f32") if directory else None)
+    index = LocalIndex(os.path.join(directory, "index.sqlite3") if directory else ":memory:",
+                       dense=dense, max_documents=env_int("LOCAL_INDEX_MAX_DOCS", 10_000))
+    if directory:
+        logger.info(f"Local index persisted to {directory}")
+    return index
+
+
+# until first use, the local index does not exist
+_local_index: LocalIndex | None = None
+
+
+def get_local_index() -> LocalIndex:
+    """Return the process-wide local index, creating it on first use."""
+    global _local_index
+    if _local_index is None:
+        _local_index = build_local_index()
+    return _local_index
+
+
+def set_local_index(index: LocalIndex | None) -> None:
+    """Replace the local index (None rebuilds it from settings)."""
+    global _local_index
+    _local_index = index
+
+
+CallbackMetric("local_index_documents", "Documents held by the local retrieval index.",
+               lambda: len(_local_index) if _local_index is not None else 0)
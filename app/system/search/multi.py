@@ -0,0 +1,140 @@
+"""module to query every search backend at once and fuse their results"""
+import asyncio
+
+from . import local_index  # noqa: F401 (registers the "local" backend)
+from .backends import BACKEND_TYPES, SearchBackend, SearchHit, SearchResult
+from .fusion import reciprocal_rank_fusion, render_evidence
+from ..utils.logger import logger
+from ..utils.metrics import SEARCH_BACKEND_CALLS
+from ..utils.settings import env_float, env_int, env_list, env_mapping
+from ..utils.tracing import span
+
+
+class EvidenceBundle:
+    """Fused outcome of one multi-source search."""
+    def __init__(self, query: str, answers: dict[str, str], hits: list[SearchHit],
+                 failed: list[str]) -> None:
+        self.query = query
+        self.answers = answers
+        self.hits = hits
+        self.failed = failed
+
+    @property
+    def empty(self) -> bool:
+        return not self.answers and not self.hits
+
+    def render(self, snippet_chars: int = 400) -> str:
+        return render_evidence(self.answers, self.hits, snippet_chars)
+
+
+async def hedged(backend: SearchBackend, query: str, max_results: int) -> SearchResult:
+    """
+    Run `backend.search`, racing a duplicate request against it when the
+    first has not answered within `backend.hedge_after` seconds.
+    """
+    tasks = [asyncio.create_task(backend.search(query, max_results))]
+    try:
+        if backend.hedge_after:
+            done, _ = await asyncio.wait(tasks, timeout=backend.hedge_after)
+            if not done:
+                logger.info(f"Hedging slow {backend.name} search")
+                tasks.append(asyncio.create_task(backend.search(query, max_results)))
+        pending = set(tasks)
+        error: BaseException | None = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class MultiSearch:
+    """
+    Fans one query out to every backend at the same time, each bounded by
+    its own timeout, and fuses whatever came back by reciprocal rank with
+    URL and content deduplication. A slow or failing backend only costs
+    its own results.
+    """
+    def __init__(self, backends: list[SearchBackend], max_results: int = 5,
+                 rrf_k: int = 60) -> None:
+        self.backends = backends
+        self.max_results = max_results
+        self.rrf_k = rrf_k
+
+    @property
+    def names(self) -> list[str]:
+        return [backend.name for backend in self.backends]
+
+    async def _query(self, backend: SearchBackend, query: str) -> SearchResult | None:
+        with span(f"search.backend.{backend.name}", kind="search"):
+            try:
+                result = await asyncio.wait_for(
+                    hedged(backend, query, self.max_results), backend.timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"{backend.name} search timed out after {backend.timeout}s")
+                SEARCH_BACKEND_CALLS.labels(backend.name, "timeout").inc()
+                return None
+            except Exception as err:
+                logger.warning(f"{backend.name} search failed: {err}")
+                SEARCH_BACKEND_CALLS.labels(backend.name, "error").inc()
+                return None
+        SEARCH_BACKEND_CALLS.labels(backend.name, "ok").inc()
+        return result
+
+    async def search(self, query: str) -> EvidenceBundle:
+        results = await asyncio.gather(*(self._query(backend, query)
+                                         for backend in self.backends))
+        answers, rankings, failed = {}, [], []
+        for backend, result in zip(self.backends, results, strict=True):
+            if result is None:
+                failed.append(backend.name)
+                continue
+            if result.answer:
+                answers[backend.name] = result.answer
+            rankings.append(result.hits)
+        hits = reciprocal_rank_fusion(rankings, k=self.rrf_k)[: self.max_results]
+        return EvidenceBundle(query, answers, hits, failed)
+
+
+def build_multi_search() -> MultiSearch:
+    """
+    Create the multi-source search from SEARCH_BACKENDS (e.g. `tavily`),
+    SEARCH_BACKEND_TIMEOUTS and SEARCH_HEDGE_AFTER (`name=seconds` lists)
+    and SEARCH_MAX_RESULTS.
+    """
+    timeouts = env_mapping("SEARCH_BACKEND_TIMEOUTS")
+    # only the slow tail of web searches is hedged by default
+    hedges = env_mapping("SEARCH_HEDGE_AFTER", "tavily=4")
+    backends = []
+    for name in env_list("SEARCH_BACKENDS", "tavily"):
+        if name not in BACKEND_TYPES:
+            logger.error(f"Unknown search backend {name!r} ignored")
+            continue
+        hedge_after = float(hedges.get(name, 0)) or None
+        backends.append(BACKEND_TYPES[name](
+            timeout=float(timeouts.get(name, env_float("SEARCH_BACKEND_TIMEOUT", 15))),
+            hedge_after=hedge_after))
+    return MultiSearch(backends, max_results=env_int("SEARCH_MAX_RESULTS", 5))
+
+
+# until first use, the multi-source search does not exist
+_multi_search: MultiSearch | None = None
+
+
+def get_multi_search() -> MultiSearch:
+    """Return the process-wide multi-source search."""
+    global _multi_search
+    if _multi_search is None:
+        _multi_search = build_multi_search()
+    return _multi_search
+
+
+def set_multi_search(multi_search: MultiSearch | None) -> None:
+    """Replace the multi-source search (None rebuilds it from settings)."""
+    global _multi_search
+    _multi_search = multi_search
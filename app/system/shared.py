@@ -0,0 +1,182 @@
+"""module to share run state between API worker processes on one machine
+
+With SHARED_STATE_DIR set, every uvicorn worker registers itself in a
+SQLite file (WAL mode, so readers never block the writer) and heartbeats
+while it lives. Workers claim the research runs they start, so a worker
+asked about a topic a sibling is already researching waits for that
+report instead of starting the same run again, and /v1/health can show
+every worker's runs. The caches and the job store sit next to this file
+in the same directory (see `env_path` in utils/settings.py).
+"""
+import asyncio
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from .utils.logger import logger
+from .utils.settings import env_float, env_path
+
+
+class SharedState:
+    """Live workers and their in-flight runs, in a SQLite file shared by the workers."""
+    def __init__(self, path: str, worker_id: str | None = None,
+                 heartbeat_ttl: float = 30.0, clock=time.time) -> None:
+        self.path = path
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.heartbeat_ttl = heartbeat_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                     timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS workers ("
+            "worker_id TEXT PRIMARY KEY, pid INTEGER, started_at REAL, heartbeat REAL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "run_id TEXT PRIMARY KEY, topic_key TEXT NOT NULL, topic TEXT, "
+            "worker_id TEXT NOT NULL, started_at REAL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS runs_topic ON runs (topic_key)")
+
+    def _execute(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def register(self) -> None:
+        now = self._clock()
+        self._execute("INSERT OR REPLACE INTO workers (worker_id, pid, started_at, heartbeat) "
+                      "VALUES (?, ?, ?, ?)", (self.worker_id, os.getpid(), now, now))
+        self._reap(now)
+
+    def heartbeat(self) -> None:
+        self._execute("UPDATE workers SET heartbeat = ? WHERE worker_id = ?",
+                      (self._clock(), self.worker_id))
+
+    def unregister(self) -> None:
+        self._execute("DELETE FROM runs WHERE worker_id = ?", (self.worker_id,))
+        self._execute("DELETE FROM workers WHERE worker_id = ?", (self.worker_id,))
+
+    def _reap(self, now: float) -> None:
+        """Forget workers that stopped heartbeating, and their runs."""
+        cutoff = now - self.heartbeat_ttl
+        self._execute("DELETE FROM runs WHERE worker_id IN "
+                      "(SELECT worker_id FROM workers WHERE heartbeat < ?)", (cutoff,))
+        self._execute("DELETE FROM workers WHERE heartbeat < ?", (cutoff,))
+
+    def live_workers(self) -> list[str]:
+        cutoff = self._clock() - self.heartbeat_ttl
+        return [worker_id for (worker_id,) in self._execute(
+            "SELECT worker_id FROM workers WHERE heartbeat >= ? ORDER BY started_at",
+            (cutoff,))]
+
+    def claim_run(self, run_id: str, topic_key: str, topic: str) -> dict | None:
+        """
+        Record run `run_id` of `topic_key` for this worker, unless a live
+        worker already has one in flight; that run is returned instead.
+        """
+        cutoff = self._clock() - self.heartbeat_ttl
+        with self._lock:
+            # one write transaction, so two workers can't both claim a topic
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT runs.run_id, runs.worker_id FROM runs JOIN workers "
+                    "USING (worker_id) WHERE runs.topic_key = ? AND workers.heartbeat >= ? "
+                    "LIMIT 1", (topic_key, cutoff)).fetchone()
+                if row is None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO runs (run_id, topic_key, topic, worker_id, "
+                        "started_at) VALUES (?, ?, ?, ?, ?)",
+                        (run_id, topic_key, topic, self.worker_id, self._clock()))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return None if row is None else {"run_id": row[0], "worker": row[1]}
+
+    def run_finished(self, run_id: str) -> None:
+        self._execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+
+    def active_runs(self) -> list[dict]:
+        """Every in-flight run of a live worker, oldest first."""
+        cutoff = self._clock() - self.heartbeat_ttl
+        rows = self._execute(
+            "SELECT runs.run_id, runs.topic_key, runs.topic, runs.worker_id, runs.started_at "
+            "FROM runs JOIN workers USING (worker_id) WHERE workers.heartbeat >= ? "
+            "ORDER BY runs.started_at", (cutoff,))
+        return [{"run_id": run_id, "topic_key": key, "topic": topic, "worker": worker,
+                 "started_at": started_at}
+                for run_id, key, topic, worker, started_at in rows]
+
+    def is_running(self, run_id: str) -> bool:
+        """Whether run `run_id` is still in flight in a live worker."""
+        return any(run["run_id"] == run_id for run in self.active_runs())
+
+    async def _heartbeat_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.heartbeat)
+            except sqlite3.Error as err:
+                logger.warning(f"Shared state heartbeat failed: {err}")
+
+    def start(self) -> None:
+        """Register this worker and heartbeat in the background."""
+        self.register()
+        if self._task is None:
+            self._task = asyncio.create_task(self._heartbeat_loop(self.heartbeat_ttl / 3))
+        logger.info(f"Worker {self.worker_id} sharing state through {self.path}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.unregister()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def describe(self) -> dict:
+        runs = self.active_runs()
+        return {"worker": self.worker_id, "workers": self.live_workers(),
+                "runs": [{key: run[key] for key in ("run_id", "topic", "worker")}
+                         for run in runs]}
+
+
+# None until SHARED_STATE_DIR is set and the state first used
+_shared_state: SharedState | None = None
+
+
+def get_shared_state() -> SharedState | None:
+    """Return this worker's shared state, or None when workers share nothing."""
+    global _shared_state
+    if _shared_state is None:
+        path = env_path("SHARED_STATE_PATH", "workers.db")
+        if path:
+            _shared_state = SharedState(path, heartbeat_ttl=env_float("SHARED_HEARTBEAT_TTL", 30))
+    return _shared_state
+
+
+def set_shared_state(state: SharedState | None) -> None:
+    """Replace the shared state (None rebuilds it from settings)."""
+    global _shared_state
+    _shared_state = state
+
+
+async def start_shared_state() -> SharedState | None:
+    """Register this worker; called from the app lifespan."""
+    state = get_shared_state()
+    if state is not None:
+        state.start()
+    return state
+
+
+async def stop_shared_state() -> None:
+    """Unregister this worker; called on app shutdown."""
+    if _shared_state is not None:
+        await _shared_state.stop()
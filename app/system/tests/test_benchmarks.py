@@ -0,0 +1,58 @@
+import os
+import random
+
+import pytest
+
+from benchmarks.bench_startup import measure
+from benchmarks.bench_workflow import compare
+from benchmarks.stubs import FakeOllama, Latency, seeded_rng
+
+
+def test_latency_specs_and_seeded_samples_are_reproducible():
+    assert Latency.parse("0.2").sample(random.Random()) == 0.2
+    uniform = Latency.parse("uniform:0.1,0.3")
+    lognormal = Latency.parse("lognormal:0.05,0.5")
+    first = [lognormal.sample(seeded_rng(7, b"request"))]
+    assert first == [lognormal.sample(seeded_rng(7, b"request"))]
+    assert 0.1 <= uniform.sample(seeded_rng(7, b"request")) <= 0.3
+
+
+def test_fake_ollama_drives_each_workflow_step():
+    model = FakeOllama(Latency(), questions=2, review_rejections=1)
+    questions, _ = model.reply({"messages": [
+        {"role": "user", "content": "Generate some questions on the topic <topic>tides</topic>."}]})
+    assert questions.splitlines() == ["What is the history of tides?",
+                                      "Which costs and risks come with tides?"]
+
+    research = {"messages": [{"role": "user", "content": "<question>Why tides?</question>"}],
+                "tools": [{"function": {"name": "search_web"}}]}
+    _, tool_calls = model.reply(research)
+    assert tool_calls[0]["function"]["arguments"] == {"query": "Why tides?"}
+    research["messages"].append({"role": "tool", "content": "Moon."})
+    assert model.reply(research)[1] == []
+
+    review = {"messages": [{"role": "user", "content": "a report about the topic tides.\n"
+                            "Here is the report: ... sufficiently comprehensive"}]}
+    assert model.reply(review)[0] != "ACCEPTABLE"
+    assert model.reply(review)[0] == "ACCEPTABLE"
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {"results": {"agent": {"throughput_rps": 10.0, "latency_p95_s": 1.0}}}
+    current = {"results": {"agent": {"throughput_rps": 9.0, "latency_p95_s": 1.5}}}
+    regressions = compare(current, baseline, tolerance=0.2)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("agent.latency_p95_s")
+
+
+def test_app_starts_without_heavy_imports_or_search_key(monkeypatch):
+    monkeypatch.delenv("TAVILY_API_KEY", raising=False)
+    startup = measure(["app.main"], dict(os.environ))
+    assert startup["heavy"] == []
+
+    from app.system.search.backends import check_search_credentials
+    monkeypatch.setenv("SEARCH_BACKENDS", "tavily,local")
+    with pytest.raises(RuntimeError, match="TAVILY_API_KEY"):
+        check_search_credentials()
+    monkeypatch.setenv("SEARCH_BACKENDS", "local")
+    check_search_credentials()
@@ -0,0 +1,64 @@
+import asyncio
+
+from app.system.agents.budget import ContextBudgeter, count_tokens
+from app.system.agents.workflow import WorkflowClass
+from app.system.tests.test_workflow import MockAgent, run_workflow
+
+
+def section(index, words=60):
+    return (f"Question: question {index}?\nAnswer: " + " ".join(["detail"] * words)
+            + f" (https://source{index}.org/page)\n\n")
+
+
+class FakeSummarizer:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, text, target_tokens):
+        self.calls.append(target_tokens)
+        await asyncio.sleep(0.01)
+        # drops the citations on purpose
+        return "summary of " + " ".join(text.split()[:3])
+
+
+def test_sections_within_budget_are_joined_untouched():
+    summarize = FakeSummarizer()
+    budgeter = ContextBudgeter(4096, reserve=512, summarize=summarize)
+    sections = [section(index) for index in range(3)]
+    assert asyncio.run(budgeter.fit(sections, 1000)) == "".join(sections)
+    assert summarize.calls == [] and budgeter.compressions == 0
+
+
+def test_over_budget_groups_are_summarized_in_parallel_keeping_citations():
+    summarize = FakeSummarizer()
+    budgeter = ContextBudgeter(1024, reserve=256, summarize=summarize, group_tokens=200)
+    sections = [section(index) for index in range(12)]
+    fitted = asyncio.run(budgeter.fit(sections, 400))
+
+    assert count_tokens(fitted) <= 400
+    assert len(summarize.calls) == len(budgeter.groups(sections)) > 1
+    for index in range(12):
+        assert f"https://source{index}.org/page" in fitted
+
+    # a later cycle reuses the summaries of the same answers
+    asyncio.run(budgeter.fit(sections, 400))
+    assert len(summarize.calls) == len(budgeter.groups(sections))
+
+
+def test_report_prompt_is_condensed_to_the_context_window():
+    summarize = FakeSummarizer()
+    report_agent = MockAgent("REPORT")
+    questions = "\n".join(f"What is aspect {index} of the topic?" for index in range(6))
+    run_workflow(
+        WorkflowClass(timeout=10, straggler_deadline=0,
+                      budgeter=ContextBudgeter(700, reserve=200, summarize=summarize,
+                                               group_tokens=150)),
+        question_agent=MockAgent(questions),
+        answer_agent=MockAgent(" ".join(["fact"] * 80) + " https://evidence.org"),
+        report_agent=report_agent,
+        review_agent=MockAgent("ACCEPTABLE"),
+    )
+    prompt = report_agent.prompts[0]
+    assert summarize.calls
+    assert count_tokens(prompt) <= 700 - 200
+    assert "https://evidence.org" in prompt
@@ -0,0 +1,45 @@
+import asyncio
+
+from app.system.utils.concurrency import PriorityLimiter
+
+
+def test_priority_limiter_caps_and_serves_lowest_priority_first():
+    order = []
+    peak = 0
+
+    async def worker(limiter, priority):
+        nonlocal peak
+        async with limiter.slot(priority):
+            peak = max(peak, limiter.active)
+            order.append(priority)
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        limiter = PriorityLimiter(1)
+        # hold the only slot so the rest queue up in reverse order
+        await limiter.acquire(0)
+        tasks = [asyncio.create_task(worker(limiter, p)) for p in (5, 3, 1, 4, 2)]
+        await asyncio.sleep(0)
+        assert limiter.waiting == 5
+        limiter.release()
+        await asyncio.gather(*tasks)
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert order == [1, 2, 3, 4, 5]
+    assert peak == 1
+    assert limiter.active == 0
+
+
+def test_priority_limiter_skips_cancelled_waiters():
+    async def scenario():
+        limiter = PriorityLimiter(1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire(0))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        limiter.release()
+        return limiter.stats()
+
+    assert asyncio.run(scenario()) == {"limit": 1, "active": 0, "waiting": 0}
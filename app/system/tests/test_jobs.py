@@ -0,0 +1,45 @@
+from app.system.jobs import Job, JobStore, JobManager, QUEUED, SUCCEEDED
+
+
+def test_job_store_persists_jobs_across_restarts(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    store = JobStore(path)
+    done = Job("finished topic")
+    done.status = SUCCEEDED
+    done.report = "REPORT"
+    store.add(done)
+    store.add(Job("pending topic"))
+
+    reloaded = JobStore(path)
+    assert reloaded.get(done.job_id).report == "REPORT"
+    assert [job.topic for job in reloaded.unfinished()] == ["pending topic"]
+    assert JobManager(reloaded).stats()["jobs"][QUEUED] == 1
+
+
+def test_job_keeps_token_deltas_out_of_its_event_log():
+    import asyncio
+    from app.system.jobs import RUNNING
+
+    async def scenario():
+        job = Job("topic")
+        job.status = RUNNING
+        received = []
+
+        async def listen():
+            async for index, payload in job.follow():
+                received.append((index, payload["type"]))
+
+        listener = asyncio.create_task(listen())
+        await asyncio.sleep(0)
+        job.add_event({"type": "progress", "message": "working"})
+        for token in ("A ", "long ", "report"):
+            job.add_event({"type": "report_delta", "delta": token, "cycle": 1})
+        job.status = SUCCEEDED
+        job.add_event({"type": "final", "response": "A long report"})
+        await asyncio.wait_for(listener, 1)
+        return job, received
+
+    job, received = asyncio.run(scenario())
+    assert received == [(0, "progress"), (None, "report_delta"), (None, "report_delta"),
+                        (None, "report_delta"), (1, "final")]
+    assert [event["type"] for event in job.to_dict()["events"]] == ["progress", "final"]
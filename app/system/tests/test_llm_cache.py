@@ -0,0 +1,93 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from llama_index.core.base.llms.types import (
+    ChatMessage, ChatResponse, CompletionResponse, TextBlock, ToolCallBlock)
+from llama_index.core.tools import FunctionTool
+
+from app.system.cache.llm_cache import build_llm_cache, set_llm_cache
+from app.system.cache.store import LRUCache, TieredCache
+from app.system.model.cached import CachedLLM
+from app.system.utils.custom_exceptions import LLMCacheMiss
+
+
+class FakeLLM:
+    def __init__(self, temperature=None):
+        self.temperature = temperature
+        self.metadata = SimpleNamespace(model_name="fake:1b")
+        self.calls = 0
+
+    async def acomplete(self, prompt, formatted=False, **kwargs):
+        self.calls += 1
+        return CompletionResponse(text=f"completion {self.calls}")
+
+    async def astream_chat_with_tools(self, tools, user_msg=None, chat_history=None, **kwargs):
+        self.calls += 1
+
+        async def gen():
+            for text in ("Let me ", "Let me search"):
+                yield ChatResponse(message=ChatMessage(role="assistant", blocks=[
+                    TextBlock(text=text),
+                    ToolCallBlock(tool_name="search_web", tool_kwargs={"query": "q"})]),
+                    delta=text[-6:], additional_kwargs={"pool_backend": "b1"})
+        return gen()
+
+
+def search_web(query: str) -> str:
+    """Search the web."""
+    return query
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    set_llm_cache(TieredCache(LRUCache()))
+    yield
+    set_llm_cache(None)
+
+
+def test_auto_mode_only_caches_temperature_zero_calls():
+    async def twice(llm, **kwargs):
+        cached = CachedLLM(llm, mode="auto")
+        return [(await cached.acomplete("same prompt", **kwargs)).text for _ in range(2)]
+
+    sampled = FakeLLM(temperature=None)
+    assert asyncio.run(twice(sampled)) == ["completion 1", "completion 2"]
+
+    greedy = FakeLLM(temperature=0.0)
+    assert asyncio.run(twice(greedy)) == ["completion 1", "completion 1"]
+    # a different sampling parameter is a different call
+    assert asyncio.run(twice(greedy, temperature=0.7))[0] == "completion 2"
+
+
+def test_streamed_tool_calls_are_recorded_and_replayed():
+    tools = [FunctionTool.from_defaults(search_web)]
+
+    async def stream(cached):
+        chunks = [chunk async for chunk in await cached.astream_chat_with_tools(
+            tools, user_msg="Who wrote Hamlet?")]
+        return chunks[-1]
+
+    llm = FakeLLM()
+    first = asyncio.run(stream(CachedLLM(llm, mode="on")))
+    replayed = asyncio.run(stream(CachedLLM(llm, mode="replay")))
+    assert llm.calls == 1
+    assert replayed.message.content == first.message.content == "Let me search"
+    assert replayed.delta == "Let me search"
+    assert replayed.additional_kwargs["pool_backend"] == "b1"
+    assert [block.tool_kwargs for block in replayed.message.blocks
+            if isinstance(block, ToolCallBlock)] == [{"query": "q"}]
+
+    with pytest.raises(LLMCacheMiss):
+        asyncio.run(CachedLLM(llm, mode="replay").acomplete("never recorded"))
+
+
+def test_recorded_calls_survive_a_restart(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm.db"))
+    set_llm_cache(build_llm_cache())
+    asyncio.run(CachedLLM(FakeLLM(), mode="record").acomplete("prompt"))
+
+    set_llm_cache(build_llm_cache())
+    response = asyncio.run(CachedLLM(FakeLLM(), mode="replay").acomplete("prompt"))
+    assert response.text == "completion 1"
+    assert response.additional_kwargs["llm_cache"] == "hit"
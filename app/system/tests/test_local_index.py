@@ -0,0 +1,113 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from app.system import tools
+from app.system.cache import search_cache
+from app.system.cache.store import LRUCache, TieredCache
+from app.system.search import client as search_client
+from app.system.search.backends import SearchHit
+from app.system.search.local_index import (
+    DenseIndex, HashingEmbedder, LocalIndex, set_local_index)
+
+
+def docs():
+    return [
+        SearchHit("https://a.com/solar", "Solar panels",
+                  "Solar panels convert sunlight into electricity using photovoltaic cells."),
+        SearchHit("https://b.com/wind", "Wind turbines",
+                  "Wind turbines convert the kinetic energy of wind into electricity."),
+        SearchHit("https://c.com/tides", "Tidal power",
+                  "Tidal power uses the rise and fall of sea levels to turn turbines."),
+    ]
+
+
+def test_bm25_ranks_dedupes_and_reports_confidence():
+    index = LocalIndex(max_documents=10)
+    assert index.add(docs()) == 3
+    # same URL in another form, and mirrored content under another URL
+    assert index.add([SearchHit("http://www.a.com/solar/", "dup", "other text"),
+                      SearchHit("https://mirror.org/wind", "Wind", docs()[1].content)]) == 0
+
+    hits, confidence = index.search("wind turbines electricity")
+    assert hits[0].url == "https://b.com/wind"
+    assert hits[0].sources == ["local"]
+    assert confidence == 1.0
+
+    # a question about something never indexed is not confidently answered
+    _, confidence = index.search("wind farm subsidies in Denmark")
+    assert confidence < 0.5
+    assert index.search("the of and") == ([], 0.0)
+
+
+def test_oldest_documents_are_evicted_over_the_cap():
+    index = LocalIndex(max_documents=2)
+    index.add(docs())
+    assert len(index) == 2
+    assert index.search("solar photovoltaic")[0] == []
+
+
+def test_dense_index_is_memory_mapped_and_survives_restarts(tmp_path):
+    embed = HashingEmbedder(64)
+    path = str(tmp_path / "index.sqlite3")
+    vectors = str(tmp_path / "vectors.f32")
+    index = LocalIndex(path, dense=DenseIndex(embed, 64, vectors))
+    index.add(docs())
+    index.close()
+
+    reopened = LocalIndex(path, dense=DenseIndex(embed, 64, vectors))
+    assert len(reopened) == 3
+    assert len(reopened.dense) == 3
+    assert reopened.dense._matrix.filename == vectors
+    hits, _ = reopened.search("tidal sea levels")
+    assert hits[0].url == "https://c.com/tides"
+
+
+def test_search_local_answers_from_past_web_results(monkeypatch):
+    class FakeClient:
+        async def search(self, query, **params):
+            return {"answer": "", "results": [
+                {"url": "https://hamlet.org", "title": "Hamlet",
+                 "content": "Hamlet is a tragedy written by William Shakespeare."}]}
+
+    monkeypatch.setattr(search_client, "_manager", FakeClient())
+    search_cache.set_search_cache(TieredCache(LRUCache()))
+    set_local_index(LocalIndex())
+    try:
+        assert asyncio.run(tools.search_local("who wrote hamlet")) == tools.NO_LOCAL_EVIDENCE
+        asyncio.run(tools.search_web("Who wrote Hamlet?"))
+        evidence = asyncio.run(tools.search_local("Hamlet tragedy"))
+        assert "Shakespeare" in evidence
+        assert "(https://hamlet.org)" in evidence
+    finally:
+        search_cache.set_search_cache(None)
+        set_local_index(None)
+
+
+def test_dense_rows_of_evicted_documents_are_reused(tmp_path):
+    vectors = str(tmp_path / "vectors.f32")
+    index = LocalIndex(str(tmp_path / "index.sqlite3"), max_documents=2,
+                       dense=DenseIndex(HashingEmbedder(64), 64, vectors))
+    for round_ in range(5):
+        index.add([SearchHit(f"https://{round_}.com/{n}", f"Doc {round_} {n}",
+                             f"evidence about topic{round_} item{n}", 1.0, "web")
+                   for n in range(2)])
+    # the cap is two documents, so at most four rows were ever allocated
+    assert len(index) == 2 and len(index.dense) <= 4
+    hits, _ = index.search("topic4 item1")
+    assert hits[0].url == "https://4.com/1"
+
+
+def test_vectors_are_not_written_when_the_transaction_rolls_back(tmp_path):
+    vectors = str(tmp_path / "vectors.f32")
+    index = LocalIndex(str(tmp_path / "index.sqlite3"),
+                       dense=DenseIndex(HashingEmbedder(64), 64, vectors))
+
+    def fail():
+        raise sqlite3.OperationalError("disk I/O error")
+
+    index._evict = fail
+    with pytest.raises(sqlite3.OperationalError):
+        index.add(docs())
+    assert len(index) == 0 and len(index.dense) == 0
@@ -0,0 +1,54 @@
+import pytest
+
+from app.system.utils.metrics import (
+    CallbackMetric,
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+)
+from app.system.utils.tracing import token_usage
+
+
+def test_metrics_render_in_text_exposition_format():
+    registry = MetricsRegistry()
+    calls = Counter("calls_total", "Calls.", ("status",), registry=registry)
+    running = Gauge("running", "Running.", registry=registry)
+    latency = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1), registry=registry)
+    CallbackMetric("hit_ratio", "Ratio.", lambda: {("search",): 0.5}, "gauge",
+                   ("cache",), registry=registry)
+
+    calls.labels("ok").inc()
+    calls.labels("ok").inc(2)
+    running.inc()
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE calls_total counter" in lines
+    assert 'calls_total{status="ok"} 3' in lines
+    assert "running 1" in lines
+    assert 'latency_seconds_bucket{le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{le="1"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_count 4" in lines
+    assert "latency_seconds_sum 3.65" in lines
+    assert 'hit_ratio{cache="search"} 0.5' in lines
+
+    # a wrong label count fails where it is made, not when /metrics is scraped
+    with pytest.raises(ValueError):
+        calls.labels("ok", "extra")
+
+
+def test_token_usage_reads_openai_and_ollama_responses():
+    class Response:
+        def __init__(self, additional_kwargs, raw):
+            self.additional_kwargs = additional_kwargs
+            self.raw = raw
+
+    openai_like = Response({"prompt_tokens": 12, "completion_tokens": 30}, None)
+    ollama = Response({}, {"usage": {"prompt_tokens": 7, "completion_tokens": 9}})
+    assert token_usage(openai_like) == (12, 30)
+    assert token_usage(ollama) == (7, 9)
+    assert token_usage(Response({}, {})) == (0, 0)
+    assert token_usage(None) == (0, 0)
@@ -31,3 +31,23 @@ def test_get_report_and_review_agents_return_agent(monkeypatch):
     review_agent = review_agents.get_review_agent()
     assert isinstance(report_agent, FunctionAgent)
     assert isinstance(review_agent, FunctionAgent)
+
+
+def test_agent_registry_reuses_agents_until_model_changes(monkeypatch):
+    from app.system.agents.registry import AgentRegistry
+
+    built = []
+    llm = object()
+    monkeypatch.setattr(model_loader, "get_model", lambda: llm)
+    monkeypatch.setattr(research_agents, "get_question_agent",
+                        lambda: built.append("question") or object())
+
+    registry = AgentRegistry()
+    first = registry.get("question")
+    assert registry.get("question") is first
+    assert built == ["question"]
+
+    # a reloaded model invalidates the warm agent
+    llm = object()
+    assert registry.get("question") is not first
+    assert built == ["question", "question"]
@@ -0,0 +1,157 @@
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+
+import pytest
+from llama_index.core.base.llms.types import ChatMessage
+from llama_index.core.llms import MockLLM
+
+from app.system.model.llm_switcher import parse_backend_specs
+from app.system.model.pool import Backend, ModelPool, PooledLLM
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class BrokenLLM(MockLLM):
+    async def achat(self, messages, **kwargs):
+        raise ConnectionError("backend down")
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        status = 200 if self.path == "/api/tags" else 404
+        self.send_response(status)
+        self.end_headers()
+        self.wfile.write(b'{"models": []}')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllamaHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_pool_routes_to_least_outstanding_and_ejects_failing_backends():
+    clock = FakeClock()
+    a, b = Backend("a", MockLLM()), Backend("b", MockLLM())
+    pool = ModelPool([a, b], eject_after=2, eject_seconds=10, clock=clock)
+    a.outstanding = 2
+    assert pool.pick() is b
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            with pool.track(b):
+                raise ConnectionError()
+    assert pool.pick() is a
+    assert pool.stats()[1]["healthy"] is False
+
+    clock.now += 11
+    a.outstanding = 0
+    b.ewma_latency = -1
+    assert pool.pick() is b
+
+
+def test_pooled_llm_fails_over_and_records_latency():
+    broken, good = Backend("broken", BrokenLLM()), Backend("good", MockLLM())
+    llm = PooledLLM(ModelPool([broken, good], eject_after=1))
+    messages = [ChatMessage(role="user", content="hi")]
+
+    async def scenario():
+        return [await llm.achat(messages) for _ in range(3)]
+
+    responses = asyncio.run(scenario())
+    assert all(r.additional_kwargs["pool_backend"] == "good" for r in responses)
+    assert broken.failures == 1
+    assert good.requests == 3
+    assert good.stats(0)["avg_latency_s"] >= 0
+
+
+def test_health_check_against_stub_server(stub_server):
+    up = Backend("up", MockLLM(), f"{stub_server}/api/tags")
+    down = Backend("down", MockLLM(), "http://127.0.0.1:9/api/tags")
+    pool = ModelPool([up, down])
+
+    results = asyncio.run(pool.check_health(timeout=1))
+    assert results == {"up": True, "down": False}
+    assert [s["healthy"] for s in pool.stats()] == [True, False]
+
+
+def test_parse_backend_specs():
+    assert parse_backend_specs(
+        "ollama@http://h1:11434, openai@http://h2:8000/v1#qwen3") == [
+        ("ollama", "http://h1:11434", None),
+        ("openai", "http://h2:8000/v1", "qwen3"),
+    ]
+
+
+class SlowLLM(MockLLM):
+    async def achat(self, messages, **kwargs):
+        await asyncio.sleep(0.01)
+        return await super().achat(messages, **kwargs)
+
+
+def test_pool_concurrency_limit_queues_extra_calls():
+    backend = Backend("slow", SlowLLM())
+    llm = PooledLLM(ModelPool([backend], max_concurrency=1))
+    peak = 0
+
+    async def call():
+        return await llm.achat([ChatMessage(role="user", content="hi")])
+
+    async def watch():
+        nonlocal peak
+        for _ in range(10):
+            peak = max(peak, backend.outstanding)
+            await asyncio.sleep(0.003)
+
+    async def scenario():
+        await asyncio.gather(watch(), *(call() for _ in range(3)))
+
+    asyncio.run(scenario())
+    assert peak == 1
+    assert backend.requests == 3
+
+
+def test_role_models_are_loaded_once_per_model(monkeypatch):
+    from app.system.model import llm_switcher, model_loader
+
+    loaded = []
+
+    class FakeProvider:
+        def __init__(self, model_name):
+            loaded.append(model_name)
+            self.model = MockLLM()
+            self.model_name = model_name
+            self.health_url = None
+
+    monkeypatch.setenv("LLM_ROLE_MODELS", "question=small,review=small,report=big")
+    monkeypatch.setenv("LLM_MODEL_CONCURRENCY", "small=4")
+    monkeypatch.delenv("LLM_BACKENDS", raising=False)
+    monkeypatch.setattr(llm_switcher.LLMSwitcher, "_get_provider",
+                        lambda self, provider, base_url=None, model_name=None:
+                        FakeProvider(model_name))
+
+    roles = llm_switcher.LLMSwitcher().load_role_models()
+    assert loaded == ["small", "big"]
+    assert roles["question"] is roles["review"]
+    assert roles["question"].pool.limiter.limit == 4
+    assert roles["report"].pool.limiter.limit == 2
+
+    default = object()
+    monkeypatch.setattr(model_loader, "model", default)
+    monkeypatch.setattr(model_loader, "role_models", roles)
+    assert model_loader.get_role_model("review") is roles["review"]
+    assert model_loader.get_role_model("research") is default
+    assert model_loader.role_model_stats()["question"]["limit"] == 4
@@ -0,0 +1,62 @@
+import asyncio
+
+from app.system import tools
+from app.system.agents.notes import RunNotes, current_notes, use_notes
+from app.system.cache.store import LRUCache, TieredCache
+from app.system.runs import RunRegistry
+
+
+def test_run_notes_truncate_and_drop_the_oldest_over_the_caps():
+    notes = RunNotes(max_notes=3, max_chars=60, max_note_chars=20)
+    notes.append("a", "x" * 50)
+    assert notes.truncated == 1
+    assert notes.notes[0] == ("a", "x" * 20 + " ...")
+    for title in "bcd":
+        notes.append(title, "short note")
+    assert [title for title, _ in notes.notes] == ["b", "c", "d"]
+    assert notes.dropped == 1
+    assert notes.render().startswith("## b\nshort note\n\n## c")
+    assert notes.describe()["bytes"] > 0
+
+
+def test_parallel_record_notes_keep_every_note(monkeypatch):
+    monkeypatch.setenv("LOCAL_INDEX_AUTOFILL", "0")
+
+    async def scenario():
+        with use_notes(RunNotes()) as notes:
+            # each task inherits the run's notes, as workflow steps do
+            await asyncio.gather(*(tools.record_notes(f"fact {index}", f"note {index}")
+                                   for index in range(50)))
+            await tools.write_report("the report")
+        return notes
+
+    notes = asyncio.run(scenario())
+    assert sorted(title for title, _ in notes.notes) == sorted(f"note {i}" for i in range(50))
+    assert notes.report == "the report"
+    assert current_notes() is None
+    assert asyncio.run(tools.review_report("fine")) == tools.NO_RUN
+
+
+def test_registry_reports_memory_of_in_flight_runs():
+    class Handler:
+        async def stream_events(self):
+            current_notes().append("seen", "recorded inside the run")
+            await asyncio.sleep(0.05)
+            yield "event"
+
+        def __await__(self):
+            async def result():
+                return "REPORT"
+            return result().__await__()
+
+    async def scenario():
+        registry = RunRegistry(TieredCache(LRUCache()))
+        run = registry.start("topic", Handler)
+        await asyncio.sleep(0.01)
+        memory = registry.stats()["memory"][run.run_id]
+        await run.wait()
+        return memory
+
+    memory = asyncio.run(scenario())
+    assert memory["notes_count"] == 1
+    assert memory["notes"] > 0
@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+from app.system.agents.reviewing import parse_verdict, precheck
+from app.system.agents.workflow import WorkflowClass
+from app.system.tests.test_workflow import MockAgent, SequenceAgent, run_workflow
+
+
+def test_parse_verdict_tolerates_formatting():
+    for reply in ("ACCEPTABLE", "  acceptable.\n", "**Acceptable!**",
+                  "<think>hmm</think>ACCEPTABLE", "The report is acceptable.",
+                  '```json\n{"verdict": "acceptable", "missing_questions": []}\n```'):
+        assert parse_verdict(reply).acceptable, reply
+
+    verdict = parse_verdict('Sure: {"verdict": "NEEDS_MORE_RESEARCH", '
+                            '"missing_questions": ["What does it cost?"]}')
+    assert not verdict.acceptable
+    assert verdict.follow_up == "What does it cost?"
+
+    for reply in ("ACCEPTABLE. No further questions.", "Acceptable, nothing is missing"):
+        assert parse_verdict(reply).acceptable, reply
+
+    verdict = parse_verdict("Not acceptable yet.\n1. Who regulates it?\n2. What are the risks?")
+    assert not verdict.acceptable
+    assert verdict.missing == ["Who regulates it?", "What are the risks?"]
+
+
+def test_precheck_only_rejects():
+    questions = ["How do solar panels work?", "What does solar power cost?"]
+    report = ("Solar panels work by converting light. Solar power cost has fallen. "
+              + "filler " * 150)
+    # covering every researched question is not enough to skip the model
+    assert precheck(report, questions) is None
+    verdict = precheck(report, questions + ["Who invented the battery?"])
+    assert not verdict.acceptable and verdict.source == "precheck"
+    assert "Who invented the battery?" in verdict.follow_up
+    assert not precheck("Solar panels work. Solar power cost.", questions).acceptable
+
+
+class StreamingLLM:
+    def __init__(self, reply):
+        self.reply = reply
+        self.prompts = []
+
+    async def astream_complete(self, prompt):
+        self.prompts.append(prompt)
+
+        async def gen():
+            for word in self.reply.split(" "):
+                yield SimpleNamespace(delta=word + " ")
+        return gen()
+
+
+def test_fast_review_uses_one_completion_and_feeds_missing_questions_back():
+    review_agent = MockAgent("unused")
+    review_agent.llm = StreamingLLM('{"verdict": "NEEDS_MORE_RESEARCH", '
+                                    '"missing_questions": ["What does it cost?"]}')
+    question_agent = SequenceAgent(["What is it?", "What does it cost?"])
+    run_workflow(
+        WorkflowClass(timeout=10, straggler_deadline=0),
+        question_agent=question_agent,
+        answer_agent=MockAgent("An answer"),
+        report_agent=MockAgent("REPORT"),
+        review_agent=review_agent,
+    )
+    assert review_agent.prompts == []
+    assert len(review_agent.llm.prompts) == 3
+    assert "<feedback>What does it cost?</feedback>" in question_agent.prompts[1]
+
+
+def test_precheck_sends_incomplete_reports_back_without_the_model(monkeypatch):
+    monkeypatch.setenv("REVIEW_PRECHECK", "1")
+    review_agent = MockAgent("ACCEPTABLE")
+    report_agent = SequenceAgent(["Too short.",
+                                  "Solar power is energy from sunlight. " + "detail " * 200])
+    run_workflow(
+        WorkflowClass(timeout=10, straggler_deadline=0),
+        question_agent=MockAgent("What is solar power?"),
+        answer_agent=MockAgent("An answer"),
+        report_agent=report_agent,
+        review_agent=review_agent,
+    )
+    # the short draft is rewritten, and only the complete one reaches the model
+    assert len(report_agent.prompts) == 2
+    assert len(review_agent.prompts) == 1
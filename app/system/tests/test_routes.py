@@ -1,10 +1,13 @@
+import asyncio
 import json
 from fastapi.testclient import TestClient
 
 import app.main as main_module
 from app.main import app
-from app.system import model_loader
+from app.system.model import model_loader
 from app.system.agents import research_agents, write_agents, review_agents
+from app.system import runs
+from app.system.agents import registry
 
 
 class MockAgent:
@@ -15,12 +18,47 @@ class MockAgent:
         return self._result
 
 
+class SlowMockAgent(MockAgent):
+    def __init__(self, result, delay=0.01):
+        super().__init__(result)
+        self._delay = delay
+
+    async def run(self, *args, **kwargs):
+        await asyncio.sleep(self._delay)
+        return self._result
+
+
+class StreamingMockAgent(MockAgent):
+    """Mimics an agent handler that streams its answer token by token."""
+    def run(self, *args, **kwargs):
+        from llama_index.core.agent.workflow import AgentStream
+        chunks = self._result.split(" ")
+        result = self._result
+
+        class Handler:
+            async def stream_events(self):
+                for index, chunk in enumerate(chunks):
+                    delta = chunk if index == 0 else " " + chunk
+                    yield AgentStream(delta=delta, response="", current_agent_name="mock",
+                                      tool_calls=[], raw=None)
+
+            def __await__(self):
+                async def final():
+                    return result
+                return final().__await__()
+
+        return Handler()
+
+
 client = TestClient(app)
 
 
 def setup_fake_environment(monkeypatch, report="FINAL REPORT", review_response="ACCEPTABLE"):
     # Prevent the real load_model from running during startup
     monkeypatch.setattr(main_module, "load_model", lambda: None)
+    monkeypatch.setenv("LLM_WARMUP", "0")
+    # the lifespan checks the search key
+    monkeypatch.setenv("TAVILY_API_KEY", "test")
     # Set a fake model value
     monkeypatch.setattr(model_loader, "get_model", lambda: object())
     # Monkeypatch agents to simple mocks
@@ -28,6 +66,10 @@ def setup_fake_environment(monkeypatch, report="FINAL REPORT", review_response="
     monkeypatch.setattr(research_agents, "get_research_agent", lambda: MockAgent("Answer"))
     monkeypatch.setattr(write_agents, "get_report_agent", lambda: MockAgent(report))
     monkeypatch.setattr(review_agents, "get_review_agent", lambda: MockAgent(review_response))
+    # start every test with an empty report cache and no in-flight runs
+    monkeypatch.setattr(runs, "_registry", None)
+    monkeypatch.setattr(registry, "_registry", None)
+    monkeypatch.setattr(main_module, "warm_agents", lambda: None)
 
 
 def test_agent_endpoint_returns_report(monkeypatch):
@@ -81,3 +123,190 @@ def test_agent_stream_endpoint_sends_progress_and_final(monkeypatch):
         final_payloads = [p for p in lines if p.get("type") == "final"]
         assert final_payloads
         assert final_payloads[-1]["response"] == "FINAL REPORT"
+
+
+def test_health_endpoint_reports_search_cache_counters(monkeypatch):
+    monkeypatch.setattr(model_loader, "get_model", lambda: None)
+    resp = client.get("/v1/health")
+    stats = resp.json().get("search_cache")
+    assert stats is not None
+    assert {"hits", "misses", "hit_rate"} <= set(stats)
+
+
+def test_agent_stream_reports_queued_questions(monkeypatch):
+    setup_fake_environment(monkeypatch)
+    monkeypatch.setenv("ANSWER_RUN_CONCURRENCY", "1")
+    monkeypatch.setattr(research_agents, "get_question_agent",
+                        lambda: MockAgent("Q1\nQ2\nQ3"))
+    monkeypatch.setattr(research_agents, "get_research_agent",
+                        lambda: SlowMockAgent("Answer"))
+
+    with client.stream("POST", "/v1/agent/stream", json={"text": "test topic"}) as resp:
+        payloads = [json.loads(line[len("data: "):]) for line in resp.iter_lines()
+                    if line.startswith("data: ")]
+
+    queued = [p for p in payloads if p["type"] == "queued"]
+    assert queued
+    assert all(p["position"] >= 1 for p in queued)
+    assert payloads[-1] == {"type": "final", "response": "FINAL REPORT"}
+
+
+def test_agent_endpoint_serves_repeated_topic_from_cache(monkeypatch):
+    setup_fake_environment(monkeypatch)
+    started = []
+    monkeypatch.setattr(research_agents, "get_question_agent",
+                        lambda: started.append(1) or MockAgent("Q1"))
+
+    first = client.post("/v1/agent", json={"text": "Cached Topic"})
+    second = client.post("/v1/agent", json={"text": "cached topic?"})
+    assert first.json() == second.json() == {"response": "FINAL REPORT"}
+    assert len(started) == 1
+
+    client.post("/v1/agent", json={"text": "cached topic", "bypass_cache": True})
+    assert len(started) == 2
+
+
+def test_job_endpoints_run_in_background_and_replay_events(monkeypatch):
+    setup_fake_environment(monkeypatch)
+    monkeypatch.setattr(main_module, "start_search_client", _noop)
+
+    with TestClient(app) as lifespan_client:
+        resp = lifespan_client.post("/v1/jobs", json={"text": "job topic"})
+        assert resp.status_code == 202
+        job_id = resp.json()["job_id"]
+
+        with lifespan_client.stream("GET", f"/v1/jobs/{job_id}/events") as stream:
+            lines = list(stream.iter_lines())
+        ids = [int(line[len("id: "):]) for line in lines if line.startswith("id: ")]
+        payloads = [json.loads(line[len("data: "):]) for line in lines
+                    if line.startswith("data: ")]
+        assert ids == list(range(len(payloads)))
+        assert payloads[-1] == {"type": "final", "response": "FINAL REPORT"}
+
+        status = lifespan_client.get(f"/v1/jobs/{job_id}").json()
+        assert status["status"] == "succeeded"
+        assert status["report"] == "FINAL REPORT"
+        assert "Starting research" in status["progress"]
+
+        # resuming after the second-to-last event only replays the final one
+        resume_from = str(ids[-2])
+        with lifespan_client.stream("GET", f"/v1/jobs/{job_id}/events",
+                                    headers={"Last-Event-ID": resume_from}) as stream:
+            resumed = [line for line in stream.iter_lines() if line.startswith("data: ")]
+        assert len(resumed) == 1
+
+    assert client.get("/v1/jobs/unknown").status_code == 404
+
+
+async def _noop():
+    return None
+
+
+def test_agent_stream_sends_report_and_review_deltas_per_cycle(monkeypatch):
+    setup_fake_environment(monkeypatch)
+    monkeypatch.setattr(write_agents, "get_report_agent",
+                        lambda: StreamingMockAgent("FINAL REPORT TEXT"))
+    monkeypatch.setattr(review_agents, "get_review_agent",
+                        lambda: StreamingMockAgent("Ask about costs"))
+
+    with client.stream("POST", "/v1/agent/stream", json={"text": "delta topic"}) as resp:
+        payloads = [json.loads(line[len("data: "):]) for line in resp.iter_lines()
+                    if line.startswith("data: ")]
+
+    report_deltas = [p for p in payloads if p["type"] == "report_delta"]
+    review_deltas = [p for p in payloads if p["type"] == "review_delta"]
+    # three review cycles, each with its own streamed draft and review
+    assert sorted({p["cycle"] for p in report_deltas}) == [1, 2, 3]
+    assert sorted({p["cycle"] for p in review_deltas}) == [1, 2, 3]
+    first_draft = "".join(p["delta"] for p in report_deltas if p["cycle"] == 1)
+    assert first_draft == "FINAL REPORT TEXT"
+    assert payloads[-1] == {"type": "final", "response": "FINAL REPORT TEXT"}
+
+
+def test_run_trace_and_step_metrics(monkeypatch):
+    from app.system.utils import tracing
+    setup_fake_environment(monkeypatch)
+    monkeypatch.setattr(main_module, "start_search_client", _noop)
+    monkeypatch.setattr(tracing, "_tracer", tracing.Tracer())
+
+    with TestClient(app) as lifespan_client:
+        job_id = lifespan_client.post("/v1/jobs", json={"text": "traced topic"}).json()["job_id"]
+        with lifespan_client.stream("GET", f"/v1/jobs/{job_id}/events") as stream:
+            list(stream.iter_lines())
+        run_id = lifespan_client.get(f"/v1/jobs/{job_id}").json()["run_id"]
+
+        trace = lifespan_client.get(f"/v1/runs/{run_id}/trace").json()
+        names = [s["name"] for s in trace["spans"]]
+        assert names[0] == "run"
+        for name in ("step.generate_questions", "step.answer_question",
+                     "agent.research", "step.write_report", "agent.review"):
+            assert name in names
+        assert names.count("agent.research") == 2
+
+        spans = lifespan_client.get("/v1/metrics?format=json").json()["spans"]
+        assert spans["step.answer_question"]["count"] == 2
+        assert {"p50_s", "p95_s", "p99_s"} <= set(spans["step.review"])
+
+    assert client.get("/v1/runs/unknown/trace").status_code == 404
+
+
+def test_metrics_endpoint_exposes_run_counters(monkeypatch):
+    setup_fake_environment(monkeypatch)
+    client.post("/v1/agent", json={"text": "metrics topic"})
+
+    resp = client.get("/v1/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    text = resp.text
+    for name in ("research_workflows_in_flight", "research_questions_per_run_bucket",
+                 "research_review_cycles_per_run_count", "answer_fanout_active",
+                 "search_request_duration_seconds_bucket", "cache_hit_ratio"):
+        assert name in text
+    assert 'research_runs_total{status="succeeded"}' in text
+    assert 'cache_misses_total{cache="report"}' in text
+
+
+def test_batch_endpoint_streams_every_topic_with_its_index(monkeypatch):
+    setup_fake_environment(monkeypatch)
+
+    with TestClient(app) as batch_client:
+        resp = batch_client.post("/v1/agent/batch", json={"requests": [
+            {"text": "batch topic one", "bypass_cache": True},
+            {"text": "batch topic two", "bypass_cache": True}]})
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in resp.text.splitlines()]
+        finals = sorted((line["index"], line["topic"]) for line in lines
+                        if line["type"] == "final")
+        assert finals == [(0, "batch topic one"), (1, "batch topic two")]
+        assert lines[-1]["type"] == "done" and lines[-1]["succeeded"] == 2
+
+        assert batch_client.post("/v1/agent/batch", json={"requests": []}).status_code == 422
+
+
+def test_lifespan_loads_the_default_ollama_model_and_agents(monkeypatch):
+    from tenacity import stop_after_attempt
+    from llama_index.llms.ollama import Ollama
+    from app.system.model.warmup import ModelWarmup, set_model_warmup
+
+    # the real switcher and agents, with no LLM_BACKENDS; nothing contacts Ollama
+    for name in ("LLM_BACKENDS", "LLM_ROLE_MODELS", "LLM_CACHE"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("LLM_WARMUP", "0")
+    monkeypatch.setenv("TAVILY_API_KEY", "test")
+    monkeypatch.setattr(main_module, "load_model",
+                        model_loader.load_model.retry_with(stop=stop_after_attempt(1)))
+    monkeypatch.setattr(main_module, "start_search_client", _noop)
+    monkeypatch.setattr(model_loader, "model", None)
+    monkeypatch.setattr(model_loader, "role_models", {})
+    monkeypatch.setattr(registry, "_registry", None)
+    set_model_warmup(ModelWarmup())
+
+    try:
+        with TestClient(app) as lifespan_client:
+            assert isinstance(model_loader.get_model(), Ollama)
+            assert model_loader.loaded_ollama_models() == {("qwen3:4b", "http://localhost:11434")}
+            assert registry.get_agent_registry().get("question") is not None
+            assert lifespan_client.get("/v1/health").json()["model_loaded"] is True
+    finally:
+        set_model_warmup(None)
@@ -0,0 +1,116 @@
+import asyncio
+
+from app.system.cache.store import LRUCache, TieredCache, MISSING
+from app.system.runs import RunRegistry
+
+
+class FakeHandler:
+    """Stands in for a workflow handler: streams events, then resolves."""
+    def __init__(self, events, result, delay=0.01):
+        self._events = events
+        self._result = result
+        self._delay = delay
+
+    async def stream_events(self):
+        for event in self._events:
+            await asyncio.sleep(self._delay)
+            yield event
+
+    def __await__(self):
+        async def result():
+            return self._result
+        return result().__await__()
+
+
+def test_identical_in_flight_topics_share_one_run():
+    started = []
+
+    def start_handler():
+        started.append(1)
+        return FakeHandler(["e1", "e2", "e3"], "REPORT")
+
+    async def collect(run):
+        return [event async for event in run.subscribe()], await run.wait()
+
+    async def scenario():
+        registry = RunRegistry(TieredCache(LRUCache()))
+        first = registry.start("Same topic", start_handler)
+        first_stream = asyncio.create_task(collect(first))
+        await asyncio.sleep(0.015)
+        # a late caller attaches to the same run and still sees every event
+        second = registry.start("same  TOPIC", start_handler)
+        assert second is first
+        results = await asyncio.gather(first_stream, collect(second))
+        return registry, results
+
+    registry, results = asyncio.run(scenario())
+    assert len(started) == 1
+    assert results[0] == results[1] == (["e1", "e2", "e3"], "REPORT")
+    assert registry.stats()["deduplicated"] == 1
+    assert registry.in_flight == {}
+    assert registry.cached_report("same topic") == "REPORT"
+
+
+def test_failed_runs_are_not_cached():
+    class FailingHandler(FakeHandler):
+        def __await__(self):
+            async def fail():
+                raise RuntimeError("boom")
+            return fail().__await__()
+
+    async def scenario():
+        registry = RunRegistry(TieredCache(LRUCache()))
+        run = registry.start("topic", lambda: FailingHandler([], None))
+        try:
+            await run.wait()
+        except RuntimeError:
+            pass
+        return registry
+
+    registry = asyncio.run(scenario())
+    assert registry.cached_report("topic") is MISSING
+
+
+def test_abandoned_batch_keeps_its_slot_until_the_run_ends(monkeypatch):
+    from app.system import batch, runs
+    from app.system.utils.concurrency import PriorityLimiter
+    from app.system.utils.schema import UserRequest
+
+    release = None
+
+    class GatedHandler:
+        def __await__(self):
+            async def result():
+                await release.wait()
+                return "REPORT"
+            return result().__await__()
+
+    monkeypatch.setattr(batch, "start_workflow", lambda topic, answer_memo=None: GatedHandler())
+    limiter = PriorityLimiter(1)
+    batch.set_batch_limiter(limiter)
+    runs.set_run_registry(RunRegistry(TieredCache(LRUCache())))
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        stream = batch.run_batch([UserRequest(text="first topic", bypass_cache=True),
+                                  UserRequest(text="second topic", bypass_cache=True)])
+        pending = asyncio.create_task(stream.__anext__())
+        await asyncio.sleep(0.01)
+        # the caller walks away: the queued topic is dropped, the started run is not
+        pending.cancel()
+        await asyncio.gather(pending, return_exceptions=True)
+        await stream.aclose()
+        await asyncio.sleep(0.01)
+        held = limiter.stats()
+        release.set()
+        await asyncio.sleep(0.01)
+        return held, limiter.stats()
+
+    try:
+        held, after = asyncio.run(scenario())
+    finally:
+        batch.set_batch_limiter(None)
+        runs.set_run_registry(None)
+    assert held["active"] == 1 and held["waiting"] == 0
+    assert after["active"] == 0
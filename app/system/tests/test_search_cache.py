@@ -0,0 +1,95 @@
+import asyncio
+
+from app.system import tools
+from app.system.cache import search_cache
+from app.system.search import client as search_client
+from app.system.cache.store import LRUCache, SQLiteCache, TieredCache, MISSING
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_query_folds_case_punctuation_and_whitespace():
+    a = search_cache.search_cache_key("  What is  Quantum Computing? ")
+    b = search_cache.search_cache_key("what is quantum computing")
+    assert a == b
+    assert search_cache.search_cache_key("q", max_results=1) != \
+        search_cache.search_cache_key("q", max_results=5)
+
+
+def test_lru_cache_evicts_least_recently_used_and_expires():
+    clock = FakeClock()
+    cache = LRUCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is MISSING
+    assert cache.stats.evictions == 1
+
+    clock.now += 11
+    assert cache.get("a") is MISSING
+    assert cache.stats.expirations == 1
+
+
+def test_tiered_cache_promotes_disk_hits(tmp_path):
+    path = str(tmp_path / "cache.db")
+    disk = SQLiteCache(path, maxsize=10, ttl=60)
+    TieredCache(LRUCache(), disk).set("k", "persisted")
+    disk.close()
+
+    # a fresh process sees the value through the disk layer
+    restarted = TieredCache(LRUCache(), SQLiteCache(path, maxsize=10, ttl=60))
+    assert restarted.get("k") == "persisted"
+    assert restarted.memory.get("k") == "persisted"
+    assert restarted.describe()["hits"] == 1
+
+
+def test_tiered_cache_async_reads_disk_only_on_memory_miss(tmp_path, monkeypatch):
+    disk = SQLiteCache(str(tmp_path / "cache.db"), maxsize=10, ttl=60)
+    cache = TieredCache(LRUCache(), disk)
+    threaded = []
+    real_to_thread = asyncio.to_thread
+
+    async def to_thread(func, *args):
+        threaded.append(func.__name__)
+        return await real_to_thread(func, *args)
+
+    monkeypatch.setattr(asyncio, "to_thread", to_thread)
+
+    async def scenario():
+        await cache.aset("k", "v")
+        assert await cache.aget("k") == "v"
+        cache.memory.clear()
+        assert await cache.aget("k") == "v"
+        assert await cache.aget("absent") is MISSING
+
+    asyncio.run(scenario())
+    assert threaded == ["set", "get", "get"]
+    assert cache.describe()["hits"] == 2
+    disk.close()
+
+
+def test_search_web_serves_repeats_from_cache(monkeypatch):
+    calls = []
+
+    class FakeClient:
+        async def search(self, query, **params):
+            calls.append(query)
+            return {"answer": f"answer for {query}"}
+
+    monkeypatch.setattr(search_client, "_manager", FakeClient())
+    search_cache.set_search_cache(TieredCache(LRUCache()))
+    try:
+        first = asyncio.run(tools.search_web("Who wrote Hamlet?"))
+        second = asyncio.run(tools.search_web("who wrote hamlet"))
+        assert first == second
+        assert len(calls) == 1
+        assert search_cache.search_cache_stats()["hits"] == 1
+    finally:
+        search_cache.set_search_cache(None)
@@ -0,0 +1,51 @@
+import asyncio
+
+import httpx
+
+from app.system.search.client import SearchClientManager
+
+
+def test_search_client_reuses_pool_and_caps_in_flight():
+    seen = []
+
+    async def handler(request):
+        seen.append(request.headers["authorization"])
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"answer": "ok"})
+
+    async def scenario():
+        manager = SearchClientManager(api_key="key", max_in_flight=2,
+                                      transport=httpx.MockTransport(handler))
+        await manager.start()
+        client = manager._client
+        results = await asyncio.gather(*(manager.search(f"q{i}") for i in range(6)))
+        # the same pooled client served every call
+        assert manager._client is client
+        metrics = manager.metrics()
+        await manager.close()
+        return results, metrics
+
+    results, metrics = asyncio.run(scenario())
+    assert all(r == {"answer": "ok"} for r in results)
+    assert seen == ["Bearer key"] * 6
+    assert metrics["requests"] == 6
+    assert metrics["peak_in_flight"] == 2
+    assert metrics["in_flight"] == 0
+
+
+def test_search_client_wraps_http_errors():
+    from app.system.utils.custom_exceptions import SearchError
+
+    async def scenario():
+        manager = SearchClientManager(
+            api_key="key",
+            transport=httpx.MockTransport(lambda request: httpx.Response(500)))
+        try:
+            await manager.search("q")
+        except SearchError:
+            return manager.metrics()
+        finally:
+            await manager.close()
+
+    metrics = asyncio.run(scenario())
+    assert metrics["errors"] == 1
@@ -0,0 +1,65 @@
+import asyncio
+
+from app.system.search.backends import SearchBackend, SearchHit, SearchResult
+from app.system.search.fusion import normalize_url, reciprocal_rank_fusion
+from app.system.search.multi import MultiSearch
+
+
+class StubBackend(SearchBackend):
+    def __init__(self, name, hits, answer=None, delays=(0.0,), error=None, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self._hits = hits
+        self._answer = answer
+        self._delays = list(delays)
+        self._error = error
+        self.calls = 0
+
+    async def search(self, query, max_results):
+        delay = self._delays[min(self.calls, len(self._delays) - 1)]
+        self.calls += 1
+        await asyncio.sleep(delay)
+        if self._error:
+            raise self._error
+        return SearchResult([SearchHit(url, title, content, source=self.name)
+                             for url, title, content in self._hits], self._answer)
+
+
+def test_normalize_url_ignores_cosmetic_differences():
+    assert normalize_url("https://www.Example.com/a/?utm_source=x&b=1#top") == \
+        normalize_url("http://example.com/a?b=1")
+
+
+def test_rrf_merges_duplicates_by_url_and_content():
+    web = [SearchHit("https://a.com/x", "A", "alpha text", source="web"),
+           SearchHit("https://b.com/y", "B", "shared body of text", source="web")]
+    local = [SearchHit("https://mirror.org/y", "B mirror", "Shared body of text!", source="local"),
+             SearchHit("https://www.a.com/x/", "A", "alpha text, longer version", source="local")]
+    fused = reciprocal_rank_fusion([web, local])
+    assert len(fused) == 2
+    # both documents were found by both backends; ties keep the first seen order
+    assert [hit.url for hit in fused] == ["https://a.com/x", "https://b.com/y"]
+    assert fused[0].sources == ["web", "local"]
+    assert fused[0].content == "alpha text, longer version"
+
+
+def test_multi_search_fuses_backends_and_tolerates_slow_or_failing_ones():
+    fast = StubBackend("fast", [("https://a.com", "A", "a")], answer="42", timeout=1)
+    slow = StubBackend("slow", [("https://b.com", "B", "b")], delays=(5,), timeout=0.05)
+    broken = StubBackend("broken", [], error=RuntimeError("down"), timeout=1)
+    search = MultiSearch([fast, slow, broken])
+
+    bundle = asyncio.run(search.search("q"))
+    assert bundle.answers == {"fast": "42"}
+    assert [hit.url for hit in bundle.hits] == ["https://a.com"]
+    assert bundle.failed == ["slow", "broken"]
+    rendered = bundle.render()
+    assert rendered.startswith("Answer (fast): 42\n[1] A (https://a.com)")
+
+
+def test_hedged_request_wins_when_the_first_is_slow():
+    backend = StubBackend("web", [("https://a.com", "A", "a")], delays=(1.0, 0.0),
+                          timeout=0.5, hedge_after=0.05)
+    bundle = asyncio.run(MultiSearch([backend]).search("q"))
+    assert backend.calls == 2
+    assert [hit.url for hit in bundle.hits] == ["https://a.com"]
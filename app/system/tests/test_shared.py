@@ -0,0 +1,107 @@
+import asyncio
+
+from app.system.cache.store import MISSING, LRUCache, SQLiteCache, TieredCache
+from app.system.jobs import RUNNING, Job, JobStore
+from app.system.runs import RunRegistry
+from app.system.shared import SharedState
+
+
+def _workers(tmp_path, clock=None):
+    path = str(tmp_path / "workers.db")
+    kwargs = {"clock": clock} if clock else {}
+    first = SharedState(path, worker_id="w1", **kwargs)
+    second = SharedState(path, worker_id="w2", **kwargs)
+    first.register()
+    second.register()
+    return first, second
+
+
+def test_a_topic_is_claimed_by_one_live_worker(tmp_path):
+    now = [1000.0]
+    first, second = _workers(tmp_path, clock=lambda: now[0])
+
+    assert first.claim_run("r1", "topic", "Topic") is None
+    assert second.claim_run("r2", "topic", "Topic") == {"run_id": "r1", "worker": "w1"}
+    assert [run["worker"] for run in second.active_runs()] == ["w1"]
+
+    # w1 stops heartbeating: its run no longer blocks the topic
+    now[0] += 60
+    second.heartbeat()
+    assert second.live_workers() == ["w2"]
+    assert second.claim_run("r2", "topic", "Topic") is None
+
+
+def test_registry_follows_a_run_of_another_worker(tmp_path):
+    first, second = _workers(tmp_path)
+    cache_path = str(tmp_path / "reports.db")
+
+    def registry(shared):
+        cache = TieredCache(LRUCache(), SQLiteCache(cache_path, table="report_cache"))
+        return RunRegistry(cache, shared, poll=0.01)
+
+    started = []
+
+    async def research(name):
+        started.append(name)
+        await asyncio.sleep(0.1)
+        return f"report by {name}"
+
+    async def scenario():
+        one, two = registry(first), registry(second)
+        leader = one.start("Shared topic", lambda: research("w1"))
+        # the claim is made off the event loop; let the leader's land first
+        await asyncio.sleep(0.05)
+        follower = two.start("shared topic!", lambda: research("w2"))
+        return await leader.wait(), await follower.wait(), two.followed
+
+    leader, follower, followed = asyncio.run(scenario())
+    assert started == ["w1"]
+    assert leader == follower == "report by w1"
+    assert followed == 1
+    assert first.active_runs() == []
+
+
+def test_job_store_shares_jobs_and_recovers_orphans(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    first, second = JobStore(path, owner="w1"), JobStore(path, owner="w2")
+    job = Job("topic")
+    first.add(job)
+    job.status = RUNNING
+    job.add_event({"type": "progress", "message": "working"})
+    first.save(job)
+
+    snapshot = second.get(job.job_id)
+    assert not second.is_local(job.job_id)
+    assert snapshot.owner == "w1" and snapshot.events == job.events
+    assert second.counts()[RUNNING] == 1
+
+    # w1 is still alive: nothing to recover
+    assert second.unfinished(["w1", "w2"]) == []
+    # w1 died: exactly one survivor takes the job over
+    third = JobStore(path, owner="w3")
+    claimed = second.unfinished(["w2", "w3"])
+    assert [claimed_job.job_id for claimed_job in claimed] == [job.job_id]
+    assert third.unfinished(["w2", "w3"]) == []
+    assert second.is_local(job.job_id)
+
+
+def test_shared_sqlite_cache_reads_do_not_write(tmp_path):
+    now = [1000.0]
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteCache(path, maxsize=3, ttl=None, clock=lambda: now[0])
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+        now[0] += 1
+
+    writes = cache._conn.total_changes
+    for _ in range(5):
+        assert cache.get("a") == "a"
+    assert cache._conn.total_changes == writes
+
+    # an access older than touch_interval is refreshed, so "b" is evicted
+    now[0] += 100
+    cache.get("a")
+    other = SQLiteCache(path, maxsize=3, ttl=None, clock=lambda: now[0])
+    other.set("d", "d")
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == "a" and len(cache) == 3
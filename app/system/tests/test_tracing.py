@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+from app.system.utils import tracing
+from app.system.utils.tracing import Tracer, percentile, span, trace_run, traced
+
+
+def test_spans_nest_and_follow_tasks_spawned_in_a_run(monkeypatch):
+    tracer = Tracer()
+    monkeypatch.setattr(tracing, "_tracer", tracer)
+
+    @traced("tool.lookup", kind="tool")
+    async def lookup():
+        await asyncio.sleep(0)
+
+    async def scenario():
+        with trace_run("run-1"):
+            with span("step.answer", kind="step"):
+                # tasks created inside the run inherit its trace context
+                await asyncio.gather(asyncio.create_task(lookup()), lookup())
+        with span("untraced"):
+            pass
+
+    asyncio.run(scenario())
+    spans = tracer.trace("run-1")
+    assert [s["name"] for s in spans] == ["step.answer", "tool.lookup", "tool.lookup"]
+    step_id = spans[0]["span_id"]
+    assert spans[0]["parent_id"] is None
+    assert all(s["parent_id"] == step_id for s in spans[1:])
+    assert tracer.summary()["tool.lookup"]["count"] == 2
+
+
+def test_failed_spans_are_marked_and_written_to_jsonl(monkeypatch, tmp_path):
+    path = tmp_path / "trace.jsonl"
+    tracer = Tracer(path=str(path))
+    monkeypatch.setattr(tracing, "_tracer", tracer)
+
+    try:
+        with trace_run("run-2"), span("search.request", kind="search"):
+            raise RuntimeError("timeout")
+    except RuntimeError:
+        pass
+    tracer.close()
+
+    (line,) = path.read_text().splitlines()
+    record = json.loads(line)
+    assert record["trace_id"] == "run-2"
+    assert record["status"] == "error"
+    assert record["error"] == "RuntimeError: timeout"
+    assert tracer.summary()["search.request"]["errors"] == 1
+
+
+def test_percentiles_use_nearest_rank():
+    ordered = [float(value) for value in range(1, 101)]
+    assert percentile(ordered, 50) == 50.0
+    assert percentile(ordered, 95) == 95.0
+    assert percentile(ordered, 99) == 99.0
+    assert percentile([], 50) == 0.0
+    assert percentile([0.2], 99) == 0.2
@@ -0,0 +1,143 @@
+import asyncio
+
+from app.system.agents.drafting import MISSING_ANSWER
+from app.system.agents.workflow import WorkflowClass
+
+
+class MockAgent:
+    def __init__(self, result):
+        self._result = result
+        self.prompts = []
+
+    async def run(self, user_msg="", **kwargs):
+        self.prompts.append(user_msg)
+        return self._result
+
+
+class StragglingAgent(MockAgent):
+    """Answers every question instantly except the one containing `slow`."""
+    def __init__(self, result, slow):
+        super().__init__(result)
+        self._slow = slow
+
+    async def run(self, user_msg="", **kwargs):
+        if self._slow in user_msg:
+            await asyncio.sleep(30)
+        return await super().run(user_msg)
+
+
+def run_workflow(workflow, **agents):
+    async def scenario():
+        return await workflow.run(research_topic="topic", **agents)
+    return asyncio.run(scenario())
+
+
+def test_report_proceeds_without_stragglers_after_deadline():
+    report_agent = MockAgent("REPORT")
+    result = run_workflow(
+        WorkflowClass(timeout=10, straggler_deadline=0.1),
+        question_agent=MockAgent("Fast question?\nSlow question?"),
+        answer_agent=StragglingAgent("An answer", slow="Slow question"),
+        report_agent=report_agent,
+        review_agent=MockAgent("ACCEPTABLE"),
+    )
+
+    assert result == "REPORT"
+    prompt = report_agent.prompts[0]
+    assert "Question: Fast question?\nAnswer: An answer" in prompt
+    assert f"Question: Slow question?\nAnswer: {MISSING_ANSWER}" in prompt
+
+
+class SequenceAgent(MockAgent):
+    """Returns the next canned result on each run."""
+    def __init__(self, results):
+        super().__init__(None)
+        self._results = list(results)
+
+    async def run(self, user_msg="", **kwargs):
+        self.prompts.append(user_msg)
+        return self._results.pop(0) if len(self._results) > 1 else self._results[0]
+
+
+def test_feedback_cycle_only_researches_new_questions():
+    answer_agent = MockAgent("An answer")
+    report_agent = MockAgent("REPORT")
+    run_workflow(
+        WorkflowClass(timeout=10),
+        question_agent=SequenceAgent([
+            "What is solar power?\nHow do solar panels work?",
+            "What is solar power?\nHow does a solar panel work?\nWhat does solar power cost?",
+        ]),
+        answer_agent=answer_agent,
+        report_agent=report_agent,
+        review_agent=SequenceAgent(["Ask about costs", "ACCEPTABLE"]),
+    )
+
+    # two questions in the first cycle, only the new one in the second
+    assert len(answer_agent.prompts) == 3
+    assert "What does solar power cost?" in answer_agent.prompts[-1]
+    second_report = report_agent.prompts[1]
+    for question in ("What is solar power?", "How do solar panels work?",
+                     "What does solar power cost?"):
+        assert f"Question: {question}" in second_report
+
+
+def test_plan_questions_filters_clusters_and_budgets():
+    from app.system.agents.planning import plan_questions
+
+    plan = plan_questions(
+        ["Here are some questions about solar power:",
+         "1. How do solar panels work?",
+         "2. **How does a solar panel work?**",
+         "- What does solar power cost?",
+         "- What is the cost of solar power",
+         "3) Who invented the solar cell?",
+         "Solar is great."],
+        answered=[], budget=2)
+    # clusters of two beat the single question, and model order is kept
+    assert plan.questions == ["How do solar panels work?", "What does solar power cost?"]
+    assert plan.merged["How do solar panels work?"] == ["How does a solar panel work?"]
+    assert plan.rejected == ["Here are some questions about solar power:", "Solar is great."]
+    assert plan.over_budget == ["Who invented the solar cell?"]
+
+    # paraphrases of answered questions are not researched again
+    plan = plan_questions(["How does a solar panel work?", "Who invented the solar cell?"],
+                          answered=["How do solar panels work"])
+    assert plan.questions == ["Who invented the solar cell?"]
+    assert plan.repeated == ["How does a solar panel work?"]
+
+
+def test_runs_sharing_an_answer_memo_research_a_question_once():
+    from app.system.agents.planning import AnswerMemo
+
+    answer_agent = StragglingAgent("An answer", slow="never")
+    memo = AnswerMemo()
+
+    async def scenario():
+        runs = [WorkflowClass(timeout=10).run(
+                    research_topic=topic, answer_memo=memo,
+                    question_agent=MockAgent(questions), answer_agent=answer_agent,
+                    report_agent=MockAgent("REPORT"), review_agent=MockAgent("ACCEPTABLE"))
+                for topic, questions in (
+                    ("solar", "How do solar panels work?\nWho invented the solar cell?"),
+                    ("panels", "How does a solar panel work?\nWhat do solar panels cost?"))]
+        return await asyncio.gather(*runs)
+
+    assert asyncio.run(scenario()) == ["REPORT", "REPORT"]
+    # the paraphrase is answered once, for both runs
+    assert len(answer_agent.prompts) == 3
+    assert memo.reused == 1
+
+
+def test_answer_memo_frees_a_question_whose_research_failed():
+    from app.system.agents.planning import AnswerMemo
+
+    async def scenario():
+        memo = AnswerMemo()
+        first, owner = memo.claim("How do solar panels work?")
+        waiting, reused = memo.claim("How do solar panels work?")
+        memo.resolve("How do solar panels work?", None)
+        retry, retry_owner = memo.claim("How do solar panels work?")
+        return owner, reused, await waiting, retry_owner, retry is first
+
+    assert asyncio.run(scenario()) == (True, False, None, True, False)
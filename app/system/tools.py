@@ -1,50 +1,101 @@
 """module to implement tools to be used"""
-import os
-from llama_index.core.workflow import Context
-from tavily import AsyncTavilyClient
+import asyncio
+import hashlib
 
-# Prefer conventional uppercase env var names
-TAVILY_API_KEY = os.environ.get('TAVILY_API_KEY')
-if not TAVILY_API_KEY:
-    raise RuntimeError("Missing required environment variable 'TAVILY_API_KEY'. Set it to your Tavily API key.")
+from .agents.notes import current_notes
+from .search.backends import SearchHit
+from .search.fusion import render_evidence
+from .search.local_index import get_local_index, index_evidence
+from .search.multi import get_multi_search
+from .cache.search_cache import get_search_cache, search_cache_key
+from .cache.store import MISSING
+from .utils.metrics import LOCAL_SEARCHES
+from .utils.settings import env_float, env_int
+from .utils.tracing import traced
 
-tavily_api_key = TAVILY_API_KEY
+# returned by search_local when the web has to be asked instead
+NO_LOCAL_EVIDENCE = "No confident local evidence; use search_web for this question."
+
+# returned by the recording tools when called outside a research run
+NO_RUN = "Nothing recorded: no research run is active."
 
 # tools to be distributed amongst the agents
 
 
+@traced("tool.search_local", kind="tool")
+async def search_local(query: str) -> str:
+    """
+    Useful for answering questions from evidence gathered in earlier
+    research; much faster than the web. Returns a numbered list of sources
+    with excerpts, or says to use search_web when nothing relevant is known.
+    """
+    hits, confidence = await asyncio.to_thread(
+        get_local_index().search, query, env_int("LOCAL_INDEX_RESULTS", 5))
+    if not hits or confidence < env_float("LOCAL_INDEX_MIN_CONFIDENCE", 0.5):
+        LOCAL_SEARCHES.labels("miss").inc()
+        return NO_LOCAL_EVIDENCE
+    LOCAL_SEARCHES.labels("hit").inc()
+    return render_evidence({}, hits)
+
+
+@traced("tool.search_web", kind="tool")
 async def search_web(query: str) -> str:
 
-    """Useful for using the web to answer questions."""
-    client = AsyncTavilyClient(api_key=tavily_api_key)
-    result = await client.search(query, max_results=1)
-    if result.get("answer"):
-        return result["answer"]
-    return 'could not get answers'
+    """
+    Useful for using the web to answer questions. Returns a direct answer
+    when one is available and a numbered list of sources with excerpts.
+    """
+    search = get_multi_search()
+    cache = get_search_cache()
+    key = search_cache_key(query, max_results=search.max_results,
+                           backends=",".join(search.names))
+    cached = await cache.aget(key)
+    if cached is not MISSING:
+        return cached
+
+    bundle = await search.search(query)
+    if bundle.empty:
+        return 'could not get answers'
+    # fresh web evidence (and direct answers) fill the local index
+    fresh = [hit for hit in bundle.hits if hit.sources != ["local"]]
+    fresh += [SearchHit(f"answer://{source}/{search_cache_key(query)[:16]}", query, answer,
+                        source=source)
+              for source, answer in bundle.answers.items()]
+    await index_evidence(fresh)
+    evidence = bundle.render()
+    # only non-empty bundles are cached so misses get retried
+    await cache.aset(key, evidence)
+    return evidence
 
 
-async def record_notes(ctx: Context, notes: str,
-                       notes_title: str = "Untitled Notes") -> str:
+@traced("tool.record_notes", kind="tool")
+async def record_notes(notes: str, notes_title: str = "Untitled Notes") -> str:
     """Useful for recording notes on a given topic."""
-    current_state = await ctx.get("state")
-    if "research_notes" not in current_state:
-        current_state["research_notes"] = {}
-    current_state["research_notes"][notes_title] = notes
-    await ctx.set("state", current_state)
+    digest = hashlib.sha1(notes.encode("utf-8")).hexdigest()[:16]
+    await index_evidence([SearchHit(f"notes://{digest}", notes_title, notes,
+                                    source="notes")])
+    run_notes = current_notes()
+    if run_notes is None:
+        return NO_RUN
+    run_notes.append(notes_title, notes)
     return "Notes recorded."
 
 
-async def write_report(ctx: Context, report_content: str) -> str:
+@traced("tool.write_report", kind="tool")
+async def write_report(report_content: str) -> str:
     """Useful for writing a report on a given topic."""
-    current_state = await ctx.get("state")
-    current_state["report_content"] = report_content
-    await ctx.set("state", current_state)
+    run_notes = current_notes()
+    if run_notes is None:
+        return NO_RUN
+    run_notes.report = report_content
     return "Report written."
 
 
-async def review_report(ctx: Context, review: str) -> str:
+@traced("tool.review_report", kind="tool")
+async def review_report(review: str) -> str:
     """Useful for reviewing a report and providing feedback."""
-    current_state = await ctx.get("state")
-    current_state["review"] = review
-    await ctx.set("state", current_state)
-    return "Report reviewed."
\ No newline at end of file
+    run_notes = current_notes()
+    if run_notes is None:
+        return NO_RUN
+    run_notes.review = review
+    return "Report reviewed."
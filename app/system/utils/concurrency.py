@@ -0,0 +1,89 @@
+"""module to bound how many workflow steps run at the same time"""
+import asyncio
+from contextlib import asynccontextmanager
+import heapq
+import itertools
+
+from .settings import env_int
+from .metrics import CallbackMetric
+
+
+class PriorityLimiter:
+    """
+    Asynchronous semaphore whose waiters are woken lowest priority first
+    (ties in arrival order), so early questions get a slot before later ones.
+    """
+    def __init__(self, limit: int) -> None:
+        self.limit = max(1, limit)
+        self.active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for *_, future in self._waiters if not future.done())
+
+    def would_block(self) -> bool:
+        """Return True if acquiring now would have to queue."""
+        return self.active >= self.limit or self.waiting > 0
+
+    async def acquire(self, priority: int = 0) -> None:
+        if not self.would_block():
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # the slot was handed over just as we were cancelled: pass it on
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        self.active -= 1
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+                return
+
+    @asynccontextmanager
+    async def slot(self, priority: int = 0):
+        """Hold one slot for the duration of the block."""
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "active": self.active, "waiting": self.waiting}
+
+
+# process-wide cap on answer steps across every concurrent research run
+_answer_limiter: PriorityLimiter | None = None
+
+
+def get_answer_limiter() -> PriorityLimiter:
+    """Return the global answer fan-out limiter (ANSWER_GLOBAL_CONCURRENCY)."""
+    global _answer_limiter
+    if _answer_limiter is None:
+        _answer_limiter = PriorityLimiter(env_int("ANSWER_GLOBAL_CONCURRENCY", 8))
+    return _answer_limiter
+
+
+def set_answer_limiter(limiter: PriorityLimiter | None) -> None:
+    """Replace the global answer limiter (None rebuilds it from settings)."""
+    global _answer_limiter
+    _answer_limiter = limiter
+
+
+CallbackMetric("answer_fanout_active", "Answer steps holding a global fan-out slot.",
+               lambda: get_answer_limiter().active)
+CallbackMetric("answer_fanout_waiting", "Answer steps waiting for a global fan-out slot.",
+               lambda: get_answer_limiter().waiting)
+CallbackMetric("answer_fanout_limit", "Global cap on concurrent answer steps.",
+               lambda: get_answer_limiter().limit)
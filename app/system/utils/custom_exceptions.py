@@ -3,3 +3,11 @@
 
 class ModelLoadError(Exception):
     """Raised when a model fails to load."""
+
+
+class SearchError(Exception):
+    """Raised when a web search request fails."""
+
+
+class LLMCacheMiss(Exception):
+    """Raised in LLM_CACHE=replay mode when a call was never recorded."""
@@ -30,6 +30,8 @@ class QuestionEvent(Event):
     Docstring for QuestionEvent
     """
     question: str
+    index: int = 0
+    cycle: int = 1
 
 
 class AnswerEvent(Event):
@@ -38,6 +40,8 @@ class AnswerEvent(Event):
     """
     question: str
     answer: str
+    index: int = 0
+    cycle: int = 1
 
 
 class ProgressEvent(Event):
@@ -45,3 +49,66 @@ class ProgressEvent(Event):
     Docstring for ProgressEvent
     """
     msg: str
+
+
+class QueuedEvent(Event):
+    """
+    Streamed when an answer step has to wait for a free concurrency slot
+    """
+    question: str
+    position: int
+
+
+class StragglerTimerEvent(Event):
+    """
+    Starts the countdown after which a cycle's report is written with
+    whatever answers have arrived
+    """
+    cycle: int
+    seconds: float
+
+
+class StragglerDeadlineEvent(Event):
+    """
+    Fired when a cycle's straggler deadline passes
+    """
+    cycle: int
+
+
+class OutlineReadyEvent(Event):
+    """
+    Fired when a cycle has no new questions and the report can be written
+    straight from earlier answers
+    """
+    cycle: int
+
+
+class ReportDeltaEvent(Event):
+    """
+    Streamed for each chunk of report text while a draft is being written
+    """
+    delta: str
+    cycle: int
+
+
+class ReviewDeltaEvent(Event):
+    """
+    Streamed for each chunk of review text while a draft is being reviewed
+    """
+    delta: str
+    cycle: int
+
+
+def event_payload(event) -> dict | None:
+    """Translate a workflow event into a client payload (None to skip it)."""
+    if isinstance(event, ProgressEvent):
+        return {"type": "progress", "message": event.msg}
+    if isinstance(event, QueuedEvent):
+        # backpressure: the question is waiting for a free slot
+        return {"type": "queued", "question": event.question,
+                "position": event.position}
+    if isinstance(event, ReportDeltaEvent):
+        return {"type": "report_delta", "delta": event.delta, "cycle": event.cycle}
+    if isinstance(event, ReviewDeltaEvent):
+        return {"type": "review_delta", "delta": event.delta, "cycle": event.cycle}
+    return None
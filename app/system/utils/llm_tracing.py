@@ -0,0 +1,47 @@
+"""module to turn llama-index LLM events into tracing spans"""
+from collections import OrderedDict
+
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events.llm import (
+    LLMChatEndEvent,
+    LLMChatStartEvent,
+    LLMCompletionEndEvent,
+    LLMCompletionStartEvent,
+)
+from llama_index.core.instrumentation.events.exception import ExceptionEvent
+from pydantic import PrivateAttr
+
+from .tracing import Span, _span_id, _trace_id, get_tracer, record_llm_call
+
+
+class LLMSpanHandler(BaseEventHandler):
+    """
+    Turns llama-index LLM start/end events into spans. The end event of a
+    streamed call fires once the stream is exhausted, so the span covers
+    the whole generation.
+    """
+    max_open: int = 1024
+    _open: OrderedDict = PrivateAttr(default_factory=OrderedDict)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LLMSpanHandler"
+
+    def handle(self, event, **kwargs) -> None:
+        if event.span_id is None:
+            return
+        if isinstance(event, (LLMChatStartEvent, LLMCompletionStartEvent)):
+            kind = "chat" if isinstance(event, LLMChatStartEvent) else "completion"
+            model = event.model_dict.get("model") or event.model_dict.get("model_name")
+            self._open[event.span_id] = Span(
+                f"llm.{kind}", "llm", _trace_id.get(), _span_id.get(),
+                {"model": model or "unknown"})
+            # calls that neither end nor fail must not pile up
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        elif isinstance(event, (LLMChatEndEvent, LLMCompletionEndEvent, ExceptionEvent)):
+            current = self._open.pop(event.span_id, None)
+            if current is not None:
+                current.end(getattr(event, "exception", None))
+                get_tracer().export(current)
+                record_llm_call(current, getattr(event, "response", None))
@@ -0,0 +1,291 @@
+"""module to count and time what the service does, in Prometheus text format
+
+Metric objects are plain attribute updates with no locks, so they are cheap
+enough to sit in the hot path: the service runs on one event loop and an
+occasional lost increment from a worker thread is acceptable for metrics.
+"""
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable
+
+
+# latency buckets (seconds) shared by the call duration histograms
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _GaugeValue(_CounterValue):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        # one slot per bucket plus the +Inf overflow
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric(ABC):
+    """
+    A named metric family. Without label names it is used directly
+    (`inc`, `observe`, ...); otherwise `labels(...)` returns the child for
+    one label combination, which hot paths can keep a reference to.
+    """
+    type = "untyped"
+    # False for metrics that read their values from elsewhere when scraped
+    stateful = True
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: tuple[str, ...] = (), registry=None) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        # unlabeled metrics update this child directly and report 0 until used
+        self._default = self.labels() if not self.labelnames and self.stateful else None
+        (registry or REGISTRY).register(self)
+
+    @abstractmethod
+    def _new_child(self):
+        """Return the value object of one label combination."""
+
+    def labels(self, *values):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} "
+                f"{_format_value(child.value)}"
+                for values, child in list(self._children.items())]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} {self.type}", *self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(Metric):
+    """Value that goes up and down."""
+    type = "gauge"
+
+    def _new_child(self):
+        return _GaugeValue()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+
+class Histogram(Metric):
+    """Distribution of observed values over fixed buckets."""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS, registry=None) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def samples(self) -> list[str]:
+        lines = []
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), child.counts, strict=True):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values,
+                                        f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class CallbackMetric(Metric):
+    """
+    Metric read from existing state when scraped. `collect` returns either
+    a number or a {label values tuple: number} mapping.
+    """
+    stateful = False
+
+    def __init__(self, name: str, documentation: str,
+                 collect: Callable[[], float | dict], metric_type: str = "gauge",
+                 labelnames: tuple[str, ...] = (), registry=None) -> None:
+        self.type = metric_type
+        self.collect = collect
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        # values come from `collect`, so there is nothing to update
+        raise TypeError(f"{self.name} is read from a callback and has no children")
+
+    def samples(self) -> list[str]:
+        collected = self.collect()
+        if not isinstance(collected, dict):
+            collected = {(): collected}
+        return [f"{self.name}{_format_labels(self.labelnames, values)} "
+                f"{_format_value(value)}"
+                for values, value in collected.items()]
+
+
+class MetricsRegistry:
+    """The set of metrics rendered by the metrics endpoint."""
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> None:
+        self.metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# caches reported on the metrics endpoint, by name
+_caches: dict[str, Callable[[], object]] = {}
+
+
+def register_cache(name: str, get_cache: Callable[[], object]) -> None:
+    """Report hit/miss counters of the cache returned by `get_cache`."""
+    _caches[name] = get_cache
+
+
+def _cache_stat(field: str) -> Callable[[], dict]:
+    def collect() -> dict:
+        return {(name,): getattr(get_cache().stats, field)
+                for name, get_cache in list(_caches.items())}
+    return collect
+
+
+def _cache_hit_ratio() -> dict:
+    ratios = {}
+    for name, get_cache in list(_caches.items()):
+        stats = get_cache().stats
+        lookups = stats.hits + stats.misses
+        ratios[(name,)] = stats.hits / lookups if lookups else 0.0
+    return ratios
+
+
+# research runs
+WORKFLOWS_IN_FLIGHT = Gauge(
+    "research_workflows_in_flight", "Research workflows currently running.")
+RUNS = Counter(
+    "research_runs_total", "Finished research runs by outcome.", ("status",))
+QUESTIONS_PER_RUN = Histogram(
+    "research_questions_per_run", "Questions researched in one run, over all cycles.",
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34))
+RUN_MEMORY = Histogram(
+    "research_run_memory_bytes",
+    "Approximate memory a finished run held, by part (notes, events).", ("part",),
+    buckets=(1e3, 1e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7))
+QUESTIONS_SKIPPED = Counter(
+    "research_questions_skipped_total",
+    "Generated questions not researched, by reason "
+    "(merged, repeated, rejected, over_budget).", ("reason",))
+REVIEW_DECISIONS = Counter(
+    "research_review_decisions_total",
+    "Review verdicts by who decided (precheck, llm, agent) and outcome.",
+    ("source", "verdict"))
+REVIEW_CYCLES_PER_RUN = Histogram(
+    "research_review_cycles_per_run", "Review cycles a run needed before it stopped.",
+    buckets=(1, 2, 3, 4, 5))
+
+# web search
+SEARCH_REQUESTS = Counter(
+    "search_requests_total", "Search API requests by outcome.", ("status",))
+SEARCH_LATENCY = Histogram(
+    "search_request_duration_seconds", "Search API request latency.")
+LOCAL_SEARCHES = Counter(
+    "local_search_requests_total",
+    "Local index lookups by outcome (hit, or miss when not confident).", ("status",))
+SEARCH_BACKEND_CALLS = Counter(
+    "search_backend_queries_total",
+    "Multi-source search queries per backend by outcome (ok, error, timeout).",
+    ("backend", "status"))
+
+# language model
+LLM_CALLS = Counter(
+    "llm_calls_total", "LLM calls by model and outcome.", ("model", "status"))
+LLM_LATENCY = Histogram(
+    "llm_call_duration_seconds", "LLM call latency, to the last streamed token.",
+    ("model",))
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "Tokens reported by the model server.", ("model", "type"))
+
+# caches
+CallbackMetric("cache_hits_total", "Cache lookups that found an entry.",
+               _cache_stat("hits"), "counter", ("cache",))
+CallbackMetric("cache_misses_total", "Cache lookups that found nothing.",
+               _cache_stat("misses"), "counter", ("cache",))
+CallbackMetric("cache_hit_ratio", "Share of cache lookups that were hits.",
+               _cache_hit_ratio, "gauge", ("cache",))
@@ -6,8 +6,39 @@ from pydantic import BaseModel
 class UserRequest(BaseModel):
     """Blueprint for user requests (request body should provide `text`)."""
     text: str
+    # skip the finished-report cache and research the topic again
+    bypass_cache: bool = False
 
 
 class AgentResponse(BaseModel):
     """blueprint for agent response"""
     response: str
+
+
+class JobCreated(BaseModel):
+    """blueprint for the response to a queued research job"""
+    job_id: str
+    status: str
+
+
+class JobStatus(BaseModel):
+    """blueprint for the state of a research job"""
+    job_id: str
+    topic: str
+    status: str
+    created_at: float
+    started_at: float | None = None
+    finished_at: float | None = None
+    # research run behind the job, for /runs/{run_id}/trace
+    run_id: str | None = None
+    progress: list[str] = []
+    events: int = 0
+    report: str | None = None
+    error: str | None = None
+
+
+class BatchRequest(BaseModel):
+    """blueprint for a batch of research requests"""
+    requests: list[UserRequest]
+    # also stream each topic's progress events, not just its result
+    progress: bool = False
@@ -0,0 +1,64 @@
+"""module to read runtime configuration from environment variables"""
+import os
+
+from .logger import logger
+
+
+# helpers to parse typed values, falling back to the default on bad input
+def env_str(name: str, default: str = "") -> str:
+    """Return the environment variable `name` or `default`."""
+    return os.environ.get(name, default)
+
+
+def env_int(name: str, default: int) -> int:
+    """Return the environment variable `name` parsed as an int."""
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    """Return the environment variable `name` parsed as a float."""
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    """Return the environment variable `name` parsed as a boolean flag."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def env_list(name: str, default: str = "") -> list[str]:
+    """Return the comma separated environment variable `name` as a list."""
+    return [item.strip() for item in env_str(name, default).split(",") if item.strip()]
+
+
+def env_mapping(name: str, default: str = "") -> dict[str, str]:
+    """Return a comma separated `key=value` environment variable as a dict."""
+    mapping = {}
+    for item in env_list(name, default):
+        key, _, value = item.partition("=")
+        if not key.strip() or not value.strip():
+            logger.warning(f"Ignoring malformed {name} entry: {item!r}")
+            continue
+        mapping[key.strip()] = value.strip()
+    return mapping
+
+
+def env_path(name: str, shared_name: str | None = None) -> str:
+    """
+    Return the file path in `name`, else `shared_name` inside SHARED_STATE_DIR
+    (the directory API workers share state through), else "".
+    """
+    path = env_str(name)
+    directory = env_str("SHARED_STATE_DIR")
+    if path or not (directory and shared_name):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, shared_name)
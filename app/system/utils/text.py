@@ -0,0 +1,25 @@
+"""module to split free text into comparable terms"""
+import re
+
+
+# words that carry no meaning for matching questions or documents
+STOPWORDS = frozenset("""
+a an and are as at be been being by can could did do does for from had has
+have how i if in into is it its may might more most of on or should so such
+than that the their them then there these they this those to was were what
+when where which who whom whose why will with would you your about also
+""".split())
+
+
+def stem(word: str) -> str:
+    """Very small suffix stripper so plural and tense variants match."""
+    for suffix in ("ing", "ies", "es", "ed", "s"):
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            return word[: -len(suffix)] + ("y" if suffix == "ies" else "")
+    return word
+
+
+def terms(text: str) -> list[str]:
+    """Return the stemmed content words of `text`, in order, with repeats."""
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return [stem(word) for word in words if word not in STOPWORDS]
@@ -0,0 +1,256 @@
+"""module to trace where the time of a research run is spent
+
+Spans are timed sections (a workflow step, an agent run, a tool call, a
+search request, an LLM call). The research run a span belongs to and its
+parent span travel in context variables, so asyncio tasks spawned by the
+workflow inherit them without any explicit plumbing.
+"""
+from collections import deque
+from contextlib import contextmanager
+import contextvars
+import functools
+import json
+import math
+import os
+import threading
+import time
+
+from .settings import env_int, env_str
+from .logger import logger
+from .metrics import LLM_CALLS, LLM_LATENCY, LLM_TOKENS, CallbackMetric
+
+
+# the run being traced and the innermost open span of the current task
+_trace_id: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "trace_id", default=None)
+_span_id: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "span_id", default=None)
+
+
+class Span:
+    """One timed section of a run."""
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "start",
+                 "duration", "status", "error", "attrs", "_t0")
+
+    def __init__(self, name: str, kind: str, trace_id: str | None,
+                 parent_id: str | None, attrs: dict | None = None) -> None:
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.duration: float | None = None
+        self.status = "ok"
+        self.error: str | None = None
+        self.attrs = attrs or {}
+        self._t0 = time.perf_counter()
+
+    def end(self, error: BaseException | None = None) -> None:
+        self.duration = time.perf_counter() - self._t0
+        if error is not None:
+            self.status = "error"
+            self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_s": round(self.duration, 6) if self.duration is not None else None,
+            "status": self.status,
+            "error": self.error,
+            "attrs": self.attrs,
+        }
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class Tracer:
+    """
+    Local span exporter: a ring buffer of the latest spans for the trace
+    endpoint, an optional JSONL file with every span, and a bounded sample
+    of durations per span name for the percentile summary.
+    """
+    def __init__(self, buffer_size: int = 4096, path: str | None = None,
+                 samples: int = 1024) -> None:
+        self.spans: deque[Span] = deque(maxlen=buffer_size)
+        self.samples = samples
+        self._durations: dict[str, deque[float]] = {}
+        self._counts: dict[str, int] = {}
+        self._errors: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._file = open(path, "a", buffering=1, encoding="utf-8") if path else None
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+        durations = self._durations.get(span.name)
+        if durations is None:
+            durations = self._durations.setdefault(span.name, deque(maxlen=self.samples))
+        durations.append(span.duration)
+        self._counts[span.name] = self._counts.get(span.name, 0) + 1
+        if span.status == "error":
+            self._errors[span.name] = self._errors.get(span.name, 0) + 1
+        if self._file is not None:
+            line = json.dumps(span.to_dict(), default=str)
+            with self._lock:
+                self._file.write(line + "\n")
+
+    def trace(self, trace_id: str) -> list[dict]:
+        """Return the buffered spans of one run, in start order."""
+        spans = [span for span in list(self.spans) if span.trace_id == trace_id]
+        return [span.to_dict() for span in sorted(spans, key=lambda s: s.start)]
+
+    def summary(self) -> dict[str, dict]:
+        """p50/p95/p99 latency (seconds) per span name over recent samples."""
+        summary = {}
+        for name, durations in sorted(self._durations.items()):
+            ordered = sorted(durations)
+            summary[name] = {
+                "count": self._counts[name],
+                "errors": self._errors.get(name, 0),
+                "p50_s": round(percentile(ordered, 50), 6),
+                "p95_s": round(percentile(ordered, 95), 6),
+                "p99_s": round(percentile(ordered, 99), 6),
+                "max_s": round(ordered[-1], 6),
+            }
+        return summary
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def current_trace_id() -> str | None:
+    return _trace_id.get()
+
+
+@contextmanager
+def trace_run(trace_id: str, parent_id: str | None = None):
+    """
+    Attribute every span opened inside (and in tasks spawned inside) to a
+    run, optionally as children of the run's root span `parent_id`.
+    """
+    trace_token = _trace_id.set(trace_id)
+    span_token = _span_id.set(parent_id)
+    try:
+        yield
+    finally:
+        _span_id.reset(span_token)
+        _trace_id.reset(trace_token)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attrs):
+    """Time the enclosed block as a child of the current span."""
+    current = Span(name, kind, _trace_id.get(), _span_id.get(), attrs)
+    token = _span_id.set(current.span_id)
+    try:
+        yield current
+    except BaseException as exc:
+        current.end(exc)
+        raise
+    else:
+        current.end()
+    finally:
+        _span_id.reset(token)
+        get_tracer().export(current)
+
+
+def traced(name: str | None = None, kind: str = "internal"):
+    """Decorator that wraps every call of an async function in a span."""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(span_name, kind):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def token_usage(response) -> tuple[int, int]:
+    """Return (prompt, completion) tokens reported in an LLM response, or zeros."""
+    if response is None:
+        return 0, 0
+    usage = response.additional_kwargs
+    if "prompt_tokens" not in usage:
+        raw = response.raw
+        usage = (raw.get("usage") if isinstance(raw, dict)
+                 else getattr(raw, "usage", None)) or {}
+        if not isinstance(usage, dict):
+            usage = {"prompt_tokens": getattr(usage, "prompt_tokens", 0),
+                     "completion_tokens": getattr(usage, "completion_tokens", 0)}
+    return (int(usage.get("prompt_tokens") or 0),
+            int(usage.get("completion_tokens") or 0))
+
+
+def record_llm_call(current: Span, response) -> None:
+    """Count a finished LLM call, its latency and its tokens."""
+    model = current.attrs.get("model", "unknown")
+    LLM_CALLS.labels(model, current.status).inc()
+    LLM_LATENCY.labels(model).observe(current.duration)
+    prompt, completion = token_usage(response)
+    if prompt:
+        LLM_TOKENS.labels(model, "prompt").inc(prompt)
+    if completion:
+        LLM_TOKENS.labels(model, "completion").inc(completion)
+
+
+# until first use, the tracer does not exist
+_tracer: Tracer | None = None
+_llm_handler = None
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer (TRACE_BUFFER_SIZE, TRACE_PATH)."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(buffer_size=env_int("TRACE_BUFFER_SIZE", 4096),
+                         path=env_str("TRACE_PATH") or None)
+    return _tracer
+
+
+def set_tracer(tracer: Tracer | None) -> None:
+    """Replace the tracer (None rebuilds it from settings)."""
+    global _tracer
+    if _tracer is not None and _tracer is not tracer:
+        _tracer.close()
+    _tracer = tracer
+
+
+def _span_quantiles() -> dict:
+    quantiles = {}
+    for name, summary in get_tracer().summary().items():
+        for quantile in ("50", "95", "99"):
+            quantiles[(name, f"0.{quantile}")] = summary[f"p{quantile}_s"]
+    return quantiles
+
+
+CallbackMetric("span_duration_quantile_seconds",
+               "Recent span latency percentiles per span name.",
+               _span_quantiles, "gauge", ("span", "quantile"))
+
+
+def install_llm_tracing() -> None:
+    """Record a span and metrics for every LLM call; called once from the app lifespan."""
+    global _llm_handler
+    if _llm_handler is None:
+        # the handler subclasses llama-index, so it is only imported here
+        from llama_index.core.instrumentation import get_dispatcher
+        from .llm_tracing import LLMSpanHandler
+
+        _llm_handler = LLMSpanHandler()
+        get_dispatcher().add_event_handler(_llm_handler)
+        logger.info("LLM call tracing enabled")
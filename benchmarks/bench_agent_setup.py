@@ -0,0 +1,62 @@
+"""microbenchmark for the per-request cost of obtaining the four agents
+
+Compares building every agent through its factory (the old per-request
+path) with fetching the warm agents from the AgentRegistry.
+
+    python -m benchmarks.bench_agent_setup [--requests 200]
+"""
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+
+from llama_index.core.llms import MockLLM  # noqa: E402
+
+from app.system.agents import research_agents, write_agents, review_agents  # noqa: E402
+from app.system.agents.registry import AgentRegistry, AGENT_FACTORIES  # noqa: E402
+from app.system.model import model_loader  # noqa: E402
+
+
+def build_fresh():
+    research_agents.get_question_agent()
+    research_agents.get_research_agent()
+    write_agents.get_report_agent()
+    review_agents.get_review_agent()
+
+
+def fetch_warm(registry):
+    for role in AGENT_FACTORIES:
+        registry.get(role)
+
+
+def timed(fn, requests: int) -> float:
+    """Return the mean seconds per request."""
+    start = time.perf_counter()
+    for _ in range(requests):
+        fn()
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    model_loader.model = MockLLM()
+    registry = AgentRegistry()
+    registry.warm()
+
+    fresh = timed(build_fresh, args.requests)
+    warm = timed(lambda: fetch_warm(registry), args.requests)
+    print(json.dumps({
+        "requests": args.requests,
+        "per_request_fresh_us": round(fresh * 1e6, 1),
+        "per_request_warm_us": round(warm * 1e6, 1),
+        "speedup": round(fresh / warm, 1) if warm else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
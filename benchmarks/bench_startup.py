@@ -0,0 +1,83 @@
+"""benchmark for the cold-start cost of the API process
+
+Imports a module (default `app.main`) in fresh interpreters and reports the
+import time, peak resident memory and module count, and which heavy
+dependencies were loaded. Those should only be imported once a model is
+loaded or a run starts, so `--deferred` also imports what the first
+request needs (the workflow, agents and tools) to show what was deferred.
+
+    python -m benchmarks.bench_startup [--runs 5] [--module app.main] [--check]
+
+With `--check`, the exit code is 1 if a heavy dependency was imported.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# dependencies that must not be imported just by starting the app
+HEAVY_MODULES = ("llama_index.core", "llama_index.llms.ollama", "ollama", "numpy", "tavily")
+
+# what the first research run imports on top of the app
+DEFERRED_MODULES = ("app.system.agents.workflow", "app.system.agents.research_agents",
+                    "app.system.tools", "app.system.model.pool")
+
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+seconds = time.perf_counter() - start
+usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# ru_maxrss is in kilobytes on Linux and bytes on macOS
+rss_mb = usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+print(json.dumps({{"seconds": seconds, "rss_mb": rss_mb, "modules": len(sys.modules),
+                  "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def measure(modules: list[str], env: dict | None = None) -> dict:
+    """Import `modules` in a fresh interpreter and return its measurements."""
+    code = _PROBE.format(modules=list(modules), heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            check=True, env=env)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples: list[dict]) -> dict:
+    seconds = sorted(sample["seconds"] for sample in samples)
+    return {
+        "import_s_median": round(statistics.median(seconds), 3),
+        "import_s_min": round(seconds[0], 3),
+        "rss_mb_median": round(statistics.median(sample["rss_mb"] for sample in samples), 1),
+        "modules": samples[-1]["modules"],
+        "heavy_imported": samples[-1]["heavy"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--deferred", action="store_true",
+                        help="also measure importing what the first run needs")
+    parser.add_argument("--check", action="store_true",
+                        help="exit with 1 if starting imports a heavy dependency")
+    args = parser.parse_args()
+
+    # the search key is only checked in the lifespan, so none is set here
+    env = {key: value for key, value in os.environ.items() if key != "TAVILY_API_KEY"}
+    result = {"module": args.module, "runs": args.runs,
+              "startup": summarize([measure([args.module], env) for _ in range(args.runs)])}
+    if args.deferred:
+        result["first_run"] = summarize([measure([args.module, *DEFERRED_MODULES], env)
+                                         for _ in range(args.runs)])
+    print(json.dumps(result, indent=2))
+    if args.check and result["startup"]["heavy_imported"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
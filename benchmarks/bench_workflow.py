@@ -0,0 +1,306 @@
+"""offline load benchmark of the research workflow behind the HTTP API
+
+Starts the real app with uvicorn, with Ollama replaced by FakeOllamaServer
+and Tavily by FakeSearch, then drives /v1/agent and /v1/agent/stream at a
+fixed concurrency. Reports throughput, latency percentiles, time to first
+SSE event, event-loop lag and memory growth per run. Results can be saved
+as a JSON baseline and later runs compared against it:
+
+    python -m benchmarks.bench_workflow --save-baseline benchmarks/baselines/workflow.json
+    python -m benchmarks.bench_workflow --compare benchmarks/baselines/workflow.json
+
+With `--llm-cache record --llm-cache-path runs.db` the model's responses
+are recorded; `--llm-cache replay` then serves the same runs from them,
+isolating the app's own overhead from model latency.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import socket
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from benchmarks.stubs import FakeOllama, FakeOllamaServer, FakeSearch, Latency  # noqa: E402
+
+
+# metrics compared against a baseline and whether higher values are better
+COMPARED = {"throughput_rps": True, "latency_p50_s": False, "latency_p95_s": False}
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    from app.system.utils.tracing import percentile as nearest_rank
+    return nearest_rank(ordered, q)
+
+
+def rss_kb() -> int:
+    """Resident set size of this process in KiB (Linux), else 0."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        return 0
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a task that sleeps `interval`."""
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self.lags: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    def summary(self) -> dict:
+        ordered = sorted(self.lags)
+        return {"loop_lag_p50_ms": round(percentile(ordered, 50) * 1e3, 3),
+                "loop_lag_p99_ms": round(percentile(ordered, 99) * 1e3, 3),
+                "loop_lag_max_ms": round(ordered[-1] * 1e3, 3) if ordered else 0.0}
+
+
+async def call_agent(client: httpx.AsyncClient, topic: str) -> dict:
+    start = time.perf_counter()
+    response = await client.post("/v1/agent", json={"text": topic})
+    response.raise_for_status()
+    return {"latency": time.perf_counter() - start, "first_event": None}
+
+
+async def call_stream(client: httpx.AsyncClient, topic: str) -> dict:
+    start = time.perf_counter()
+    first_event = None
+    final = False
+    async with client.stream("POST", "/v1/agent/stream", json={"text": topic}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            if first_event is None:
+                first_event = time.perf_counter() - start
+            payload = json.loads(line[len("data: "):])
+            if payload["type"] == "error":
+                raise RuntimeError(payload["error"])
+            final = final or payload["type"] == "final"
+    if not final:
+        raise RuntimeError("stream ended without a final event")
+    return {"latency": time.perf_counter() - start, "first_event": first_event}
+
+
+async def drive(client: httpx.AsyncClient, endpoint: str, requests: int,
+                concurrency: int) -> dict:
+    """Send `requests` distinct topics to `endpoint`, `concurrency` at a time."""
+    call = call_stream if endpoint == "stream" else call_agent
+    semaphore = asyncio.Semaphore(concurrency)
+    results, errors = [], []
+
+    async def one(index: int) -> None:
+        async with semaphore:
+            try:
+                results.append(await call(client, f"benchmark topic {endpoint} {index}"))
+            except Exception as exc:
+                errors.append(str(exc))
+
+    gc.collect()
+    rss_before = rss_kb()
+    traced_before = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+    monitor = LoopLagMonitor()
+    monitor.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    elapsed = time.perf_counter() - start
+    await monitor.stop()
+    gc.collect()
+
+    latencies = sorted(result["latency"] for result in results)
+    first_events = sorted(result["first_event"] for result in results
+                          if result["first_event"] is not None)
+    summary = {
+        "requests": requests,
+        "errors": len(errors),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 3) if elapsed else 0.0,
+        "latency_p50_s": round(percentile(latencies, 50), 4),
+        "latency_p95_s": round(percentile(latencies, 95), 4),
+        "latency_p99_s": round(percentile(latencies, 99), 4),
+        **monitor.summary(),
+        "rss_growth_per_run_kb": round((rss_kb() - rss_before) / max(1, requests), 1),
+    }
+    if first_events:
+        summary["first_event_p50_s"] = round(percentile(first_events, 50), 4)
+        summary["first_event_p95_s"] = round(percentile(first_events, 95), 4)
+    if tracemalloc.is_tracing():
+        retained = tracemalloc.get_traced_memory()[0] - traced_before
+        summary["retained_per_run_kb"] = round(retained / 1024 / max(1, requests), 1)
+    if errors:
+        summary["first_error"] = errors[0]
+    return summary
+
+
+def configure(args, llm_url: str) -> None:
+    """Point the app at the stubs; must run before the app is imported."""
+    os.environ["LLM_BACKENDS"] = f"ollama@{llm_url}#stub"
+    os.environ.setdefault("REPORT_STRAGGLER_DEADLINE", "0")
+    os.environ["TRACE_PATH"] = ""
+    for name in ("SEARCH_CACHE_PATH", "REPORT_CACHE_PATH", "JOB_STORE_PATH"):
+        os.environ.pop(name, None)
+    # record once, then replay the same runs without the model in the way
+    os.environ["LLM_CACHE"] = args.llm_cache
+    if args.llm_cache_path:
+        os.environ["LLM_CACHE_PATH"] = args.llm_cache_path
+
+
+async def run_benchmark(args) -> dict:
+    fake_llm = FakeOllama(Latency.parse(args.llm_ttft), args.llm_token_delay,
+                          questions=args.questions, report_tokens=args.report_tokens,
+                          review_rejections=args.review_rejections, seed=args.seed)
+    llm_server = FakeOllamaServer(fake_llm).start()
+    fake_search = FakeSearch(Latency.parse(args.search_latency), seed=args.seed)
+    configure(args, llm_server.url)
+
+    from app.main import app
+    from app.system.search.client import SearchClientManager, set_search_client
+
+    set_search_client(SearchClientManager(api_key="benchmark",
+                                          transport=fake_search.transport()))
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port,
+                                           log_level="warning", lifespan="on"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        if serving.done():
+            raise RuntimeError("benchmark server failed to start")
+        await asyncio.sleep(0.01)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    results = {}
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency * 2)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}",
+                                     timeout=None, limits=limits) as client:
+            # unmeasured runs so first-use costs (imports, model info) don't count
+            for index in range(args.warmup):
+                await call_agent(client, f"benchmark warm-up {index}")
+            for endpoint in args.endpoints:
+                results[endpoint] = await drive(client, endpoint, args.requests,
+                                                args.concurrency)
+    finally:
+        if args.tracemalloc:
+            tracemalloc.stop()
+        server.should_exit = True
+        await serving
+        llm_server.stop()
+
+    return {
+        "config": {
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "questions": args.questions,
+            "report_tokens": args.report_tokens,
+            "review_rejections": args.review_rejections,
+            "llm_ttft": args.llm_ttft,
+            "llm_token_delay": args.llm_token_delay,
+            "search_latency": args.search_latency,
+            "seed": args.seed,
+            "llm_cache": args.llm_cache,
+        },
+        "calls": {"llm": fake_llm.requests, "search": fake_search.requests},
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Return a description of every metric that regressed past `tolerance`."""
+    regressions = []
+    for endpoint, metrics in current["results"].items():
+        reference = baseline.get("results", {}).get(endpoint)
+        if reference is None:
+            continue
+        for name, higher_is_better in COMPARED.items():
+            old, new = reference.get(name), metrics.get(name)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{endpoint}.{name}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--endpoints", nargs="+", default=["agent", "stream"],
+                        choices=["agent", "stream"])
+    parser.add_argument("--questions", type=int, default=3)
+    parser.add_argument("--report-tokens", type=int, default=200)
+    parser.add_argument("--review-rejections", type=int, default=0,
+                        help="reviews answered with feedback before accepting, per topic")
+    parser.add_argument("--llm-ttft", default="lognormal:0.05,0.3",
+                        help="time to first token of the fake model")
+    parser.add_argument("--llm-token-delay", type=float, default=0.0005)
+    parser.add_argument("--search-latency", default="lognormal:0.1,0.4")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-cache", default="off", choices=["off", "record", "replay"],
+                        help="record LLM responses, or replay recorded ones instead of calling")
+    parser.add_argument("--llm-cache-path", metavar="PATH",
+                        help="SQLite file holding recorded LLM responses")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="also report Python memory retained per run (slower)")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative regression when comparing")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    result = asyncio.run(run_benchmark(args))
+    print(json.dumps(result, indent=2))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.save_baseline) or ".", exist_ok=True)
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump(result, baseline_file, indent=2)
+            baseline_file.write("\n")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("config") != result["config"]:
+            print("warning: baseline was recorded with a different config", file=sys.stderr)
+        regressions = compare(result, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""local stand-ins for Ollama and Tavily with configurable latency
+
+`FakeOllamaServer` speaks enough of the Ollama chat API (streamed NDJSON,
+tool calls, token counts) for the real agents to run against it, and
+`FakeSearch` answers the search client's requests in process.
+Latencies are drawn from a seeded generator keyed on the request body, so
+the same request always waits the same time.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+
+import httpx
+
+
+# the fake model server runs in a fresh interpreter on every platform
+_CONTEXT = multiprocessing.get_context("spawn")
+
+
+class Latency:
+    """
+    A latency distribution in seconds, parsed from `fixed:0.05`,
+    `uniform:0.02,0.08` or `lognormal:<median>,<sigma>`.
+    """
+    def __init__(self, kind: str = "fixed", a: float = 0.0, b: float = 0.0) -> None:
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.kind = kind
+        self.a = a
+        self.b = b
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        kind, _, params = spec.partition(":")
+        if not params:
+            return cls("fixed", float(kind))
+        values = [float(value) for value in params.split(",")]
+        return cls(kind, *values)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.a
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        return rng.lognormvariate(0, self.b) * self.a
+
+    def __str__(self) -> str:
+        return f"{self.kind}:{self.a},{self.b}"
+
+
+def seeded_rng(seed: int, payload: bytes) -> random.Random:
+    """Return a generator that depends only on the seed and the request."""
+    digest = hashlib.sha256(str(seed).encode() + payload).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+# distinct question wordings, so the workflow does not merge them as duplicates
+ASPECTS = (
+    "What is the history of {topic}?",
+    "Which costs and risks come with {topic}?",
+    "How is {topic} regulated today?",
+    "Who are the leading vendors offering {topic}?",
+    "What measurable performance results has {topic} shown?",
+    "Which alternatives compete against {topic}?",
+    "How will {topic} evolve over the coming decade?",
+    "What do critics say about {topic}?",
+)
+
+
+class FakeOllama:
+    """
+    Decides what the fake model answers. The prompt of each workflow step
+    is recognized by a phrase from it, and the research agent is made to
+    call `search_web` once before answering.
+    """
+    def __init__(self, ttft: Latency, token_delay: float = 0.0, questions: int = 3,
+                 report_tokens: int = 200, review_rejections: int = 0,
+                 seed: int = 0) -> None:
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.questions = questions
+        self.report_tokens = report_tokens
+        self.review_rejections = review_rejections
+        self.seed = seed
+        # shared with the server process, which does the counting
+        self._requests = _CONTEXT.Value("i", 0)
+        self._reviews: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def requests(self) -> int:
+        return self._requests.value
+
+    def count_request(self) -> None:
+        with self._requests.get_lock():
+            self._requests.value += 1
+
+    def reply(self, request: dict) -> tuple[str, list[dict]]:
+        """Return (text, tool calls) for an /api/chat request."""
+        messages = request.get("messages", [])
+        # prompts are indented multi-line strings, so match on collapsed whitespace
+        text = " ".join(" ".join(str(message.get("content") or "")
+                                 for message in messages).split())
+        tools = {tool["function"]["name"] for tool in request.get("tools") or []}
+
+        if "Generate some questions" in text:
+            topic = re.search(r"<topic>(.*?)</topic>", text)
+            topic = topic.group(1) if topic else "the topic"
+            # feedback cycles ask about the aspects after the ones already covered
+            offset = self.questions * text.count("<feedback>")
+            return "\n".join(
+                ASPECTS[index % len(ASPECTS)].format(topic=topic)
+                + (f" (part {index // len(ASPECTS) + 1})" if index >= len(ASPECTS) else "")
+                for index in range(offset, offset + self.questions)), []
+        if "sufficiently comprehensive" in text:
+            topic = re.search(r"about the topic (.*?)(?:\. Here is the report| and decide)", text)
+            key = topic.group(1) if topic else ""
+            with self._lock:
+                seen = self._reviews[key] = self._reviews.get(key, 0) + 1
+            if seen <= self.review_rejections:
+                return "What about the costs involved?", []
+            return "ACCEPTABLE", []
+        if "write a clear, thorough report" in text:
+            return " ".join(f"word{index}" for index in range(self.report_tokens)), []
+        if "search_web" in tools and messages[-1].get("role") != "tool":
+            question = re.search(r"<question>(.*?)</question>", text)
+            query = question.group(1) if question else text[-200:]
+            return "", [{"function": {"name": "search_web",
+                                      "arguments": {"query": query}}}]
+        return "A short researched answer based on the search results.", []
+
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    # set on the server class built by FakeOllamaServer
+    model: FakeOllama
+
+    def do_GET(self):
+        if self.path != "/api/tags":
+            self.send_response(404)
+            self.end_headers()
+            return
+        self._json({"models": [{"name": "stub"}]})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/api/show":
+            # llama-index reads the context window from the model info
+            self._json({"model_info": {"general.architecture": "stub",
+                                       "stub.context_length": 32768}})
+            return
+        if self.path == "/api/generate":
+            # warm-up generation at startup
+            self._json({"model": json.loads(body).get("model", "stub"), "response": "ok",
+                        "done": True, "load_duration": 0, "eval_count": 1,
+                        "eval_duration": 1_000_000})
+            return
+        if self.path != "/api/chat":
+            self.send_response(404)
+            self.end_headers()
+            return
+        request = json.loads(body)
+        model = self.model
+        model.count_request()
+        text, tool_calls = model.reply(request)
+        time.sleep(model.ttft.sample(seeded_rng(model.seed, body)))
+
+        tokens = re.findall(r"\S+\s*", text) or [text]
+        done = {"model": request.get("model", "stub"), "created_at": "", "done": True,
+                "done_reason": "stop", "message": {"role": "assistant", "content": ""},
+                "prompt_eval_count": len(body) // 4, "eval_count": len(tokens)}
+        if not request.get("stream", True):
+            self._json({**done, "message": {"role": "assistant", "content": text,
+                                            "tool_calls": tool_calls or None}})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for index, token in enumerate(tokens):
+            if index and model.token_delay:
+                time.sleep(model.token_delay)
+            chunk = {"model": done["model"], "created_at": "", "done": False,
+                     "message": {"role": "assistant", "content": token}}
+            if index == 0 and tool_calls:
+                chunk["message"]["tool_calls"] = tool_calls
+            self.wfile.write(json.dumps(chunk).encode() + b"\n")
+            self.wfile.flush()
+        self.wfile.write(json.dumps(done).encode() + b"\n")
+
+    def _json(self, payload: dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(model: FakeOllama, ports) -> None:
+    handler = type("OllamaHandler", (_OllamaHandler,), {"model": model})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+class FakeOllamaServer:
+    """
+    Runs a FakeOllama behind a threaded HTTP server on a free local port,
+    in its own process so the stub's CPU time does not load the event loop
+    being measured.
+    """
+    def __init__(self, model: FakeOllama) -> None:
+        self.model = model
+        self.port: int | None = None
+        self._process = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "FakeOllamaServer":
+        ports = _CONTEXT.Queue()
+        self._process = _CONTEXT.Process(target=_serve, args=(self.model, ports),
+                                        daemon=True)
+        self._process.start()
+        self.port = ports.get(timeout=30)
+        return self
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+
+class FakeSearch:
+    """Answers Tavily /search requests after a sampled delay."""
+    def __init__(self, latency: Latency, results: int = 3, seed: int = 0) -> None:
+        self.latency = latency
+        self.results = results
+        self.seed = seed
+        self.requests = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        body = request.content
+        await asyncio.sleep(self.latency.sample(seeded_rng(self.seed, body)))
+        query = json.loads(body).get("query", "")
+        slug = hashlib.md5(query.encode()).hexdigest()[:8]
+        return httpx.Response(200, json={
+            "query": query,
+            "answer": f"Stub answer about {query}",
+            "results": [{"url": f"https://example.com/{slug}/{index}",
+                         "title": f"Result {index} for {query}",
+                         "content": f"Stub content {index} about {query}",
+                         "score": 1.0 / (index + 1)}
+                        for index in range(self.results)],
+        })
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)